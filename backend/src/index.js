@@ -6,6 +6,7 @@ const path = require('path');
 const fs = require('fs');
 const { v4: uuidv4 } = require('uuid');
 const { detectLanguage, getLanguageConfig, getSupportedLanguages } = require('./lib/language-detector.js');
+const { parseTraceparent, startSpan } = require('./lib/trace-context.js');
 
 const app = express();
 const PORT = process.env.PORT || 3000;
@@ -322,6 +323,15 @@ app.delete('/api/assignments/:id', authRequired, teacherOnly, (req, res) => {
 
   const [removedAssignment] = database.assignments.splice(assignmentIndex, 1);
 
+  // Stop grading work nobody will look at anymore
+  database.submissions
+    .filter((submission) => submission.assignmentId === assignmentId
+      && (submission.status === 'queued' || submission.status === 'processing'))
+    .forEach((submission) => {
+      fetch(`${RUNNER_URL}/jobs/${submission.id}?reason=${encodeURIComponent('assignment deleted')}`, { method: 'DELETE' })
+        .catch((err) => console.error(`[ASSIGNMENT] Failed to cancel submission ${submission.id}: ${err.message}`));
+    });
+
   if (removedAssignment?.origin === 'custom') {
     const customDir = path.join(customTasksDir, removedAssignment.slug);
     if (fs.existsSync(customDir)) {
@@ -334,6 +344,44 @@ app.delete('/api/assignments/:id', authRequired, teacherOnly, (req, res) => {
 });
 
 // Submission routes
+// Mutation testing of an assignment's tests (runs on the runner, takes a while)
+app.post('/api/assignments/:id/mutation', authRequired, teacherOnly, async (req, res) => {
+  const assignment = database.assignments.find((item) => item.id === parseInt(req.params.id));
+  if (!assignment) {
+    return res.status(404).json({ error: 'Assignment not found' });
+  }
+  try {
+    const response = await fetch(`${RUNNER_URL}/mutation`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({
+        slug: assignment.slug,
+        assignmentId: assignment.id,
+        // Custom assignments have no reference solution on the runner: the teacher sends one
+        solution: req.body?.solution
+      })
+    });
+    res.status(response.status).json(await response.json());
+  } catch (err) {
+    console.error(`[MUTATION] Failed to reach runner: ${err.message}`);
+    res.status(502).json({ error: 'Runner unavailable' });
+  }
+});
+
+app.get('/api/assignments/:id/mutation', authRequired, teacherOnly, async (req, res) => {
+  const assignment = database.assignments.find((item) => item.id === parseInt(req.params.id));
+  if (!assignment) {
+    return res.status(404).json({ error: 'Assignment not found' });
+  }
+  try {
+    const response = await fetch(`${RUNNER_URL}/mutation/${encodeURIComponent(assignment.slug)}`);
+    res.status(response.status).json(await response.json());
+  } catch (err) {
+    console.error(`[MUTATION] Failed to reach runner: ${err.message}`);
+    res.status(502).json({ error: 'Runner unavailable' });
+  }
+});
+
 app.post('/api/submissions', authRequired, upload.single('file'), (req, res) => {
   const { assignmentId } = req.body;
   
@@ -358,12 +406,16 @@ app.post('/api/submissions', authRequired, upload.single('file'), (req, res) =>
 // The submission is immediately added to the database and saved to disk.
 // Status is set to 'queued' until the runner processes it.
   
+  // Trace the submission end to end: runner spans and the callback carry this trace id
+  const span = startSpan(req.headers.traceparent);
+
   const submission = {
     id: database.submissions.length + 1,
     userId: req.user.id,
     assignmentId: parseInt(assignmentId),
     filename: req.file.filename,
     status: 'queued',
+    traceId: span.traceId,
     createdAt: new Date().toISOString()
   };
   
@@ -371,7 +423,7 @@ app.post('/api/submissions', authRequired, upload.single('file'), (req, res) =>
   saveDatabase();
   
   // Send to runner
-  console.log(`[SUBMISSION] Sending submission ${submission.id} to runner at ${RUNNER_URL}/run`);
+  console.log(`[SUBMISSION] Sending submission ${submission.id} to runner at ${RUNNER_URL}/run (trace ${span.traceId})`);
   console.log(`[SUBMISSION] Submission data:`, JSON.stringify({
     submissionId: submission.id,
     assignmentId: submission.assignmentId,
@@ -385,10 +437,11 @@ app.post('/api/submissions', authRequired, upload.single('file'), (req, res) =>
   
   fetch(`${RUNNER_URL}/run`, {
     method: 'POST',
-    headers: { 'Content-Type': 'application/json' },
+    headers: { 'Content-Type': 'application/json', traceparent: span.traceparent },
     body: JSON.stringify({
       submissionId: submission.id,
       assignmentId: submission.assignmentId,
+      userId: submission.userId,
       filename: req.file.filename
     })
   })
@@ -484,8 +537,10 @@ app.get('/api/submissions/:id', authRequired, (req, res) => {
 app.post('/api/runner/callback', (req, res) => {
   try {
     const { submissionId, status, score, totalTests, passedTests, feedback } = req.body;
+    const trace = parseTraceparent(req.headers.traceparent);
     
     console.log(`[CALLBACK] ===== RECEIVED CALLBACK =====`);
+    console.log(`[CALLBACK] trace: ${trace ? `${trace.traceId} (runner span ${trace.spanId})` : 'none'}`);
     console.log(`[CALLBACK] Full request body:`, JSON.stringify(req.body, null, 2));
     console.log(`[CALLBACK] submissionId: ${submissionId} (type: ${typeof submissionId})`);
     console.log(`[CALLBACK] status: ${status} (type: ${typeof status})`);
@@ -502,7 +557,31 @@ app.post('/api/runner/callback', (req, res) => {
     
     // Update submission status and score
     const submission = database.submissions.find(s => s.id === parseInt(submissionId));
+    if (status === 'cancelled') {
+      // Superseded by a newer submission or withdrawn: no grade, no result
+      if (submission) {
+        submission.status = 'cancelled';
+        saveDatabase();
+      }
+      console.log(`[CALLBACK] Submission ${submissionId} cancelled: ${feedback || ''}`);
+      return res.json({ ok: true, submissionId: parseInt(submissionId) });
+    }
+    if (status === 'provisional') {
+      // Smoke tier result: shown while the full suite is still running, never stored as the grade
+      if (submission && submission.status !== 'completed' && submission.status !== 'failed') {
+        submission.provisional = {
+          score: score !== undefined && score !== null ? score : 0,
+          totalTests: totalTests || 0,
+          passedTests: passedTests || 0,
+          feedback: feedback || ''
+        };
+        saveDatabase();
+      }
+      console.log(`[CALLBACK] Provisional result for submission ${submissionId}: ${passedTests}/${totalTests}`);
+      return res.json({ ok: true, submissionId: parseInt(submissionId) });
+    }
     if (submission) {
+      delete submission.provisional;
       // Map runner status to submission status
       // 'completed' from runner means tests ran successfully (even if some failed)
       // 'failed' from runner means execution error
@@ -540,6 +619,11 @@ app.post('/api/runner/callback', (req, res) => {
     const finalTotalTests = totalTests !== undefined && totalTests !== null ? totalTests : 0;
     const finalPassedTests = passedTests !== undefined && passedTests !== null ? passedTests : 0;
     const finalFeedback = feedback || '';
+    const resources = req.body.resources || null;
+    const complexity = req.body.complexity || null;
+    const memory = req.body.memory || null;
+    const analysis = req.body.analysis || null;
+    const partial = req.body.partial || null;
     
     if (result) {
       // Update existing result - always update, even if values are 0
@@ -547,6 +631,11 @@ app.post('/api/runner/callback', (req, res) => {
       result.totalTests = finalTotalTests;
       result.passedTests = finalPassedTests;
       result.feedback = finalFeedback;
+      result.resources = resources;
+      result.complexity = complexity;
+      result.memory = memory;
+      result.analysis = analysis;
+      result.partial = partial;
       console.log(`[CALLBACK] Updated existing result for submission ${submissionId}: score=${result.score}, status=${status}`);
     } else {
       // Create new result - always create, even if score is 0
@@ -557,6 +646,11 @@ app.post('/api/runner/callback', (req, res) => {
         totalTests: finalTotalTests,
         passedTests: finalPassedTests,
         feedback: finalFeedback,
+        resources,
+        complexity,
+        memory,
+        analysis,
+        partial,
         createdAt: new Date().toISOString()
       };
       database.results.push(result);
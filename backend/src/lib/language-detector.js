@@ -11,6 +11,22 @@ const LANGUAGE_CONFIGS = {
     timeout: 60,
     memoryLimit: '512m',
     cpuLimit: '1.0'
+  },
+  c: {
+    extensions: ['.c'],
+    testFramework: 'aca_test.h',
+    runner: 'c-runner',
+    timeout: 60,
+    memoryLimit: '512m',
+    cpuLimit: '1.0'
+  },
+  cpp: {
+    extensions: ['.cpp', '.cc', '.cxx'],
+    testFramework: 'aca_test.h',
+    runner: 'cpp-runner',
+    timeout: 60,
+    memoryLimit: '512m',
+    cpuLimit: '1.0'
   }
   // Future languages can be added here easily
   // java: { extensions: ['.java'], testFramework: 'junit', timeout: 120, ... },
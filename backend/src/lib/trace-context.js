@@ -0,0 +1,50 @@
+/**
+ * Trace Context Utility
+ * W3C traceparent handling so a submission can be followed from upload
+ * through the runner and back to the result callback
+ */
+
+const crypto = require('crypto');
+
+const TRACEPARENT_PATTERN = /^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$/;
+
+/**
+ * Parse a traceparent header
+ * @param {string} header - traceparent header value
+ * @returns {Object|null} { traceId, spanId, sampled } or null if missing/malformed
+ */
+function parseTraceparent(header) {
+  const match = TRACEPARENT_PATTERN.exec((header || '').trim().toLowerCase());
+  if (!match || /^0+$/.test(match[1]) || /^0+$/.test(match[2])) {
+    return null;
+  }
+  return {
+    traceId: match[1],
+    spanId: match[2],
+    sampled: (parseInt(match[3], 16) & 1) === 1
+  };
+}
+
+/**
+ * Start a span: continue the incoming trace or begin a new one
+ * @param {string} incoming - traceparent header of the incoming request (optional)
+ * @returns {Object} { traceId, spanId, parentSpanId, sampled, traceparent }
+ */
+function startSpan(incoming) {
+  const parent = parseTraceparent(incoming);
+  const traceId = parent ? parent.traceId : crypto.randomBytes(16).toString('hex');
+  const spanId = crypto.randomBytes(8).toString('hex');
+  const sampled = parent ? parent.sampled : true;
+  return {
+    traceId,
+    spanId,
+    parentSpanId: parent ? parent.spanId : null,
+    sampled,
+    traceparent: `00-${traceId}-${spanId}-${sampled ? '01' : '00'}`
+  };
+}
+
+module.exports = {
+  parseTraceparent,
+  startSpan
+};
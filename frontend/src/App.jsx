@@ -39,6 +39,11 @@ function getSubmissionStatusInfo(submission) {
   }
 
   if (submission.status === 'queued' || submission.status === 'processing') {
+    // Smoke tests already ran: show their result until the full suite is done
+    if (submission.provisional) {
+      const { passedTests, totalTests } = submission.provisional;
+      return { label: `In Bewertung (vorläufig ${passedTests}/${totalTests})`, className: 'status-queued' };
+    }
     return { label: 'In Bewertung', className: 'status-queued' };
   }
 
@@ -78,7 +83,8 @@ function getSubmissionStatusInfo(submission) {
       'queued': 'In Bewertung',
       'processing': 'In Bewertung',
       'completed': 'Abgeschlossen',
-      'failed': 'Fehlgeschlagen'
+      'failed': 'Fehlgeschlagen',
+      'cancelled': 'Abgebrochen'
     };
     return { 
       label: statusLabels[submission.status] || submission.status, 
@@ -0,0 +1,17 @@
+"""
+python -m runner grade ... from the repository root (from runner/ itself,
+runner.py takes the same command)
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+if __name__ == '__main__':
+    if sys.argv[1:2] != ['grade']:
+        print("usage: python -m runner grade <task or --tests dir> <zips> ... "
+              "(start the service with python runner/run.py)", file=sys.stderr)
+        sys.exit(2)
+    import grade
+    sys.exit(grade.main(sys.argv[2:]))
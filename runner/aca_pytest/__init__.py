@@ -0,0 +1,18 @@
+"""
+Runner-side pytest Plugins
+Loaded into the pytest child with `-p aca_pytest.<name>` (the runner puts
+its own directory on PYTHONPATH); each plugin is inert unless enabled
+"""
+
+import os
+from typing import Dict, List
+
+RUNNER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def plugin_options(name: str, env: Dict[str, str]) -> List[str]:
+    """Make aca_pytest importable in the child (updates env) and return the pytest args loading a plugin"""
+    paths = env.get('PYTHONPATH', '').split(os.pathsep) if env.get('PYTHONPATH') else []
+    if RUNNER_DIR not in paths:
+        env['PYTHONPATH'] = os.pathsep.join([RUNNER_DIR] + paths)
+    return ['-p', f'aca_pytest.{name}']
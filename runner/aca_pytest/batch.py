@@ -0,0 +1,202 @@
+"""
+pytest Plugin: one session, many submissions
+Collects the assignment's tests once, then runs the whole suite against each
+submission listed in $ACA_BATCH_FILE in turn:
+
+    [{"id": ..., "workdir": ..., "timeout": seconds, "output": result path}, ...]
+
+("archive": a submission zip to import from instead of the workdir.)
+
+Every submission runs in a child forked from the collected session, in its
+own process group, so nothing it changes (sys.modules, monkeypatched library
+modules, fixtures, signal handlers) reaches the session or the next
+submission. The child reports its test outcomes over a pipe as each test
+finishes; the parent kills the child when its timeout runs out and reports it
+as timed out, with the test it interrupted and the outcomes of the tests
+before it. The parent writes every result file itself once all children are
+gone (the batch file is removed before the first fork); the runner regrades
+submissions without a result individually.
+"""
+
+import json
+import os
+import select
+import signal
+import sys
+import time
+
+import pytest
+
+# Largest report a child may send (anything beyond is dropped)
+CHANNEL_MAX_BYTES = 16 * 1024 * 1024
+
+_channel = None
+_records = {}
+
+
+def _send(entry):
+    _channel.write(json.dumps(entry) + '\n')
+    _channel.flush()
+
+
+def pytest_runtest_logstart(nodeid, location):
+    if _channel is not None:
+        _send({'started': nodeid})
+
+
+def pytest_runtest_logreport(report):
+    if _channel is None:
+        return
+    record = _records.setdefault(report.nodeid, {'nodeid': report.nodeid, 'outcome': 'passed',
+                                                 'duration': 0.0, 'longrepr': ''})
+    record['duration'] += report.duration or 0.0
+    if report.failed:
+        # Like pytest-json-report: a broken fixture is an error, not a failure
+        record['outcome'] = 'failed' if report.when == 'call' or record['outcome'] == 'failed' else 'error'
+    elif report.skipped and record['outcome'] == 'passed':
+        record['outcome'] = 'skipped'
+    if report.longrepr and not record['longrepr']:
+        record['longrepr'] = report.longreprtext
+
+
+def pytest_runtest_logfinish(nodeid, location):
+    record = _records.pop(nodeid, None)
+    if _channel is not None and record is not None:
+        _send(record)
+
+
+def _child(session, submission, write_fd):
+    """Runs in the forked child: the whole suite against one submission, then exits"""
+    global _channel
+    os.setpgid(0, 0)
+    _channel = os.fdopen(write_fd, 'w', encoding='utf-8')
+    # Submissions imported straight from their zip put the archive where the workdir would go
+    sys.path.insert(0, submission.get('archive') or submission['workdir'])
+    os.chdir(submission['workdir'])
+    items = session.items
+    for index, item in enumerate(items):
+        # nextitem=None after the last test tears down every fixture
+        nextitem = items[index + 1] if index + 1 < len(items) else None
+        item.ihook.pytest_runtest_protocol(item=item, nextitem=nextitem)
+    _send({'done': True})
+
+
+def _kill(pid):
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _read(read_fd, received):
+    """Append what is waiting on the pipe to received; False at end of file"""
+    try:
+        chunk = os.read(read_fd, 65536)
+    except BlockingIOError:
+        return True
+    if chunk and len(received) < CHANNEL_MAX_BYTES:
+        received.extend(chunk)
+    return bool(chunk)
+
+
+def _run_submission(session, submission):
+    """Fork a child for one submission and collect its report; None if it ended without one"""
+    read_fd, write_fd = os.pipe()
+    sys.stdout.flush()
+    sys.stderr.flush()
+    start = time.perf_counter()
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            os.close(read_fd)
+            _child(session, submission, write_fd)
+        except BaseException:
+            code = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(code)
+    os.close(write_fd)
+
+    deadline = start + float(submission['timeout'])
+    received = bytearray()
+    open_pipe = True
+    timed_out = False
+    while True:
+        finished, _ = os.waitpid(pid, os.WNOHANG)
+        if finished:
+            break
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            timed_out = True
+            break
+        if open_pipe:
+            ready, _, _ = select.select([read_fd], [], [], min(remaining, 0.05))
+            if ready:
+                open_pipe = _read(read_fd, received)
+        else:
+            time.sleep(min(remaining, 0.01))
+    duration = time.perf_counter() - start
+    # Also reaches whatever the submission started
+    _kill(pid)
+    if timed_out:
+        os.waitpid(pid, 0)
+    os.set_blocking(read_fd, False)
+    while open_pipe and _read(read_fd, received):
+        pass
+    os.close(read_fd)
+
+    tests = {}
+    running = None
+    done = False
+    for line in bytes(received).decode('utf-8', 'replace').splitlines():
+        try:
+            entry = json.loads(line)
+        except json.JSONDecodeError:
+            break
+        if not isinstance(entry, dict):
+            break
+        if entry.get('done'):
+            done = True
+        elif 'started' in entry:
+            running = entry['started']
+        elif 'nodeid' in entry:
+            tests[entry['nodeid']] = entry
+            running = None
+    if not (done or timed_out):
+        return None  # crashed: graded again on its own
+    return {'id': submission['id'], 'duration': duration, 'timed_out': timed_out and not done,
+            'tests': list(tests.values()), 'collected': [item.nodeid for item in session.items],
+            'interrupted': running if timed_out and not done else None}
+
+
+def pytest_runtestloop(session):
+    path = os.environ.get('ACA_BATCH_FILE')
+    if not path:
+        return None
+    if session.testsfailed and not session.config.option.continue_on_collection_errors:
+        # Collection errors: leave every submission to an individual run
+        raise session.Interrupted(f"{session.testsfailed} errors during collection")
+    with open(path, 'r', encoding='utf-8') as f:
+        submissions = json.load(f)
+    # Children need not know where the other results go
+    os.remove(path)
+    del os.environ['ACA_BATCH_FILE']
+
+    results = [(submission['output'], _run_submission(session, submission)) for submission in submissions]
+    for output, result in results:
+        if result is None:
+            if os.path.exists(output):
+                os.remove(output)
+            continue
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(result, f)
+    return True
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_configure(config):
+    if os.environ.get('ACA_BATCH_FILE'):
+        # Cached bytecode of same-named, same-sized student files must never be mixed up
+        sys.dont_write_bytecode = True
@@ -0,0 +1,109 @@
+"""
+pytest Plugin: zero-copy access to the task's shared dataset
+The runner publishes a task's data/ directory once, read-only, and points
+$ACA_DATA_DIR at it (see datasets.py). Files are memory-mapped, and each file
+is mapped once per test process, so jobs running at the same time share the
+same physical pages.
+
+In tests, use the `aca_data` fixture:
+
+    def test_large_input(aca_data):
+        view = aca_data.view('measurements.csv')     # memoryview, no copy
+        for line in aca_data.lines('measurements.csv'):
+            ...
+
+or the module functions (`from aca_pytest.data import data_view`).
+"""
+
+import mmap
+import os
+
+import pytest
+
+_maps = {}
+
+
+def data_dir():
+    """The dataset directory: $ACA_DATA_DIR, else ./data (running the tests by hand)"""
+    return os.environ.get('ACA_DATA_DIR') or os.path.abspath('data')
+
+
+def data_path(name):
+    """Absolute path of a dataset file; names may not leave the dataset"""
+    root = os.path.realpath(data_dir())
+    path = os.path.realpath(os.path.join(root, name))
+    if os.path.commonpath([root, path]) != root:
+        raise ValueError(f"{name} is outside the dataset")
+    return path
+
+
+def data_map(name):
+    """Read-only mmap of a dataset file, shared by all callers in this process"""
+    path = data_path(name)
+    mapped = _maps.get(path)
+    if mapped is None:
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b''  # empty files cannot be mapped
+            mapped = _maps[path] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return mapped
+
+
+def data_view(name):
+    """memoryview over a dataset file (slicing it copies nothing)"""
+    return memoryview(data_map(name))
+
+
+def data_lines(name, encoding='utf-8'):
+    """Iterate the decoded lines of a dataset file, straight from the mapping"""
+    mapped = data_map(name)
+    start = 0
+    size = len(mapped)
+    while start < size:
+        end = mapped.find(b'\n', start)
+        if end == -1:
+            end = size
+        yield mapped[start:end].decode(encoding).rstrip('\r')
+        start = end + 1
+
+
+def data_array(name, dtype='float64', offset=0):
+    """numpy array backed by a binary dataset file (read-only, no copy); needs numpy"""
+    import numpy as np
+    return np.frombuffer(data_map(name), dtype=dtype, offset=offset)
+
+
+class Dataset:
+    """What the aca_data fixture returns"""
+
+    path = staticmethod(data_path)
+    map = staticmethod(data_map)
+    view = staticmethod(data_view)
+    lines = staticmethod(data_lines)
+    array = staticmethod(data_array)
+
+    @property
+    def root(self):
+        return data_dir()
+
+    def files(self):
+        """Dataset file names, relative to the dataset root"""
+        root = data_dir()
+        return sorted(os.path.relpath(os.path.join(base, name), root)
+                      for base, _, names in os.walk(root, followlinks=True) for name in names)
+
+
+@pytest.fixture(scope='session')
+def aca_data():
+    if not os.path.isdir(data_dir()):
+        pytest.skip('task dataset not available')
+    return Dataset()
+
+
+def pytest_unconfigure(config):
+    for mapped in _maps.values():
+        try:
+            mapped.close()
+        except BufferError:
+            pass  # a test still holds a view; the mapping goes away with the process
+    _maps.clear()
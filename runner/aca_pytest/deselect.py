@@ -0,0 +1,19 @@
+"""
+pytest Plugin: deselect exact node ids
+Drops the node ids listed (one per line) in $ACA_DESELECT_FILE. Unlike
+--deselect, which matches prefixes, deselecting test_fizz keeps test_fizzbuzz.
+"""
+
+import os
+
+
+def pytest_collection_modifyitems(session, config, items):
+    path = os.environ.get('ACA_DESELECT_FILE')
+    if not path:
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        nodeids = {line.strip() for line in f if line.strip()}
+    deselected = [item for item in items if item.nodeid in nodeids]
+    if deselected:
+        items[:] = [item for item in items if item.nodeid not in nodeids]
+        config.hook.pytest_deselected(items=deselected)
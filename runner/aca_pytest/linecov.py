@@ -0,0 +1,79 @@
+"""
+pytest Plugin: per-test line coverage of one module
+Records which lines of $ACA_LINECOV_TARGET every test executes, and which
+run outside of tests (imports during collection), and writes them to
+$ACA_LINECOV_OUTPUT as {"session": [...], "tests": {nodeid: {...}}}
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+_target = None
+_current = None
+_session_lines = set()
+_tests = {}
+_code_matches = {}
+
+
+def _is_target(code):
+    matches = _code_matches.get(code)
+    if matches is None:
+        matches = _code_matches[code] = os.path.realpath(code.co_filename) == _target
+    return matches
+
+
+def _global_trace(frame, event, arg):
+    if not _is_target(frame.f_code):
+        return None
+    _current.add(frame.f_lineno)
+    return _local_trace
+
+
+def _local_trace(frame, event, arg):
+    if event == 'line':
+        _current.add(frame.f_lineno)
+    return _local_trace
+
+
+def pytest_configure(config):
+    global _target, _current
+    if os.environ.get('ACA_LINECOV_TARGET') and os.environ.get('ACA_LINECOV_OUTPUT'):
+        _target = os.path.realpath(os.environ['ACA_LINECOV_TARGET'])
+        _current = _session_lines
+        sys.settrace(_global_trace)
+        threading.settrace(_global_trace)
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_protocol(item, nextitem):
+    global _current
+    if _target is None:
+        yield
+        return
+    lines = set()
+    _current = lines
+    start = time.perf_counter()
+    yield
+    _current = _session_lines
+    record = _tests.setdefault(item.nodeid, {'outcome': 'passed'})
+    record['lines'] = sorted(lines)
+    record['duration'] = round(time.perf_counter() - start, 6)
+
+
+def pytest_runtest_logreport(report):
+    if _target is not None and (report.failed or report.skipped):
+        _tests.setdefault(report.nodeid, {})['outcome'] = 'failed' if report.failed else 'skipped'
+
+
+def pytest_unconfigure(config):
+    if _target is None:
+        return
+    sys.settrace(None)
+    threading.settrace(None)
+    with open(os.environ['ACA_LINECOV_OUTPUT'], 'w', encoding='utf-8') as f:
+        json.dump({'session': sorted(_session_lines), 'tests': _tests}, f)
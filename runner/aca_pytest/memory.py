@@ -0,0 +1,151 @@
+"""
+pytest Plugin: per-test memory of the submission's code
+Traces allocations with tracemalloc while each test runs and records its
+peak and net allocated bytes (net: allocated during the test and still held
+at its end). With $ACA_MEMORY_LIMIT (bytes) a test whose peak exceeds it fails.
+
+A test that peaks at $ACA_MEMORY_THRESHOLD bytes or more (or over the limit)
+also gets the submission lines holding the most memory at its peak
+(allocations made by the library or the tests are credited to the innermost
+submission frame that led to them). While the test runs, a trace function on
+the submission's frames takes a snapshot whenever the traced memory climbs
+half as high again as at the last one, so memory freed before the test ends
+(a large temporary list) still shows up where it was allocated. Tests that
+stay below the threshold take no snapshot at all. Tracing is on only while a
+test runs, so pytest itself is not slowed down.
+
+Writes {nodeid: {"peak": ..., "net": ..., "sites": [...]}} to $ACA_MEMORY_OUTPUT;
+files under $ACA_MEMORY_ROOT count as the submission, except its tests/.
+"""
+
+import json
+import os
+import sys
+import tracemalloc
+
+import pytest
+
+_root = None
+_tests_dir = None
+_limit = None
+_threshold = 1024 * 1024
+_top = 5
+_frames = 10
+_results = {}
+_submission_files = {}
+
+# Highest snapshot of the running test, the traced memory it was taken at and the one that triggers the next
+_peak_snapshot = None
+_peak_level = 0
+_next_level = None
+
+
+def _is_submission(filename):
+    known = _submission_files.get(filename)
+    if known is None:
+        path = os.path.realpath(filename)
+        known = _submission_files[filename] = (
+            path.startswith(_root) and not path.startswith(_tests_dir) and path.endswith('.py'))
+    return known
+
+
+def _format_bytes(size):
+    for unit in ('B', 'KiB', 'MiB'):
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+
+def _sites(snapshot):
+    """Submission lines by memory held in snapshot (tracing starts with each test)"""
+    sites = {}
+    for stat in snapshot.statistics('traceback'):
+        # Frames run from the oldest to the most recent call
+        frame = next((frame for frame in reversed(stat.traceback) if _is_submission(frame.filename)), None)
+        if frame is None:
+            continue
+        key = (os.path.relpath(os.path.realpath(frame.filename), _root), frame.lineno)
+        site = sites.setdefault(key, {'file': key[0], 'line': key[1], 'size': 0, 'count': 0})
+        site['size'] += stat.size
+        site['count'] += stat.count
+    return sorted(sites.values(), key=lambda site: -site['size'])[:_top]
+
+
+def _watch(frame, event, arg):
+    """Local trace function of submission frames: snapshot each new high of the traced memory"""
+    global _peak_snapshot, _peak_level, _next_level
+    current = tracemalloc.get_traced_memory()[0]
+    if current >= _next_level:
+        _peak_snapshot = None  # free the last one before copying the traces again
+        _peak_snapshot = tracemalloc.take_snapshot()
+        _peak_level = current
+        _next_level = current + current // 2
+    return _watch
+
+
+def _watch_calls(frame, event, arg):
+    if not _is_submission(frame.f_code.co_filename):
+        return None
+    return _watch(frame, event, arg)
+
+
+def pytest_configure(config):
+    global _root, _tests_dir, _limit, _threshold, _top, _frames
+    if not os.environ.get('ACA_MEMORY_OUTPUT'):
+        return
+    _root = os.path.realpath(os.environ.get('ACA_MEMORY_ROOT') or os.getcwd()) + os.sep
+    _tests_dir = os.path.join(_root, 'tests') + os.sep
+    _limit = int(os.environ['ACA_MEMORY_LIMIT']) if os.environ.get('ACA_MEMORY_LIMIT') else None
+    _threshold = int(os.environ.get('ACA_MEMORY_THRESHOLD', _threshold))
+    _top = int(os.environ.get('ACA_MEMORY_TOP', '5'))
+    _frames = int(os.environ.get('ACA_MEMORY_FRAMES', '10'))
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_call(item):
+    if _root is None:
+        yield
+        return
+    global _peak_snapshot, _next_level
+    report_from = min(_threshold, _limit + 1) if _limit is not None else _threshold
+    _peak_snapshot = None
+    _next_level = report_from
+    # Only what the test allocates is traced: no snapshot to compare against, and pytest
+    # itself (and the grouping below) runs untraced
+    tracemalloc.start(_frames)
+    # Another trace function (a debugger, coverage) keeps its place; sites then come from the end
+    watching = sys.gettrace() is None
+    if watching:
+        sys.settrace(_watch_calls)
+    try:
+        outcome = yield
+    finally:
+        if watching:
+            sys.settrace(None)
+    current, peak = tracemalloc.get_traced_memory()
+    snapshot = None
+    if peak >= report_from:
+        # What the test still holds, unless it held more at the last snapshot
+        snapshot = _peak_snapshot if _peak_snapshot is not None and current < _peak_level \
+            else tracemalloc.take_snapshot()
+    _peak_snapshot = None
+    tracemalloc.stop()
+    record = {'peak': peak, 'net': current, 'sites': _sites(snapshot) if snapshot is not None else []}
+    del snapshot
+    if _limit is not None and record['peak'] > _limit:
+        record['limit_exceeded'] = True
+        if outcome.excinfo is None:
+            top = record['sites'][0] if record['sites'] else None
+            where = f" (most held at {top['file']}:{top['line']})" if top else ''
+            outcome.force_exception(pytest.fail.Exception(
+                f"Memory limit exceeded: peak {_format_bytes(record['peak'])} > "
+                f"{_format_bytes(_limit)}{where}", pytrace=False))
+    _results[item.nodeid] = record
+
+
+def pytest_unconfigure(config):
+    if _root is None:
+        return
+    with open(os.environ['ACA_MEMORY_OUTPUT'], 'w', encoding='utf-8') as f:
+        json.dump(_results, f)
@@ -0,0 +1,24 @@
+"""
+pytest Plugin: sample the whole test session
+Writes collapsed stacks to $ACA_PROFILE_OUTPUT when the session ends
+"""
+
+import os
+from aca_pytest.sampling import StackSampler
+
+_sampler = None
+
+
+def pytest_configure(config):
+    global _sampler
+    output = os.environ.get('ACA_PROFILE_OUTPUT')
+    if output and _sampler is None:
+        interval = float(os.environ.get('ACA_PROFILE_INTERVAL', '0.005'))
+        _sampler = StackSampler(interval).start()
+
+
+def pytest_unconfigure(config):
+    global _sampler
+    if _sampler is not None:
+        _sampler.stop().write_collapsed(os.environ['ACA_PROFILE_OUTPUT'])
+        _sampler = None
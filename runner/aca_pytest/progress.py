@@ -0,0 +1,67 @@
+"""
+pytest Plugin: per-test outcomes as the run goes
+Appends one JSON line per event to $ACA_PROGRESS_OUTPUT and flushes it at
+once, so a run killed part-way (timeout, crash, out of memory) still shows
+which tests finished and which one was running:
+
+    {"collected": [nodeid, ...]}
+    {"started": nodeid}
+    {"nodeid": ..., "outcome": ..., "duration": ..., "longrepr": ...}
+
+Outcomes follow pytest-json-report (a broken fixture is an error).
+"""
+
+import json
+import os
+
+_file = None
+_records = {}
+
+
+def _write(entry):
+    _file.write(json.dumps(entry) + '\n')
+    _file.flush()
+
+
+def pytest_configure(config):
+    global _file
+    path = os.environ.get('ACA_PROGRESS_OUTPUT')
+    if path:
+        _file = open(path, 'a', encoding='utf-8')
+
+
+def pytest_collection_finish(session):
+    if _file is not None:
+        _write({'collected': [item.nodeid for item in session.items]})
+
+
+def pytest_runtest_logstart(nodeid, location):
+    if _file is not None:
+        _write({'started': nodeid})
+
+
+def pytest_runtest_logreport(report):
+    if _file is None:
+        return
+    record = _records.setdefault(report.nodeid, {'nodeid': report.nodeid, 'outcome': 'passed',
+                                                 'duration': 0.0, 'longrepr': ''})
+    record['duration'] += report.duration or 0.0
+    if report.failed:
+        record['outcome'] = 'failed' if report.when == 'call' or record['outcome'] == 'failed' else 'error'
+    elif report.skipped and record['outcome'] == 'passed':
+        record['outcome'] = 'skipped'
+    if report.longrepr and not record['longrepr']:
+        record['longrepr'] = report.longreprtext
+
+
+def pytest_runtest_logfinish(nodeid, location):
+    record = _records.pop(nodeid, None)
+    if _file is not None and record is not None:
+        _write(record)
+
+
+def pytest_unconfigure(config):
+    global _file
+    if _file is not None:
+        _file.close()
+        _file = None
@@ -0,0 +1,71 @@
+"""
+Sampling Stack Profiler
+A background thread snapshots Python stacks at a fixed interval and counts
+them in collapsed-stack form ("outer;inner;leaf count"), which flamegraph
+tools read directly
+"""
+
+import os
+import sys
+import threading
+import time
+from typing import Dict, Optional
+
+
+def frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples one thread (or every thread but its own) until stopped"""
+
+    def __init__(self, interval: float = 0.005, thread_id: Optional[int] = None):
+        self.interval = interval
+        self.thread_id = thread_id
+        self.stacks: Dict[str, int] = {}
+        self.samples = 0
+        self.started_at = 0.0
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> 'StackSampler':
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name='aca-stack-sampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> 'StackSampler':
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.elapsed = time.perf_counter() - self.started_at
+        return self
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            names = {t.ident: t.name for t in threading.enumerate()}
+            if self.thread_id is not None:
+                frames = {self.thread_id: frames[self.thread_id]} if self.thread_id in frames else {}
+            for ident, frame in frames.items():
+                if ident == own_id:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(frame_label(frame))
+                    frame = frame.f_back
+                if self.thread_id is None and ident != threading.main_thread().ident:
+                    labels.append(f"thread {names.get(ident, ident)}")
+                stack = ';'.join(reversed(labels))
+                self.stacks[stack] = self.stacks.get(stack, 0) + 1
+            self.samples += 1
+
+    def write_collapsed(self, path: str):
+        """Write 'frame;frame;frame count' lines, hottest stacks first"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in sorted(self.stacks.items(), key=lambda item: -item[1]):
+                f.write(f"{stack} {count}\n")
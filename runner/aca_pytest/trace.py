@@ -0,0 +1,71 @@
+"""
+pytest Plugin: per-test spans under $TRACEPARENT
+Writes span dicts (same shape as tracing.Span.to_dict) to $ACA_TRACE_OUTPUT
+for the runner to export
+"""
+
+import json
+import os
+import re
+import time
+
+import pytest
+
+_TRACEPARENT = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$')
+
+_session = None
+_outcomes = {}
+
+
+def _span(name, trace_id, parent_id, start_ns, end_ns, attributes, error=None):
+    return {
+        'traceId': trace_id,
+        'spanId': os.urandom(8).hex(),
+        'parentSpanId': parent_id,
+        'name': name,
+        'service': os.environ.get('ACA_TRACE_SERVICE', 'aca-runner'),
+        'startTimeUnixNano': start_ns,
+        'endTimeUnixNano': end_ns,
+        'attributes': attributes,
+        'error': error
+    }
+
+
+def _write(span):
+    with open(os.environ['ACA_TRACE_OUTPUT'], 'a', encoding='utf-8') as f:
+        f.write(json.dumps(span, separators=(',', ':')) + '\n')
+
+
+def pytest_configure(config):
+    global _session
+    match = _TRACEPARENT.match(os.environ.get('TRACEPARENT', ''))
+    if match and os.environ.get('ACA_TRACE_OUTPUT'):
+        _session = _span('pytest.session', match.group(1), match.group(2), time.time_ns(), None,
+                         {'process.pid': os.getpid()})
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_protocol(item, nextitem):
+    if _session is None:
+        yield
+        return
+    start = time.time_ns()
+    outcome = yield
+    error = None
+    if outcome.excinfo:
+        error = repr(outcome.excinfo[1])
+    _write(_span('pytest.test', _session['traceId'], _session['spanId'], start, time.time_ns(),
+                 {'test.nodeid': item.nodeid, 'test.outcome': _outcomes.pop(item.nodeid, 'unknown')}, error))
+
+
+def pytest_runtest_logreport(report):
+    if _session is not None and (report.when == 'call' or report.failed):
+        _outcomes[report.nodeid] = report.outcome
+
+
+def pytest_unconfigure(config):
+    global _session
+    if _session is not None:
+        _session['endTimeUnixNano'] = time.time_ns()
+        _write(_session)
+        _session = None
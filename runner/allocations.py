@@ -0,0 +1,103 @@
+"""
+Per-Test Memory Instrumentation
+Optional mode that runs the tests under the aca_pytest.memory plugin
+(tracemalloc): every test record gets its peak and net allocated bytes,
+tests peaking at thresholdMb or more also the submission lines holding the
+most memory at the peak, and an assignment can set a per-test limit that
+fails the test. Enabled per assignment in task.json:
+
+    {"memory": {"enabled": true, "limitMb": 256, "thresholdMb": 1, "top": 5, "frames": 10}}
+
+or for a single job with "memory": true in the /run payload (no limit
+unless the task sets one). Tracing every allocation with its call stack
+makes allocation-heavy tests ten times slower or more (a test building a
+list of a million integers: under a second without it, seven with it), so
+it stays off unless asked for.
+"""
+
+import json
+import os
+from typing import Dict, List, Any, Optional
+
+from aca_pytest import plugin_options
+
+DEFAULT_TOP = 5
+DEFAULT_FRAMES = 10
+DEFAULT_THRESHOLD_MB = 1
+
+
+def memory_config(task_metadata: Dict[str, Any], requested: Any = None) -> Optional[Dict[str, Any]]:
+    """The job's memory settings; None when instrumentation is off"""
+    config = task_metadata.get('memory') if task_metadata else None
+    config = config if isinstance(config, dict) else {}
+    if not (config.get('enabled') or requested):
+        return None
+    limit_mb = config.get('limitMb')
+    return {
+        'limit_bytes': int(float(limit_mb) * 1024 * 1024) if limit_mb else None,
+        'threshold_bytes': int(float(config.get('thresholdMb', DEFAULT_THRESHOLD_MB)) * 1024 * 1024),
+        'top': int(config.get('top', DEFAULT_TOP)),
+        'frames': int(config.get('frames', DEFAULT_FRAMES))
+    }
+
+
+def pytest_memory_options(config: Dict[str, Any], workdir: str, output_path: str,
+                          env: Dict[str, str]) -> List[str]:
+    """Enable the plugin for a run in workdir; updates env in place and returns extra pytest args"""
+    env['ACA_MEMORY_OUTPUT'] = output_path
+    env['ACA_MEMORY_ROOT'] = workdir
+    env['ACA_MEMORY_TOP'] = str(config['top'])
+    env['ACA_MEMORY_FRAMES'] = str(config['frames'])
+    env['ACA_MEMORY_THRESHOLD'] = str(config['threshold_bytes'])
+    if config['limit_bytes']:
+        env['ACA_MEMORY_LIMIT'] = str(config['limit_bytes'])
+    return plugin_options('memory', env)
+
+
+def attach_memory(test_records: List[Dict[str, Any]], output_path: str) -> List[Dict[str, Any]]:
+    """Add the plugin's per-test measurements to test records (records it has none for stay as they are)"""
+    if not os.path.exists(output_path):
+        return test_records
+    try:
+        with open(output_path, 'r', encoding='utf-8') as f:
+            measured = json.load(f)
+    except (json.JSONDecodeError, IOError) as e:
+        print(f"ERROR: Could not read memory measurements {output_path}: {e}")
+        return test_records
+    return [dict(record, memory=measured[record['nodeid']]) if record['nodeid'] in measured else record
+            for record in test_records]
+
+
+def format_bytes(size: float) -> str:
+    for unit in ('B', 'KiB', 'MiB'):
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+
+def memory_summary(test_records: List[Dict[str, Any]], config: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """The result's 'memory' block: the heaviest test and the tests over the limit"""
+    measured = [record for record in test_records if record.get('memory')]
+    if not measured:
+        return None
+    heaviest = max(measured, key=lambda record: record['memory']['peak'])
+    return {
+        'peak': heaviest['memory']['peak'],
+        'test': heaviest['nodeid'],
+        'sites': heaviest['memory']['sites'],
+        'limit': config['limit_bytes'],
+        'exceeded': [record['nodeid'] for record in measured if record['memory'].get('limit_exceeded')]
+    }
+
+
+def memory_feedback(summary: Optional[Dict[str, Any]]) -> str:
+    """One feedback line naming the test with the highest peak and where its memory was held"""
+    if not summary:
+        return ''
+    site = summary['sites'][0] if summary['sites'] else None
+    where = f", most held at {site['file']}:{site['line']} ({format_bytes(site['size'])})" if site else ''
+    line = f"Memory: peak {format_bytes(summary['peak'])} in {summary['test']}{where}"
+    if summary['exceeded']:
+        line += f"\n  {len(summary['exceeded'])} test(s) exceeded the {format_bytes(summary['limit'])} limit"
+    return line
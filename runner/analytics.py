@@ -0,0 +1,405 @@
+"""
+Teacher Analytics Aggregates
+Running per-assignment and per-test aggregates, updated as each result
+arrives so dashboards never have to recompute over all submissions
+
+Each result appends a small delta (the fields the aggregates use) to a log
+next to the snapshot; the whole snapshot is only rewritten every
+ANALYTICS_SNAPSHOT_RUNS results or ANALYTICS_SNAPSHOT_SECONDS seconds and
+on shutdown (flush). Loading replays the log entries the snapshot does not
+include yet.
+"""
+
+import csv
+import io
+import json
+import math
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Any, Optional, Iterable
+
+ANALYTICS_SNAPSHOT_RUNS = int(os.getenv('ANALYTICS_SNAPSHOT_RUNS', 500))
+ANALYTICS_SNAPSHOT_SECONDS = float(os.getenv('ANALYTICS_SNAPSHOT_SECONDS', 60))
+
+SCORE_BINS = 10
+MAX_FAILURE_CLUSTERS = 50
+QUANTILES = (0.5, 0.9, 0.99)
+
+_NUMBER = re.compile(r'-?\b\d+(?:\.\d+)?(?:e[-+]?\d+)?\b', re.IGNORECASE)
+_QUOTED = re.compile(r"'[^']*'|\"[^\"]*\"")
+_ADDRESS = re.compile(r'0x[0-9a-f]+', re.IGNORECASE)
+_SPACE = re.compile(r'\s+')
+
+
+def failure_signature(message: str) -> str:
+    """Normalize a failure message so that failures differing only in values group together"""
+    signature = _ADDRESS.sub('<addr>', message or '')
+    signature = _QUOTED.sub('<str>', signature)
+    signature = _NUMBER.sub('<num>', signature)
+    signature = signature.replace('E   ', ' ')
+    return _SPACE.sub(' ', signature).strip()[:200] or '<no message>'
+
+
+class QuantileSketch:
+    """
+    Relative-error quantile sketch (DDSketch style): values fall into
+    logarithmic buckets, so memory stays small and quantiles are accurate
+    to within `relative_accuracy` of the true value
+    """
+
+    def __init__(self, relative_accuracy: float = 0.02, min_value: float = 1e-6):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.min_value = min_value
+        self.buckets: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        if value <= self.min_value:
+            self.zero_count += 1
+            return
+        key = int(math.ceil(math.log(value) / self.log_gamma))
+        self.buckets[key] = self.buckets.get(key, 0) + 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if seen > rank:
+                # Midpoint of the bucket (gamma^(k-1), gamma^k] in relative terms
+                return min(2 * self.gamma ** key / (self.gamma + 1), self.max)
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'buckets': {str(k): v for k, v in self.buckets.items()},
+            'zero_count': self.zero_count,
+            'count': self.count,
+            'total': self.total,
+            'max': self.max
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'QuantileSketch':
+        sketch = cls(data.get('relative_accuracy', 0.02))
+        sketch.buckets = {int(k): v for k, v in data.get('buckets', {}).items()}
+        sketch.zero_count = data.get('zero_count', 0)
+        sketch.count = data.get('count', 0)
+        sketch.total = data.get('total', 0.0)
+        sketch.max = data.get('max', 0.0)
+        return sketch
+
+
+class TestAggregate:
+    """Running statistics for one test node id"""
+
+    def __init__(self):
+        self.runs = 0
+        self.outcomes: Dict[str, int] = {}
+        self.durations = QuantileSketch()
+        self.failure_clusters: Dict[str, Dict[str, Any]] = {}
+
+    def add(self, test: Dict[str, Any]):
+        outcome = test.get('outcome', 'unknown')
+        self.runs += 1
+        self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+        if test.get('duration') is not None:
+            self.durations.add(float(test['duration']))
+        if outcome not in ('passed', 'skipped'):
+            self._add_failure(test.get('message', ''))
+
+    def _add_failure(self, message: str):
+        signature = failure_signature(message)
+        cluster = self.failure_clusters.get(signature)
+        if cluster is None:
+            if len(self.failure_clusters) >= MAX_FAILURE_CLUSTERS:
+                # Keep memory bounded: fold rare messages into one bucket
+                signature = '<other>'
+                cluster = self.failure_clusters.setdefault(signature, {'count': 0, 'example': ''})
+            else:
+                cluster = self.failure_clusters[signature] = {'count': 0, 'example': (message or '')[:300]}
+        cluster['count'] += 1
+
+    @property
+    def pass_rate(self) -> float:
+        return self.outcomes.get('passed', 0) / self.runs if self.runs else 0.0
+
+    def summary(self, top_clusters: int = 5) -> Dict[str, Any]:
+        clusters = sorted(self.failure_clusters.items(), key=lambda item: -item[1]['count'])
+        return {
+            'runs': self.runs,
+            'outcomes': dict(self.outcomes),
+            'passRate': round(self.pass_rate, 4),
+            'duration': {f'p{int(q * 100)}': self.durations.quantile(q) for q in QUANTILES},
+            'failureClusters': [
+                {'signature': signature, 'count': cluster['count'], 'example': cluster['example']}
+                for signature, cluster in clusters[:top_clusters]
+            ]
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'runs': self.runs,
+            'outcomes': self.outcomes,
+            'durations': self.durations.to_dict(),
+            'failure_clusters': self.failure_clusters
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'TestAggregate':
+        aggregate = cls()
+        aggregate.runs = data.get('runs', 0)
+        aggregate.outcomes = data.get('outcomes', {})
+        aggregate.durations = QuantileSketch.from_dict(data.get('durations', {}))
+        aggregate.failure_clusters = data.get('failure_clusters', {})
+        return aggregate
+
+
+class AssignmentAggregate:
+    """Running statistics for one assignment"""
+
+    def __init__(self):
+        self.runs = 0
+        self.statuses: Dict[str, int] = {}
+        self.score_histogram = [0] * SCORE_BINS
+        # Latest score bin per student, so the histogram counts students, not attempts
+        self.latest_bins: Dict[str, int] = {}
+        self.tests: Dict[str, TestAggregate] = {}
+
+    def add(self, run: Dict[str, Any]):
+        self.runs += 1
+        status = run.get('status', 'unknown')
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+
+        score = max(0.0, min(1.0, float(run.get('score') or 0.0)))
+        score_bin = min(SCORE_BINS - 1, int(score * SCORE_BINS))
+        student = str(run.get('userId') if run.get('userId') is not None else f"submission-{run.get('submissionId')}")
+        previous = self.latest_bins.get(student)
+        if previous is not None:
+            self.score_histogram[previous] -= 1
+        self.score_histogram[score_bin] += 1
+        self.latest_bins[student] = score_bin
+
+        for test in run.get('tests', []):
+            nodeid = test.get('nodeid')
+            # Tests a cut-short run never started say nothing about the test
+            if nodeid and test.get('outcome') != 'not-run':
+                self.tests.setdefault(nodeid, TestAggregate()).add(test)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'runs': self.runs,
+            'students': len(self.latest_bins),
+            'statuses': dict(self.statuses),
+            'scoreHistogram': [
+                {'range': [i / SCORE_BINS, (i + 1) / SCORE_BINS], 'count': count}
+                for i, count in enumerate(self.score_histogram)
+            ],
+            'tests': {nodeid: aggregate.summary() for nodeid, aggregate in sorted(self.tests.items())}
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'runs': self.runs,
+            'statuses': self.statuses,
+            'score_histogram': self.score_histogram,
+            'latest_bins': self.latest_bins,
+            'tests': {nodeid: aggregate.to_dict() for nodeid, aggregate in self.tests.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'AssignmentAggregate':
+        aggregate = cls()
+        aggregate.runs = data.get('runs', 0)
+        aggregate.statuses = data.get('statuses', {})
+        aggregate.score_histogram = data.get('score_histogram', [0] * SCORE_BINS)
+        aggregate.latest_bins = data.get('latest_bins', {})
+        aggregate.tests = {k: TestAggregate.from_dict(v) for k, v in data.get('tests', {}).items()}
+        return aggregate
+
+
+EXPORT_COLUMNS = ['assignment_id', 'nodeid', 'runs', 'passed', 'failed', 'pass_rate',
+                  'duration_p50', 'duration_p90', 'duration_p99', 'top_failure', 'top_failure_count']
+
+
+def run_delta(run: Dict[str, Any]) -> Dict[str, Any]:
+    """The fields of a run that AssignmentAggregate.add uses"""
+    return {
+        'assignmentId': run.get('assignmentId'),
+        'submissionId': run.get('submissionId'),
+        'userId': run.get('userId'),
+        'status': run.get('status'),
+        'score': run.get('score'),
+        'tests': [{key: test.get(key) for key in ('nodeid', 'outcome', 'duration', 'message') if key in test}
+                  for test in run.get('tests', [])]
+    }
+
+
+class Analytics:
+    """
+    All assignment aggregates, persisted as a snapshot file plus a log of the runs since
+    Args:
+        snapshot_path: Snapshot file; the log is snapshot_path + '.log'
+        snapshot_runs: Logged runs after which the snapshot is rewritten
+        snapshot_seconds: Age after which the next run rewrites the snapshot
+    """
+
+    def __init__(self, snapshot_path: str, snapshot_runs: int = ANALYTICS_SNAPSHOT_RUNS,
+                 snapshot_seconds: float = ANALYTICS_SNAPSHOT_SECONDS):
+        self.snapshot_path = snapshot_path
+        self.log_path = snapshot_path + '.log'
+        self.snapshot_runs = max(1, snapshot_runs)
+        self.snapshot_seconds = snapshot_seconds
+        self.assignments: Dict[str, AssignmentAggregate] = {}
+        self._lock = threading.Lock()
+        # Number of the last logged run, and of the last one the snapshot includes
+        self._sequence = 0
+        self._saved_sequence = 0
+        self._saved_at = time.time()
+        self._log = None
+        self._load()
+
+    @property
+    def loaded_from_snapshot(self) -> bool:
+        return os.path.exists(self.snapshot_path) or os.path.exists(self.log_path)
+
+    def record(self, run: Dict[str, Any], persist: bool = True):
+        """Fold one grading run into the aggregates"""
+        key = str(run.get('assignmentId'))
+        with self._lock:
+            self.assignments.setdefault(key, AssignmentAggregate()).add(run)
+            if not persist:
+                return
+            self._sequence += 1
+            self._append(dict(run_delta(run), seq=self._sequence))
+            if self._sequence - self._saved_sequence >= self.snapshot_runs or \
+                    time.time() - self._saved_at >= self.snapshot_seconds:
+                self._save()
+
+    def rebuild(self, runs: Iterable[Dict[str, Any]]):
+        """Recompute everything from stored runs (used when no snapshot exists yet)"""
+        with self._lock:
+            self.assignments = {}
+            for run in runs:
+                self.assignments.setdefault(str(run.get('assignmentId')), AssignmentAggregate()).add(run)
+            self._save()
+
+    def flush(self):
+        """Write the snapshot if runs were logged since the last one (on shutdown)"""
+        with self._lock:
+            if self._sequence > self._saved_sequence:
+                self._save()
+
+    def summary(self, assignment_id: Any) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            aggregate = self.assignments.get(str(assignment_id))
+            return aggregate.summary() if aggregate else None
+
+    def export_rows(self, assignment_id: Any) -> List[Dict[str, Any]]:
+        """One row per test, columns as in EXPORT_COLUMNS"""
+        with self._lock:
+            aggregate = self.assignments.get(str(assignment_id))
+            if not aggregate:
+                return []
+            rows = []
+            for nodeid, test in sorted(aggregate.tests.items()):
+                top = max(test.failure_clusters.items(), key=lambda item: item[1]['count'], default=None)
+                rows.append({
+                    'assignment_id': str(assignment_id),
+                    'nodeid': nodeid,
+                    'runs': test.runs,
+                    'passed': test.outcomes.get('passed', 0),
+                    'failed': test.runs - test.outcomes.get('passed', 0) - test.outcomes.get('skipped', 0),
+                    'pass_rate': round(test.pass_rate, 4),
+                    'duration_p50': test.durations.quantile(0.5),
+                    'duration_p90': test.durations.quantile(0.9),
+                    'duration_p99': test.durations.quantile(0.99),
+                    'top_failure': top[0] if top else '',
+                    'top_failure_count': top[1]['count'] if top else 0
+                })
+            return rows
+
+    def export_csv(self, assignment_id: Any) -> str:
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+        writer.writeheader()
+        writer.writerows(self.export_rows(assignment_id))
+        return buffer.getvalue()
+
+    def export_columns(self, assignment_id: Any) -> Dict[str, List[Any]]:
+        """Column-oriented export (one array per column), ready for dataframe loaders"""
+        rows = self.export_rows(assignment_id)
+        return {column: [row[column] for row in rows] for column in EXPORT_COLUMNS}
+
+    def _append(self, entry: Dict[str, Any]):
+        if self._log is None:
+            self._log = open(self.log_path, 'a', encoding='utf-8')
+        self._log.write(json.dumps(entry, separators=(',', ':')) + '\n')
+        self._log.flush()
+
+    def _save(self):
+        data = {
+            'sequence': self._sequence,
+            'assignments': {key: aggregate.to_dict() for key, aggregate in self.assignments.items()}
+        }
+        tmp_path = self.snapshot_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(tmp_path, self.snapshot_path)
+        # Entries up to the snapshot's sequence are skipped on load, so a crash before this is harmless
+        if self._log is not None:
+            self._log.close()
+        self._log = open(self.log_path, 'w', encoding='utf-8')
+        self._saved_sequence = self._sequence
+        self._saved_at = time.time()
+
+    def _load(self):
+        if os.path.exists(self.snapshot_path):
+            try:
+                with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if 'assignments' not in data or not isinstance(data.get('sequence'), int):
+                    data = {'sequence': 0, 'assignments': data}  # written before the log existed
+                self.assignments = {k: AssignmentAggregate.from_dict(v) for k, v in data['assignments'].items()}
+                self._sequence = self._saved_sequence = data['sequence']
+            except (json.JSONDecodeError, IOError, TypeError, AttributeError) as e:
+                print(f"ERROR: Could not load analytics snapshot {self.snapshot_path}: {e}")
+                self.assignments = {}
+        if not os.path.exists(self.log_path):
+            return
+        replayed = 0
+        torn = False
+        try:
+            with open(self.log_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        torn = True  # the line being written when the process died
+                        break
+                    if entry.get('seq', 0) <= self._saved_sequence:
+                        continue
+                    self.assignments.setdefault(str(entry.get('assignmentId')), AssignmentAggregate()).add(entry)
+                    self._sequence = entry['seq']
+                    replayed += 1
+        except IOError as e:
+            print(f"ERROR: Could not read analytics log {self.log_path}: {e}")
+        if replayed or torn:
+            print(f"DEBUG: Replayed {replayed} analytics log entries")
+            # A fresh snapshot and an empty log: nothing gets appended behind a torn line
+            self._save()
@@ -0,0 +1,132 @@
+"""
+Multi-Submission Batches
+When the executor hands over several queued submissions of one assignment
+(BATCH_MAX_SUBMISSIONS > 1), each is still processed by its own thread, but
+their test phases meet here: the last one to arrive runs a single pytest
+session for all of them (aca_pytest.batch), so the suite is imported and
+collected once per batch instead of once per submission. Everything else
+(pre-check, extraction, differential, callbacks) runs one job at a time
+under the batch's serial lock, as if the jobs had run back to back.
+
+Only suites that cannot notice the switch between submissions are batched,
+see batch_safe(); the others, and every submission whose batched result is
+missing, run on their own.
+"""
+
+import ast
+import importlib.util
+import os
+import threading
+from typing import Callable, Dict, List, Any, Optional
+
+from language_plugins.output_capture import ProcessCancelled
+
+CANCEL_POLL_SECONDS = 0.5
+
+
+def _imported_roots(tree: ast.Module) -> List[str]:
+    """Top-level modules imported at module level (not inside functions)"""
+    roots = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            roots += [alias.name.split('.')[0] for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            roots.append(node.module.split('.')[0])
+    return roots
+
+
+def batch_safe(tests_dir: str, task_metadata: Dict[str, Any]) -> Optional[str]:
+    """
+    Whether a suite can run against several submissions in one session
+    Returns:
+        None if it can, otherwise the reason it cannot
+    """
+    if task_metadata.get('batch') is False:
+        return 'disabled in task.json'
+    if task_metadata.get('smoke'):
+        # Tiers send provisional results per submission
+        return 'smoke tier configured'
+    module = os.path.splitext((task_metadata.get('precheck') or {}).get('module') or 'solution.py')[0]
+    submitted = {module} | {os.path.splitext(name)[0] for name in
+                            (task_metadata.get('precheck') or {}).get('requiredFiles', [])}
+    for name in sorted(os.listdir(tests_dir)):
+        if not name.endswith('.py'):
+            continue
+        with open(os.path.join(tests_dir, name), 'r', encoding='utf-8') as f:
+            source = f.read()
+        try:
+            tree = ast.parse(source)
+        except SyntaxError:
+            return f'{name} does not parse'
+        if any(isinstance(node, ast.Name) and node.id == '__file__' for node in ast.walk(tree)):
+            # Paths relative to the test file point into the batch, not the submission
+            return f'{name} uses __file__'
+        for root in _imported_roots(tree):
+            # Bound once at collection: it would stay the first submission's module
+            if root in submitted or importlib.util.find_spec(root) is None:
+                return f'{name} imports {root} at module level'
+    return None
+
+
+class SubmissionBatch:
+    """
+    Rendezvous of the jobs of one batch at their test phase
+    Args:
+        jobs: The jobs handed over together by the executor
+        run_batch: Runs the registered entries in one session; returns
+            job key -> result dict (None where it has no result)
+    """
+
+    def __init__(self, jobs: List[Any], run_batch: Callable[[Dict[str, Dict[str, Any]]], Dict[str, Any]]):
+        self.run_batch = run_batch
+        self.serial = threading.Lock()
+        self.size = len(jobs)
+        self._condition = threading.Condition()
+        self._pending = set(job.key for job in jobs)
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._results: Optional[Dict[str, Any]] = None
+        self._started = False
+
+    def tests(self, job: Any, entry: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Register a job's test run and wait for the batch (the caller holds `serial`)
+        Returns:
+            The job's result, or None if it has to run its tests by itself
+        """
+        self.serial.release()
+        try:
+            with self._condition:
+                self._entries[job.key] = entry
+                self._pending.discard(job.key)
+                self._condition.notify_all()
+                while self._results is None:
+                    if not self._pending and not self._started:
+                        self._started = True
+                        break
+                    if job.cancel_event.is_set():
+                        if not self._started:
+                            self._entries.pop(job.key, None)
+                        raise ProcessCancelled(job.cancel_reason or 'cancelled')
+                    self._condition.wait(CANCEL_POLL_SECONDS)
+                else:
+                    return self._results.get(job.key)
+
+            # Last to arrive: run everyone's tests (a batch of one is just a normal run)
+            results = {}
+            try:
+                if len(self._entries) > 1:
+                    print(f"DEBUG: Running {len(self._entries)} submissions in one pytest session")
+                    results = self.run_batch(dict(self._entries))
+            finally:
+                with self._condition:
+                    self._results = results
+                    self._condition.notify_all()
+            return results.get(job.key)
+        finally:
+            self.serial.acquire()
+
+    def leave(self, job: Any):
+        """A job is done or will not register (it no longer holds the batch up)"""
+        with self._condition:
+            self._pending.discard(job.key)
+            self._condition.notify_all()
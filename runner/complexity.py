@@ -0,0 +1,256 @@
+"""
+Empirical Complexity Analysis
+Times functions of a submission over growing inputs and fits candidate
+complexity classes, so an O(n²) median is told apart from an O(n log n)
+one even when both pass every test. Configured in task.json:
+
+    {"complexity": {
+        "generator": "generator.py",
+        "budget": 5, "minSize": 64, "maxSize": 1048576, "growth": 2, "repeats": 3,
+        "checks": [{"function": "calculate_median", "inputs": "sized_numeric_list", "expected": "n log n"}]
+    }}
+
+`inputs` names a function of the generator module, `inputs(rng, n)`,
+returning the argument tuple for an input of size n. The analysis is a
+report (`complexity` in the result); it does not change the score.
+"""
+
+import json
+import math
+import os
+import subprocess
+import time
+from typing import Dict, List, Any, Optional, Tuple
+
+from cpu_topology import current_cpus, format_cpu_list
+from language_plugins.output_capture import run_captured, combine_usage
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+CHILD_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'complexity_child.py')
+DEFAULT_BUDGET = 5.0
+# The child stops itself at the budget; this covers its start-up
+TIMEOUT_MARGIN = 5.0
+# Fewer sizes than this cannot tell classes apart
+MIN_POINTS = 4
+# Below this confidence a class above the expected one is not reported in the feedback
+FEEDBACK_CONFIDENCE = 0.5
+
+# Candidate classes, cheapest first
+CLASSES: List[Tuple[str, Any]] = [
+    ('1', lambda n: 1.0),
+    ('log n', lambda n: math.log(n)),
+    ('n', lambda n: float(n)),
+    ('n log n', lambda n: n * math.log(n)),
+    ('n^2', lambda n: float(n) ** 2),
+    ('n^3', lambda n: float(n) ** 3),
+]
+CLASS_NAMES = [name for name, _ in CLASSES]
+
+
+def complexity_config(task_metadata: Dict[str, Any], task_dir: str) -> Optional[Dict[str, Any]]:
+    """The task's complexity settings with defaults applied; None if not configured"""
+    config = task_metadata.get('complexity') if task_metadata else None
+    if not config or not config.get('checks'):
+        return None
+    for check in config['checks']:
+        if check.get('expected') and check['expected'] not in CLASS_NAMES:
+            raise ValueError(f"unknown complexity class {check['expected']!r} (one of {CLASS_NAMES})")
+    return {
+        'module': config.get('module') or task_metadata.get('precheck', {}).get('module') or 'solution.py',
+        'generator': os.path.join(task_dir, config.get('generator', 'generator.py')),
+        'checks': config['checks'],
+        'budget': float(config.get('budget', DEFAULT_BUDGET)),
+        'min_size': max(2, int(config.get('minSize', 64))),
+        'max_size': int(config.get('maxSize', 1 << 20)),
+        'growth': max(1.25, float(config.get('growth', 2))),
+        'repeats': max(1, int(config.get('repeats', 3))),
+        'seed': config.get('seed', 1)
+    }
+
+
+def _fit_numpy(sizes: List[int], times: List[float]) -> List[Tuple[float, float, float]]:
+    """All classes at once: weighted least squares of t = a + b·f(n), weights 1/t²"""
+    n = np.asarray(sizes, dtype=float)
+    t = np.asarray(times, dtype=float)
+    features = np.vstack([np.vectorize(f, otypes=[float])(n) for _, f in CLASSES])
+    features = features / features[:, -1:]  # scale each class to 1 at the largest n
+    w = 1.0 / t ** 2
+    sw, st = w.sum(), (w * t).sum()
+    sf, sff, sft = features @ w, (features ** 2) @ w, features @ (w * t)
+    denominator = sw * sff - sf ** 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        b = np.where(np.abs(denominator) > 1e-12 * sw * sff, (sw * sft - sf * st) / denominator, 0.0)
+        a = (st - b * sf) / sw
+        # Negative intercepts: fit through the origin instead; negative slopes: a constant
+        through_origin = a < 0
+        b = np.where(through_origin, sft / sff, b)
+        a = np.where(through_origin, 0.0, a)
+        flat = b < 0
+        a = np.where(flat, st / sw, a)
+        b = np.where(flat, 0.0, b)
+    errors = np.sqrt(np.mean(((t - a[:, None] - b[:, None] * features) / t) ** 2, axis=1))
+    return list(zip(a.tolist(), b.tolist(), errors.tolist()))
+
+
+def _fit_python(sizes: List[int], times: List[float]) -> List[Tuple[float, float, float]]:
+    """Same fit as _fit_numpy, one class at a time"""
+    fits = []
+    for _, f in CLASSES:
+        largest = f(sizes[-1])
+        features = [f(n) / largest for n in sizes]
+        w = [1.0 / t ** 2 for t in times]
+        sw, st = sum(w), sum(wi * ti for wi, ti in zip(w, times))
+        sf = sum(wi * fi for wi, fi in zip(w, features))
+        sff = sum(wi * fi * fi for wi, fi in zip(w, features))
+        sft = sum(wi * fi * ti for wi, fi, ti in zip(w, features, times))
+        denominator = sw * sff - sf ** 2
+        b = (sw * sft - sf * st) / denominator if abs(denominator) > 1e-12 * sw * sff else 0.0
+        a = (st - b * sf) / sw
+        if a < 0:
+            a, b = 0.0, sft / sff
+        if b < 0:
+            a, b = st / sw, 0.0
+        error = math.sqrt(sum(((ti - a - b * fi) / ti) ** 2 for fi, ti in zip(features, times)) / len(times))
+        fits.append((a, b, error))
+    return fits
+
+
+def fit_complexity(sizes: List[int], times: List[float], expected: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Fit every candidate class to one function's timings
+    Args:
+        sizes: Input sizes
+        times: Seconds per call at each size
+        expected: Class the task expects; when the best class is another one, the confidence
+            says how much worse the expected class fits instead of the runner-up
+    Returns:
+        Dict with the best class, a confidence in [0, 1] (how much worse the runner-up, or the
+        expected class, fits), each class's relative RMS error and the log-log slope of the timings
+    """
+    points = [(n, t) for n, t in zip(sizes, times) if t > 0]
+    if len(points) < MIN_POINTS:
+        return {'best': None, 'confidence': 0.0, 'reason': f'only {len(points)} input sizes measured'}
+    sizes, times = [n for n, _ in points], [t for _, t in points]
+    fits = _fit_numpy(sizes, times) if np is not None else _fit_python(sizes, times)
+    errors = {name: round(error, 4) for name, (_, _, error) in zip(CLASS_NAMES, fits)}
+    log_n = [math.log(n) for n in sizes]
+    log_t = [math.log(t) for t in times]
+    mean_n, mean_t = sum(log_n) / len(log_n), sum(log_t) / len(log_t)
+    slope = round(sum((x - mean_n) * (y - mean_t) for x, y in zip(log_n, log_t)) /
+                  sum((x - mean_n) ** 2 for x in log_n), 3)
+    # A class whose slope came out 0 is just the constant again; ties go to the cheaper class
+    candidates = [i for i in range(len(CLASSES)) if i == 0 or fits[i][1] > 0]
+    if len(candidates) < 2:
+        return {'best': CLASS_NAMES[0], 'confidence': 1.0, 'runnerUp': None, 'errors': errors, 'slope': slope}
+    ranked = sorted(candidates, key=lambda i: (round(fits[i][2], 6), i))
+    best, runner_up = ranked[0], ranked[1]
+    best_error, runner_up_error = fits[best][2], fits[runner_up][2]
+    # Above the expected class the question is whether it is the expected one after all: a
+    # neighbouring class (n^2 vs n^3) fitting nearly as well does not make that any likelier
+    if expected in CLASS_NAMES and CLASS_NAMES.index(expected) != best:
+        runner_up_error = fits[CLASS_NAMES.index(expected)][2]
+    confidence = 1.0 - best_error / runner_up_error if runner_up_error > 0 else 0.0
+
+    return {
+        'best': CLASS_NAMES[best],
+        'confidence': round(max(0.0, confidence), 4),
+        'runnerUp': CLASS_NAMES[runner_up],
+        'errors': errors,
+        'slope': slope
+    }
+
+
+def run_complexity(workdir: str, config: Dict[str, Any], cancel_event=None) -> Dict[str, Any]:
+    """
+    Time the submission's functions in a child process and fit each one
+    Args:
+        workdir: Job workdir containing the submission
+        config: From complexity_config
+        cancel_event: Kills the child when set (ProcessCancelled propagates)
+    Returns:
+        Dict with one entry per check ('checks') or 'error', the child's duration, usage
+        and scheduler stats (CPUs it could run on, migrations, involuntary switches, run delay)
+    """
+    spec_path = os.path.join(workdir, '.aca-complexity.json')
+    output_path = os.path.join(workdir, '.aca-complexity-result.json')
+    module = config['module']
+    spec = dict(config,
+                student=os.path.join(workdir, module),
+                module_name=os.path.splitext(os.path.basename(module))[0],
+                output=output_path)
+    with open(spec_path, 'w', encoding='utf-8') as f:
+        json.dump(spec, f)
+
+    start = time.perf_counter()
+    timed_out = False
+    stderr = ''
+    usage = None
+    try:
+        result = run_captured(['python', CHILD_SCRIPT, spec_path], cwd=workdir,
+                              timeout=config['budget'] + TIMEOUT_MARGIN, cancel_event=cancel_event)
+        stderr = result.stderr
+        usage = result.usage
+    except subprocess.TimeoutExpired as e:
+        # A single call at the last size overran the budget; the sizes before it still count
+        timed_out = True
+        usage = getattr(e, 'usage', None)
+
+    outcome: Dict[str, Any] = {'checks': []}
+    if os.path.exists(output_path):
+        with open(output_path, 'r', encoding='utf-8') as f:
+            outcome = json.load(f)
+    elif not timed_out:
+        outcome['error'] = (stderr or 'complexity analysis produced no result')[-500:]
+
+    expected = {check['function']: check.get('expected') for check in config['checks']}
+    for check in outcome.get('checks', []):
+        check['expected'] = expected.get(check['function'])
+        check.update(fit_complexity(check['sizes'], check['times'], check['expected']))
+        check['times'] = [round(seconds, 9) for seconds in check['times']]
+        check['exceeds'] = bool(check['expected'] and check['best']) and \
+            CLASS_NAMES.index(check['best']) > CLASS_NAMES.index(check['expected'])
+    outcome['timed_out'] = timed_out
+    outcome['duration'] = round(time.perf_counter() - start, 4)
+    outcome['usage'] = usage
+    # How undisturbed the timings were (migrations and waits for a CPU make them noisy)
+    cpus = current_cpus()
+    outcome['scheduler'] = dict({'cpus': format_cpu_list(cpus) if cpus else None},
+                                **{key: usage[key] for key in ('migrations', 'ctx_involuntary', 'run_delay')
+                                   if usage and key in usage})
+    return outcome
+
+
+def complexity_feedback(outcome: Dict[str, Any]) -> str:
+    """Feedback lines for functions that scale worse than the task expects (empty if none)"""
+    lines = [f"  • {check['function']} looks O({check['best']}), expected O({check['expected']}) "
+             f"(confidence {check['confidence']:.0%})"
+             for check in outcome.get('checks', [])
+             if check.get('exceeds') and check['confidence'] >= FEEDBACK_CONFIDENCE]
+    return '\n'.join(["Scaling:"] + lines) if lines else ''
+
+
+def merge_complexity(test_result: Dict[str, Any], outcome: Dict[str, Any]) -> Dict[str, Any]:
+    """Attach the analysis to a test result (score and counts unchanged)"""
+    report = {
+        'checks': [{key: check.get(key) for key in ('function', 'best', 'confidence', 'runnerUp', 'expected',
+                                                     'exceeds', 'slope', 'sizes', 'times', 'errors',
+                                                     'stopped', 'error', 'reason') if check.get(key) is not None}
+                   for check in outcome.get('checks', [])],
+        'duration': outcome.get('duration', 0.0),
+        'timed_out': outcome.get('timed_out', False),
+        'scheduler': outcome.get('scheduler')
+    }
+    if outcome.get('error'):
+        report['error'] = outcome['error']
+    feedback = test_result.get('feedback', '')
+    scaling = complexity_feedback(outcome)
+    return dict(
+        test_result,
+        feedback='\n'.join(part for part in (feedback, scaling) if part),
+        resources=combine_usage([test_result.get('resources'), outcome.get('usage')]),
+        complexity=report
+    )
@@ -0,0 +1,132 @@
+"""
+Complexity Analysis Child
+Runs inside the job workdir: loads the student module and the task's input
+generator once, then times each configured function over a geometric series
+of input sizes. Sizes keep growing until the largest size, the check's share
+of the time budget, or the predicted cost of the next size stops them.
+
+Usage: python complexity_child.py SPEC_JSON (written by complexity.py)
+"""
+
+import copy
+import gc
+import json
+import math
+import os
+import random
+import sys
+import time
+
+from differential_child import load_module, write_output
+
+# A single timing shorter than this is repeated in a loop (like timeit's autorange)
+MIN_TIMING = 0.002
+# Calls per timing never exceed this (memory for the argument copies)
+MAX_NUMBER = 10000
+
+
+def mutates(function, args):
+    """Whether a call changes its arguments (it then needs a fresh copy per call); doubles as warm-up"""
+    probe = copy.deepcopy(args)
+    function(*probe)
+    try:
+        return bool(probe != args)
+    except Exception:
+        return True  # cannot compare: assume the worst
+
+
+def time_call(function, args, repeats):
+    """
+    Best per-call time over `repeats` timings of `number` calls each
+    Functions that mutate their arguments get a copy per call, made before
+    the clock starts, so neither the mutation nor the copying is measured.
+    """
+    fresh = mutates(function, args)
+    number = 1
+    best = None
+    for _ in range(repeats):
+        while True:
+            calls = [copy.deepcopy(args) for _ in range(number)] if fresh else [args] * number
+            gc_enabled = gc.isenabled()
+            gc.disable()
+            try:
+                start = time.perf_counter()
+                for call_args in calls:
+                    function(*call_args)
+                elapsed = time.perf_counter() - start
+            finally:
+                if gc_enabled:
+                    gc.enable()
+            if elapsed >= MIN_TIMING or number >= MAX_NUMBER:
+                break
+            number = min(MAX_NUMBER, number * max(2, math.ceil(MIN_TIMING / max(elapsed, 1e-9))))
+        per_call = elapsed / number
+        best = per_call if best is None else min(best, per_call)
+    return best
+
+
+def run_check(check, student, generator, spec, budget):
+    name = check['function']
+    result = {'function': name, 'sizes': [], 'times': [], 'stopped': None}
+    function = getattr(student, name, None)
+    if function is None:
+        result['error'] = f"{name} is not defined"
+        return result
+    generate = getattr(generator, check['inputs'])
+    rng = random.Random(spec['seed'])
+    deadline = time.perf_counter() + budget
+
+    size = spec['min_size']
+    last_cost = None
+    growth_ratio = spec['growth']
+    while size <= spec['max_size']:
+        remaining = deadline - time.perf_counter()
+        # The next size costs at least as much more as the last step did
+        if last_cost is not None and last_cost * growth_ratio > remaining:
+            result['stopped'] = 'budget'
+            break
+        start = time.perf_counter()
+        args = generate(rng, size)
+        args = tuple(args) if isinstance(args, (list, tuple)) else (args,)
+        try:
+            seconds = time_call(function, args, spec['repeats'])
+        except Exception as e:
+            result['error'] = f"{type(e).__name__} at n={size}: {e}"
+            break
+        cost = time.perf_counter() - start
+        result['sizes'].append(size)
+        result['times'].append(seconds)
+        if last_cost:
+            growth_ratio = max(spec['growth'], cost / last_cost)
+        last_cost = cost
+        size = int(math.ceil(size * spec['growth']))
+    else:
+        result['stopped'] = 'max_size'
+    return result
+
+
+def main(spec_path):
+    with open(spec_path, 'r', encoding='utf-8') as f:
+        spec = json.load(f)
+    runner_dir = os.path.dirname(os.path.abspath(__file__))
+    sys.path[:] = [os.getcwd()] + [p for p in sys.path if os.path.abspath(p or '.') != runner_dir]
+
+    try:
+        generator = load_module('aca_generator', spec['generator'])
+        student = load_module(spec.get('module_name', 'solution'), spec['student'])
+    except Exception as e:
+        write_output(spec['output'], {'error': f"{type(e).__name__}: {e}"})
+        return
+
+    results = []
+    checks = spec['checks']
+    start = time.perf_counter()
+    for index, check in enumerate(checks):
+        # Each check gets an equal share of what the earlier ones left
+        budget = (spec['budget'] - (time.perf_counter() - start)) / (len(checks) - index)
+        results.append(run_check(check, student, generator, spec, budget))
+        write_output(spec['output'], {'checks': results})
+
+
+if __name__ == '__main__':
+    main(sys.argv[1])
@@ -0,0 +1,214 @@
+"""
+Self-Tuning Concurrency
+Adjusts how many of the executor's general slots take jobs, between
+CONCURRENCY_MIN and MAX_CONCURRENT_JOBS, from what the host reports:
+
+- memory: MemAvailable below CONCURRENCY_MIN_FREE_MB, or memory pressure
+  (PSI "some" avg10, where the kernel has it) above CONCURRENCY_MEMORY_PRESSURE,
+  halves the active slots
+- CPU: a 1-minute load average per CPU above CONCURRENCY_LOAD_HIGH, or job
+  latency inflated past CONCURRENCY_LATENCY_HIGH, takes one slot away
+- headroom: with jobs waiting for a slot and every signal below its limit
+  (load below CONCURRENCY_LOAD_LOW), one slot is added
+
+Latency inflation is the median ratio of the jobs finished since the last
+check to the usual (lower quartile) run time of their assignment. Load and
+pressure are averages that lag behind a change, so after one the tuner
+waits CONCURRENCY_COOLDOWN seconds before the next, except when free memory
+is short. Signals the host does not offer are left out. Tuning is off while
+CONCURRENCY_MIN equals MAX_CONCURRENT_JOBS (the default).
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Any, Optional, Tuple
+
+from cpu_topology import current_cpus
+from executor import MAX_CONCURRENT_JOBS, JobExecutor
+from time_budget import percentile
+
+CONCURRENCY_MIN = int(os.getenv('CONCURRENCY_MIN', MAX_CONCURRENT_JOBS))
+CONCURRENCY_INTERVAL = float(os.getenv('CONCURRENCY_INTERVAL', 5))
+CONCURRENCY_COOLDOWN = float(os.getenv('CONCURRENCY_COOLDOWN', 30))
+CONCURRENCY_LOAD_LOW = float(os.getenv('CONCURRENCY_LOAD_LOW', 0.9))
+CONCURRENCY_LOAD_HIGH = float(os.getenv('CONCURRENCY_LOAD_HIGH', 1.5))
+# PSI percentage of time some task stalled on memory (avg10)
+CONCURRENCY_MEMORY_PRESSURE = float(os.getenv('CONCURRENCY_MEMORY_PRESSURE', 10))
+CONCURRENCY_MIN_FREE_MB = float(os.getenv('CONCURRENCY_MIN_FREE_MB', 512))
+CONCURRENCY_LATENCY_HIGH = float(os.getenv('CONCURRENCY_LATENCY_HIGH', 1.5))
+
+# Run times kept per assignment (and batch size) for its usual latency
+LATENCY_HISTORY = 50
+# Finished jobs an assignment needs before its latency counts
+LATENCY_MIN_SAMPLES = 5
+DECISIONS_KEPT = 50
+
+PRESSURE_DIR = '/proc/pressure'
+MEMINFO = '/proc/meminfo'
+
+
+def read_pressure(resource: str) -> Optional[float]:
+    """PSI "some avg10" of cpu, memory or io in percent; None without PSI"""
+    try:
+        with open(os.path.join(PRESSURE_DIR, resource), 'r', encoding='utf-8') as f:
+            for line in f:
+                fields = line.split()
+                if fields and fields[0] == 'some':
+                    values = dict(field.split('=', 1) for field in fields[1:])
+                    return float(values['avg10'])
+    except (OSError, KeyError, ValueError):
+        pass
+    return None
+
+
+def read_available_mb() -> Optional[float]:
+    """MemAvailable in MiB; None where /proc/meminfo is missing"""
+    try:
+        with open(MEMINFO, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def host_signals() -> Dict[str, Optional[float]]:
+    """Current load, pressure and free memory of the host (None: not available)"""
+    try:
+        load = os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (AttributeError, OSError):
+        load = None
+    available = read_available_mb()
+    return {
+        'load': round(load, 2) if load is not None else None,
+        'cpuPressure': read_pressure('cpu'),
+        'memoryPressure': read_pressure('memory'),
+        'availableMb': round(available, 1) if available is not None else None
+    }
+
+
+def decide(active: int, minimum: int, maximum: int, signals: Dict[str, Any],
+           waiting: bool, cooling: bool) -> Tuple[int, Optional[str]]:
+    """
+    The next number of active slots and why it changes (None: it stays)
+    Args:
+        active: Slots taking jobs now
+        minimum: Lower bound
+        maximum: Upper bound
+        signals: host_signals plus 'latency' (inflation ratio or None)
+        waiting: Whether jobs are queued while every active slot is busy
+        cooling: Whether the last change is too recent for the averages to show it
+    """
+    available = signals.get('availableMb')
+    memory = signals.get('memoryPressure')
+    load = signals.get('load')
+    latency = signals.get('latency')
+    if available is not None and available < CONCURRENCY_MIN_FREE_MB and active > minimum:
+        return max(minimum, active // 2), 'memory'
+    if cooling:
+        return active, None
+    if memory is not None and memory > CONCURRENCY_MEMORY_PRESSURE and active > minimum:
+        return max(minimum, active // 2), 'memory pressure'
+    if load is not None and load > CONCURRENCY_LOAD_HIGH and active > minimum:
+        return active - 1, 'load'
+    if latency is not None and latency > CONCURRENCY_LATENCY_HIGH and active > minimum:
+        return active - 1, 'latency'
+    if waiting and active < maximum and (load is None or load < CONCURRENCY_LOAD_LOW) \
+            and (memory is None or memory <= CONCURRENCY_MEMORY_PRESSURE / 2) \
+            and (available is None or available >= 2 * CONCURRENCY_MIN_FREE_MB) \
+            and (latency is None or latency <= CONCURRENCY_LATENCY_HIGH):
+        return active + 1, 'headroom'
+    return active, None
+
+
+class ConcurrencyTuner:
+    """
+    Periodically sets the executor's active slots from the host's signals
+    Args:
+        executor: The executor whose general slots are tuned
+        minimum: Fewest active slots (capped at the executor's general slots)
+        interval: Seconds between checks
+    """
+
+    def __init__(self, executor: JobExecutor, minimum: int = CONCURRENCY_MIN,
+                 interval: float = CONCURRENCY_INTERVAL):
+        self.executor = executor
+        self.maximum = len(executor.general)
+        self.minimum = max(1, min(minimum, self.maximum))
+        self.interval = interval
+        self.enabled = self.minimum < self.maximum
+        self.signals: Dict[str, Any] = {}
+        self.decisions: deque = deque(maxlen=DECISIONS_KEPT)
+        self.increases = 0
+        self.decreases = 0
+        self._changed_at = 0.0
+        self._history: Dict[Tuple[Optional[str], int], deque] = {}
+        self._lock = threading.Lock()
+        if self.enabled:
+            # Start from what the host can run at once and grow from there
+            cpus = len(current_cpus() or []) or os.cpu_count() or 1
+            executor.set_active(max(self.minimum, min(self.maximum, cpus)))
+
+    def start(self):
+        if self.enabled:
+            threading.Thread(target=self._loop, name='concurrency-tuner', daemon=True).start()
+
+    def _loop(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.step()
+            except Exception as e:
+                print(f"ERROR: Concurrency tuning failed: {e}")
+
+    def latency(self, finished: List[Tuple[Optional[str], int, float]]) -> Optional[float]:
+        """Median inflation of the finished jobs over their group's usual run time; updates the history"""
+        ratios = []
+        for group, size, seconds in finished:
+            history = self._history.setdefault((group, size), deque(maxlen=LATENCY_HISTORY))
+            if len(history) >= LATENCY_MIN_SAMPLES:
+                usual = percentile(list(history), 0.25)
+                if usual > 0:
+                    ratios.append(seconds / usual)
+            history.append(seconds)
+        return round(percentile(ratios, 0.5), 2) if ratios else None
+
+    def step(self) -> Optional[Dict[str, Any]]:
+        """One check: read the signals and change the active slots if they call for it"""
+        with self._lock:
+            signals = dict(host_signals(), latency=self.latency(self.executor.take_latencies()))
+            stats = self.executor.stats()
+            active = stats['activeSlots']
+            waiting = stats['queued'] > 0 and stats['running'] >= active
+            now = time.time()
+            target, reason = decide(active, self.minimum, self.maximum, signals, waiting,
+                                    now - self._changed_at < CONCURRENCY_COOLDOWN)
+            self.signals = signals
+            if reason is None or target == active:
+                return None
+            target = self.executor.set_active(target)
+            decision = {'at': now, 'from': active, 'to': target, 'reason': reason, 'signals': signals}
+            self.decisions.append(decision)
+            self._changed_at = now
+            if target > active:
+                self.increases += 1
+            else:
+                self.decreases += 1
+            print(f"DEBUG: Active slots {active} -> {target} ({reason}): {signals}")
+            return decision
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'min': self.minimum,
+                'max': self.maximum,
+                'active': self.executor.active,
+                'signals': self.signals,
+                'increases': self.increases,
+                'decreases': self.decreases,
+                'decisions': list(self.decisions)
+            }
@@ -0,0 +1,118 @@
+"""
+Shared Task Datasets
+A task can ship a read-only data area next to its tests (`tasks/<slug>/data/`,
+or the directory named by "data": {"dir": ...} in task.json). Instead of
+being copied into every job workdir, it is published once per version into
+DATASETS_DIR with read-only permissions, and each job gets a `data` symlink
+plus $ACA_DATA_DIR pointing at it. Tests read the files through the
+aca_pytest.data helpers, which memory-map them, so concurrent jobs share the
+same page cache.
+"""
+
+import hashlib
+import os
+import shutil
+import stat
+import tempfile
+import threading
+from typing import Dict, Any, Optional, Tuple
+
+# Published versions kept per task (older ones may still be in use by running jobs)
+VERSIONS_KEPT = 2
+
+
+def source_dir(task_dir: str, task_metadata: Dict[str, Any]) -> Optional[str]:
+    """The task's data directory, if it declares or ships one"""
+    config = task_metadata.get('data') if task_metadata else None
+    name = config.get('dir', 'data') if isinstance(config, dict) else 'data'
+    path = os.path.join(task_dir, name)
+    return path if os.path.isdir(path) else None
+
+
+def tree_signature(path: str) -> str:
+    """Hash of the relative paths, sizes and mtimes under a directory (cheap: no file contents)"""
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            file_path = os.path.join(root, name)
+            info = os.stat(file_path)
+            digest.update(f"{os.path.relpath(file_path, path)}\0{info.st_size}\0{info.st_mtime_ns}\n".encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def _make_read_only(path: str):
+    for root, dirs, files in os.walk(path):
+        for name in files:
+            os.chmod(os.path.join(root, name), stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+        os.chmod(root, stat.S_IRUSR | stat.S_IXUSR | stat.S_IRGRP | stat.S_IXGRP | stat.S_IROTH | stat.S_IXOTH)
+
+
+def _remove_read_only(path: str):
+    for root, dirs, files in os.walk(path):
+        os.chmod(root, stat.S_IRWXU)
+    shutil.rmtree(path, ignore_errors=True)
+
+
+class DatasetStore:
+    """Read-only published copies of task data directories, one per task and version"""
+
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.Lock()
+        self._task_locks: Dict[str, threading.Lock] = {}
+        self._published: Dict[str, Tuple[str, str]] = {}  # source dir -> (signature, published dir)
+
+    def publish(self, task_dir: str, task_metadata: Dict[str, Any]) -> Optional[str]:
+        """
+        Make sure the current version of a task's data is published
+        Returns:
+            The published (read-only) directory, or None if the task has no data
+        """
+        source = source_dir(task_dir, task_metadata)
+        if source is None:
+            return None
+        signature = tree_signature(source)
+        with self._lock:
+            known = self._published.get(source)
+            task_lock = self._task_locks.setdefault(source, threading.Lock())
+        if known and known[0] == signature:
+            return known[1]
+
+        slug = os.path.basename(os.path.normpath(task_dir))
+        target = os.path.join(self.root, f"{slug}-{signature}")
+        with task_lock:
+            if not os.path.isdir(target):
+                os.makedirs(self.root, exist_ok=True)
+                staging = tempfile.mkdtemp(prefix=f".{slug}-", dir=self.root)
+                shutil.copytree(source, staging, dirs_exist_ok=True)
+                _make_read_only(staging)
+                try:
+                    os.rename(staging, target)
+                except OSError:
+                    # Another process published the same version first
+                    _remove_read_only(staging)
+                print(f"DEBUG: Published dataset of {slug} to {target}")
+                self._prune(slug, target)
+            with self._lock:
+                self._published[source] = (signature, target)
+        return target
+
+    def _prune(self, slug: str, current: str):
+        prefix = f"{slug}-"
+        versions = [os.path.join(self.root, name) for name in os.listdir(self.root)
+                    if name.startswith(prefix) and len(name) == len(prefix) + 16
+                    and os.path.join(self.root, name) != current]
+        versions.sort(key=os.path.getmtime, reverse=True)
+        for stale in versions[VERSIONS_KEPT - 1:]:
+            _remove_read_only(stale)
+
+
+def expose(published: str, workdir: str):
+    """Link a published dataset into a job workdir as `data/` (no copy)"""
+    link = os.path.join(workdir, 'data')
+    if not os.path.lexists(link):
+        os.symlink(published, link, target_is_directory=True)
+    else:
+        # The submission brought its own data/: tests still find ours through ACA_DATA_DIR
+        print(f"DEBUG: {link} exists, dataset only exposed through ACA_DATA_DIR")
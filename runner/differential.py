@@ -0,0 +1,155 @@
+"""
+Differential Grading
+Compares a submission with the task's reference solution over thousands of
+generated inputs. Configured in task.json:
+
+    {"differential": {
+        "generator": "generator.py",
+        "cases": 2000, "batchSize": 500, "seed": 1,
+        "tolerance": {"rel": 1e-9, "abs": 1e-12},
+        "checks": [{"function": "sensor_means", "inputs": "sensor_rows"}]
+    }}
+
+`inputs` names a function of the generator module, `inputs(rng, count)`,
+returning `count` argument tuples. Each check becomes one test record.
+"""
+
+import json
+import os
+import subprocess
+import time
+from typing import Dict, List, Any, Optional
+
+from language_plugins.output_capture import run_captured, combine_usage
+
+CHILD_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'differential_child.py')
+DEFAULT_CASES = 1000
+DEFAULT_BATCH_SIZE = 500
+
+
+def differential_config(task_metadata: Dict[str, Any], task_dir: str) -> Optional[Dict[str, Any]]:
+    """The task's differential settings with defaults applied; None if not configured"""
+    config = task_metadata.get('differential') if task_metadata else None
+    if not config or not config.get('checks'):
+        return None
+    tolerance = config.get('tolerance', {})
+    return {
+        'module': config.get('module') or task_metadata.get('precheck', {}).get('module') or 'solution.py',
+        'generator': os.path.join(task_dir, config.get('generator', 'generator.py')),
+        'checks': config['checks'],
+        'cases': int(config.get('cases', DEFAULT_CASES)),
+        'batch_size': max(1, int(config.get('batchSize', DEFAULT_BATCH_SIZE))),
+        'seed': config.get('seed', 1),
+        'tolerance': {'rel': float(tolerance.get('rel', 1e-9)), 'abs': float(tolerance.get('abs', 1e-12))}
+    }
+
+
+def run_differential(workdir: str, reference_dir: str, config: Dict[str, Any],
+                     timeout: float, cancel_event=None) -> Dict[str, Any]:
+    """
+    Evaluate the submission against the reference in a child process
+    Args:
+        workdir: Job workdir containing the submission
+        reference_dir: The task's reference solution directory
+        config: From differential_config
+        timeout: Wall-clock limit for all checks
+        cancel_event: Kills the child when set (ProcessCancelled propagates)
+    Returns:
+        Dict with per-check results ('checks'), or 'error' when the child could not run,
+        and the child's resource usage
+    """
+    spec_path = os.path.join(workdir, '.aca-differential.json')
+    output_path = os.path.join(workdir, '.aca-differential-result.json')
+    module = config['module']
+    spec = dict(config,
+                student=os.path.join(workdir, module),
+                module_name=os.path.splitext(os.path.basename(module))[0],
+                reference=os.path.join(reference_dir, module),
+                output=output_path)
+    with open(spec_path, 'w', encoding='utf-8') as f:
+        json.dump(spec, f)
+
+    start = time.perf_counter()
+    timed_out = False
+    stderr = ''
+    usage = None
+    try:
+        result = run_captured(['python', CHILD_SCRIPT, spec_path], cwd=workdir, timeout=timeout,
+                              cancel_event=cancel_event)
+        stderr = result.stderr
+        usage = result.usage
+    except subprocess.TimeoutExpired as e:
+        timed_out = True
+        usage = getattr(e, 'usage', None)
+
+    outcome: Dict[str, Any] = {'checks': []}
+    if os.path.exists(output_path):
+        with open(output_path, 'r', encoding='utf-8') as f:
+            outcome = json.load(f)
+    elif not timed_out:
+        outcome['error'] = (stderr or 'differential check produced no result')[-500:]
+    outcome['timed_out'] = timed_out
+    outcome['duration'] = time.perf_counter() - start
+    outcome['usage'] = usage
+    return outcome
+
+
+def describe_check(check: Dict[str, Any]) -> str:
+    """One feedback line for a failed check"""
+    example = check.get('counterexample')
+    if check.get('error'):
+        return f"{check['function']}: {check['error']}"
+    if not example:
+        return f"{check['function']}: did not finish"
+    got = f"raised {example['error']}" if example.get('error') else f"returned {example['actual']}"
+    return (f"{check['function']}({example['args'][1:-1]}) {got}, expected {example['expected']} "
+            f"(case {check['cases']})")
+
+
+def merge_differential(test_result: Dict[str, Any], outcome: Dict[str, Any],
+                       config: Dict[str, Any]) -> Dict[str, Any]:
+    """Add one test record per differential check to a test result and recompute its score"""
+    by_function = {check['function']: check for check in outcome.get('checks', [])}
+    records: List[Dict[str, Any]] = []
+    for check_config in config['checks']:
+        check = by_function.get(check_config['function'])
+        if check is None:
+            reason = 'timed out' if outcome.get('timed_out') else outcome.get('error', 'not run')
+            check = {'function': check_config['function'], 'passed': False, 'cases': 0, 'error': reason}
+        records.append({
+            'nodeid': f"differential::{check['function']}",
+            'outcome': 'passed' if check.get('passed') else 'failed',
+            'duration': check.get('duration', 0.0),
+            'message': '' if check.get('passed') else describe_check(check),
+            'cases': check.get('cases', 0)
+        })
+
+    failed = [record for record in records if record['outcome'] == 'failed']
+    total_tests = test_result.get('total_tests', 0) + len(records)
+    passed_tests = test_result.get('passed_tests', 0) + len(records) - len(failed)
+    feedback = test_result.get('feedback', '')
+    if failed:
+        lines = ["Differential checks failed (first counterexample):"]
+        lines += [f"  • {record['message']}" for record in failed]
+        # "All n tests passed!" no longer holds
+        previous = feedback if test_result.get('passed_tests', 0) < test_result.get('total_tests', 0) else ''
+        feedback = '\n'.join([part for part in (previous, '\n'.join(lines)) if part])
+    elif passed_tests == total_tests:
+        feedback = f"All {passed_tests} tests passed ({sum(record['cases'] for record in records)} generated cases)!"
+    return dict(
+        test_result,
+        total_tests=total_tests,
+        passed_tests=passed_tests,
+        failed_tests=test_result.get('failed_tests', 0) + len(failed),
+        score=float(passed_tests) / float(total_tests) if total_tests else 0.0,
+        success=test_result.get('success', False) and not failed,
+        feedback=feedback,
+        tests=test_result.get('tests', []) + records,
+        resources=combine_usage([test_result.get('resources'), outcome.get('usage')]),
+        differential={
+            'cases': sum(record['cases'] for record in records),
+            'duration': round(outcome.get('duration', 0.0), 4),
+            'vectorized': outcome.get('vectorized', False),
+            'timed_out': outcome.get('timed_out', False)
+        }
+    )
@@ -0,0 +1,169 @@
+"""
+Differential Grading Child
+Runs inside the job workdir: loads the student module, the reference module
+and the task's input generator once, then evaluates both implementations
+over generated inputs in batches and stops at the first counterexample.
+
+Usage: python differential_child.py SPEC_JSON (written by differential.py)
+"""
+
+import copy
+import importlib.util
+import json
+import math
+import os
+import random
+import sys
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MAX_REPR = 300
+
+
+def load_module(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def short_repr(value):
+    text = repr(value)
+    return text if len(text) <= MAX_REPR else text[:MAX_REPR] + '...'
+
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def values_equal(expected, actual, rel, abs_tol):
+    """Structural equality with a float tolerance (objects of same-named classes compare by attributes)"""
+    if is_number(expected) and is_number(actual):
+        if isinstance(expected, float) and isinstance(actual, float) and math.isnan(expected) and math.isnan(actual):
+            return True
+        return math.isclose(expected, actual, rel_tol=rel, abs_tol=abs_tol)
+    if isinstance(expected, (list, tuple)) and isinstance(actual, (list, tuple)):
+        return type(expected) is type(actual) and len(expected) == len(actual) and all(
+            values_equal(e, a, rel, abs_tol) for e, a in zip(expected, actual))
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        return expected.keys() == actual.keys() and all(
+            values_equal(expected[k], actual[k], rel, abs_tol) for k in expected)
+    if hasattr(expected, '__dict__') and hasattr(actual, '__dict__') \
+            and type(expected).__name__ == type(actual).__name__ and type(expected) is not type(actual):
+        # Reference and student define their own (same-named) classes
+        return values_equal(vars(expected), vars(actual), rel, abs_tol)
+    return expected == actual
+
+
+def first_mismatch(expected, actual, rel, abs_tol):
+    """Index of the first differing output of a batch, or None; vectorized for all-numeric batches"""
+    if np is not None and all(is_number(v) for v in expected) and all(is_number(v) for v in actual):
+        close = np.isclose(np.asarray(actual, dtype=float), np.asarray(expected, dtype=float),
+                           rtol=rel, atol=abs_tol, equal_nan=True)
+        mismatches = np.flatnonzero(~close)
+        if not mismatches.size:
+            return None
+        # isclose is asymmetric: confirm with the scalar check
+        for index in mismatches:
+            if not values_equal(expected[index], actual[index], rel, abs_tol):
+                return int(index)
+        return None
+    for index, (e, a) in enumerate(zip(expected, actual)):
+        if not values_equal(e, a, rel, abs_tol):
+            return index
+    return None
+
+
+def call_all(function, inputs):
+    """Outputs (or raised exceptions) of function over a batch; args are copied so mutation cannot leak"""
+    outputs = []
+    for args in inputs:
+        try:
+            outputs.append(function(*copy.deepcopy(args)))
+        except Exception as e:
+            outputs.append(e)
+    return outputs
+
+
+def run_check(check, student, reference, generator, spec):
+    name = check['function']
+    result = {'function': name, 'cases': 0, 'passed': False, 'counterexample': None}
+    student_fn = getattr(student, name, None)
+    if student_fn is None:
+        result['error'] = f"{name} is not defined"
+        return result
+    reference_fn = getattr(reference, name)
+    generate = getattr(generator, check['inputs'])
+    rng = random.Random(spec['seed'])
+    rel, abs_tol = spec['tolerance']['rel'], spec['tolerance']['abs']
+
+    remaining = spec['cases']
+    while remaining > 0:
+        inputs = [tuple(args) if isinstance(args, (list, tuple)) else (args,)
+                  for args in generate(rng, min(spec['batch_size'], remaining))]
+        if not inputs:
+            break
+        expected = call_all(reference_fn, inputs)
+        # Inputs the reference rejects are generator noise, not test cases
+        valid = [i for i, value in enumerate(expected) if not isinstance(value, Exception)]
+        inputs = [inputs[i] for i in valid]
+        expected = [expected[i] for i in valid]
+        actual = call_all(student_fn, inputs)
+
+        raised = next((i for i, value in enumerate(actual) if isinstance(value, Exception)), None)
+        mismatch = first_mismatch(expected[:raised], actual[:raised], rel, abs_tol)
+        if mismatch is None and raised is not None:
+            mismatch = raised
+        if mismatch is not None:
+            result['cases'] += mismatch + 1
+            value = actual[mismatch]
+            result['counterexample'] = {
+                'args': short_repr(list(inputs[mismatch])),
+                'expected': short_repr(expected[mismatch]),
+                'actual': None if isinstance(value, Exception) else short_repr(value),
+                'error': f"{type(value).__name__}: {value}" if isinstance(value, Exception) else None
+            }
+            return result
+        result['cases'] += len(inputs)
+        remaining -= spec['batch_size']
+    result['passed'] = True
+    return result
+
+
+def write_output(path, data):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+
+
+def main(spec_path):
+    with open(spec_path, 'r', encoding='utf-8') as f:
+        spec = json.load(f)
+    # Import like the tests would: the workdir first, never the runner's own modules
+    runner_dir = os.path.dirname(os.path.abspath(__file__))
+    sys.path[:] = [os.getcwd()] + [p for p in sys.path if os.path.abspath(p or '.') != runner_dir]
+
+    try:
+        reference = load_module('aca_reference', spec['reference'])
+        generator = load_module('aca_generator', spec['generator'])
+        student = load_module(spec.get('module_name', 'solution'), spec['student'])
+    except Exception as e:
+        write_output(spec['output'], {'error': f"{type(e).__name__}: {e}"})
+        return
+
+    results = []
+    for check in spec['checks']:
+        start = time.perf_counter()
+        result = run_check(check, student, reference, generator, spec)
+        result['duration'] = round(time.perf_counter() - start, 6)
+        results.append(result)
+        # Written after every check, so finished checks survive a timeout in a later one
+        write_output(spec['output'], {'checks': results, 'vectorized': np is not None})
+
+
+if __name__ == '__main__':
+    main(sys.argv[1])
@@ -0,0 +1,322 @@
+"""
+Job Executor
+FIFO queue of grading jobs served by a fixed number of worker threads, with
+cancellation of queued and running jobs
+
+A newer submission from the same user for the same assignment supersedes
+that user's queued jobs. Running jobs are cancelled cooperatively: their
+cancel_event is set, which kills the test process group (see run_captured)
+and makes the job raise ProcessCancelled at its next checkpoint.
+
+Workers are assignment-affine: a worker prefers the oldest queued job of the
+assignment it served last (within AFFINITY_LOOKAHEAD queue entries, and only
+while the head of the queue has waited less than AFFINITY_MAX_DELAY). With a
+batch handler, a worker also takes up to BATCH_MAX_SUBMISSIONS queued jobs of
+the same group at once and hands them over together.
+
+With a CpuTopology (see cpu_topology.py) every worker is pinned to its
+slot's cores before it takes any job, and the isolated slots only serve
+jobs of the TIMING class, which no other slot takes. Unless MAX_CONCURRENT_JOBS
+is set, there is then one general slot per core group rather than one per
+logical CPU, so no two slots share a core.
+
+Only the first `active` general slots take jobs (all of them unless
+set_active lowers it; see concurrency.py); the others finish what they run
+and then wait. Run times of finished jobs are kept for take_latencies.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from itertools import islice
+from typing import Callable, Dict, List, Any, Optional, Tuple
+
+from cpu_topology import CpuTopology, Slot, TIMING, pin
+from language_plugins.output_capture import ProcessCancelled
+
+MAX_CONCURRENT_JOBS = int(os.getenv('MAX_CONCURRENT_JOBS', os.cpu_count() or 2))
+# Unset with a CPU topology: one slot per core group instead of one per logical CPU
+MAX_CONCURRENT_JOBS_SET = 'MAX_CONCURRENT_JOBS' in os.environ
+AFFINITY_LOOKAHEAD = int(os.getenv('AFFINITY_LOOKAHEAD', 16))
+AFFINITY_MAX_DELAY = float(os.getenv('AFFINITY_MAX_DELAY', 10))
+# 1 disables batching
+BATCH_MAX_SUBMISSIONS = int(os.getenv('BATCH_MAX_SUBMISSIONS', 1))
+FINISHED_JOBS_KEPT = 1000
+LATENCIES_KEPT = 500
+
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+
+class Job:
+    """One grading request and its lifecycle"""
+
+    def __init__(self, submission_id: Any, assignment_id: Any, user_id: Any, payload: Dict[str, Any],
+                 traceparent: Optional[str] = None):
+        self.submission_id = submission_id
+        self.assignment_id = assignment_id
+        self.user_id = user_id
+        self.payload = payload
+        self.traceparent = traceparent
+        self.status = QUEUED
+        self.cancel_event = threading.Event()
+        self.cancel_reason: Optional[str] = None
+        self.done = threading.Event()
+        self.response: Optional[Dict[str, Any]] = None
+        self.response_code = 200
+        self.enqueued_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.placement: Optional[Dict[str, Any]] = None  # the slot that ran it (Slot.to_dict)
+
+    @property
+    def key(self) -> str:
+        return str(self.submission_id)
+
+    def raise_if_cancelled(self):
+        """Checkpoint between job phases"""
+        if self.cancel_event.is_set():
+            raise ProcessCancelled(self.cancel_reason or 'cancelled')
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'submissionId': self.submission_id,
+            'assignmentId': self.assignment_id,
+            'userId': self.user_id,
+            'status': self.status,
+            'cancelReason': self.cancel_reason,
+            'enqueuedAt': self.enqueued_at,
+            'startedAt': self.started_at,
+            'finishedAt': self.finished_at
+        }
+
+
+class JobExecutor:
+    """
+    Runs jobs through `handler(job) -> (response dict, status code)` on worker threads
+    Args:
+        handler: Processes one job; raises ProcessCancelled when cancelled mid-run
+        on_cancelled: Called for jobs cancelled before they started (to report them)
+        slots: Number of general worker threads; None for MAX_CONCURRENT_JOBS, or one per core group
+            of the topology when MAX_CONCURRENT_JOBS is not set
+        group_key: Affinity group of a job (e.g. its assignment); None for no affinity
+        batch_handler: Processes several jobs of one group at once, returning
+            one (response dict, status code) per job; None disables batching
+        batch_max: Largest batch handed to batch_handler
+        topology: Pins each slot to its own cores and adds the isolated slots; None leaves slots unpinned
+        job_class: Class of a job; TIMING jobs run on the isolated slots when there are any
+    """
+
+    def __init__(self, handler: Callable[[Job], Any], on_cancelled: Callable[[Job], None],
+                 slots: Optional[int] = None,
+                 group_key: Optional[Callable[[Job], Optional[str]]] = None,
+                 batch_handler: Optional[Callable[[List[Job]], List[Tuple[Dict[str, Any], int]]]] = None,
+                 batch_max: int = BATCH_MAX_SUBMISSIONS,
+                 topology: Optional[CpuTopology] = None,
+                 job_class: Optional[Callable[[Job], Optional[str]]] = None):
+        if slots is None:
+            slots = len(topology.groups) if topology and topology.groups and not MAX_CONCURRENT_JOBS_SET \
+                else MAX_CONCURRENT_JOBS
+        self.handler = handler
+        self.on_cancelled = on_cancelled
+        self.slots = slots
+        self.group_key = group_key or (lambda job: None)
+        self.batch_handler = batch_handler
+        self.batch_max = max(1, batch_max)
+        self.topology = topology
+        self.job_class = job_class or (lambda job: None)
+        self.slot_list = topology.slots(slots) if topology else [Slot(f'slot-{i}') for i in range(slots)]
+        # Timing jobs wait for an isolated slot when there is one
+        self.reserved = any(slot.isolated for slot in self.slot_list)
+        self.general = [slot for slot in self.slot_list if not slot.isolated]
+        self.active = len(self.general)
+        self._latencies: deque = deque(maxlen=LATENCIES_KEPT)
+        self.affine_picks = 0
+        self.batches = 0
+        self._queue: deque = deque()
+        self._jobs: Dict[str, Job] = {}
+        self._finished: 'OrderedDict[str, Job]' = OrderedDict()
+        self._condition = threading.Condition()
+        self._workers = [threading.Thread(target=self._work, args=(slot,), name=f'job-worker-{slot.name}', daemon=True)
+                         for slot in self.slot_list]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, job: Job) -> List[Job]:
+        """Queue a job; returns the queued jobs it superseded"""
+        with self._condition:
+            superseded = [
+                queued for queued in self._queue
+                if job.user_id is not None and queued.user_id == job.user_id
+                and str(queued.assignment_id) == str(job.assignment_id)
+            ]
+            for old in superseded:
+                self._queue.remove(old)
+                self._finish_cancelled(old, f'superseded by submission {job.submission_id}')
+            self._jobs[job.key] = job
+            self._queue.append(job)
+            # Not every worker may take every job
+            self._condition.notify_all()
+        for old in superseded:
+            self._report_cancelled(old)
+        return superseded
+
+    def cancel(self, submission_id: Any, reason: str = 'cancelled by request') -> Optional[Job]:
+        """Cancel a queued or running job; None if it is unknown or already finished"""
+        with self._condition:
+            job = self._jobs.get(str(submission_id))
+            if job is None:
+                return None
+            if job.status == QUEUED:
+                self._queue.remove(job)
+                self._finish_cancelled(job, reason)
+            else:
+                job.cancel_reason = reason
+                job.cancel_event.set()
+                return job
+        self._report_cancelled(job)
+        return job
+
+    def get(self, submission_id: Any) -> Optional[Job]:
+        with self._condition:
+            key = str(submission_id)
+            return self._jobs.get(key) or self._finished.get(key)
+
+    def position(self, job: Job) -> Optional[int]:
+        """0-based position of a queued job"""
+        with self._condition:
+            try:
+                return self._queue.index(job)
+            except ValueError:
+                return None
+
+    def set_active(self, count: int) -> int:
+        """Let only the first `count` general slots take jobs (at least one); returns the new count"""
+        with self._condition:
+            self.active = max(1, min(len(self.general), int(count)))
+            self._condition.notify_all()
+            return self.active
+
+    def take_latencies(self) -> List[Tuple[Optional[str], int, float]]:
+        """(group, batch size, seconds) of the jobs finished since the last call"""
+        with self._condition:
+            latencies = list(self._latencies)
+            self._latencies.clear()
+            return latencies
+
+    def stats(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                'slots': self.slots,
+                'activeSlots': self.active,
+                'queued': len(self._queue),
+                'running': len([job for job in self._jobs.values() if job.status == RUNNING]),
+                'affinePicks': self.affine_picks,
+                'batches': self.batches,
+                'batchMax': self.batch_max if self.batch_handler else 1,
+                'cpuTopology': self.topology.to_dict() if self.topology else None,
+                'cpuSlots': [slot.to_dict() for slot in self.slot_list] if self.topology else None
+            }
+
+    def _finish_cancelled(self, job: Job, reason: str):
+        # caller holds the lock
+        job.cancel_reason = reason
+        job.cancel_event.set()
+        job.status = CANCELLED
+        job.response = {'ok': False, 'status': CANCELLED, 'reason': reason}
+        self._retire(job)
+
+    def _report_cancelled(self, job: Job):
+        try:
+            self.on_cancelled(job)
+        except Exception as e:
+            print(f"ERROR: Failed to report cancelled job {job.submission_id}: {e}")
+        job.done.set()
+
+    def _retire(self, job: Job):
+        # caller holds the lock
+        job.finished_at = time.time()
+        self._jobs.pop(job.key, None)
+        self._finished[job.key] = job
+        self._finished.move_to_end(job.key)
+        while len(self._finished) > FINISHED_JOBS_KEPT:
+            self._finished.popitem(last=False)
+
+    def _admits(self, slot: Slot) -> bool:
+        """Whether a slot is one of the active ones (isolated slots always are)"""
+        return slot.isolated or self.general.index(slot) < self.active
+
+    def _eligible(self, job: Job, slot: Slot) -> bool:
+        """Whether a slot may run a job: isolated slots only take TIMING jobs, which only they take"""
+        timing = self.job_class(job) == TIMING
+        return timing if slot.isolated else not (timing and self.reserved)
+
+    def _take(self, affinity: Optional[str], slot: Slot) -> List[Job]:
+        """Next job for a worker that last served `affinity`, plus same-group jobs to batch with it"""
+        # caller holds the lock
+        eligible = [queued for queued in self._queue if self._eligible(queued, slot)]
+        head = eligible[0]
+        job = head
+        if affinity is not None and time.time() - head.enqueued_at < AFFINITY_MAX_DELAY:
+            for queued in islice(eligible, AFFINITY_LOOKAHEAD):
+                if self.group_key(queued) == affinity:
+                    job = queued
+                    break
+            if job is not head:
+                self.affine_picks += 1
+        self._queue.remove(job)
+        jobs = [job]
+
+        key = self.group_key(job)
+        if self.batch_handler and key is not None and self.batch_max > 1:
+            for queued in eligible:
+                if len(jobs) >= self.batch_max:
+                    break
+                if queued is not job and self.group_key(queued) == key:
+                    self._queue.remove(queued)
+                    jobs.append(queued)
+        if len(jobs) > 1:
+            self.batches += 1
+        return jobs
+
+    def _run(self, jobs: List[Job]) -> List[Tuple[Dict[str, Any], int]]:
+        if len(jobs) == 1:
+            return [self.handler(jobs[0])]
+        return self.batch_handler(jobs)
+
+    def _work(self, slot: Slot):
+        pinned = pin(slot.cpus)
+        placement = dict(slot.to_dict(), pinned=pinned)
+        affinity = None
+        while True:
+            with self._condition:
+                while not (self._admits(slot) and any(self._eligible(queued, slot) for queued in self._queue)):
+                    self._condition.wait()
+                jobs = self._take(affinity, slot)
+                for job in jobs:
+                    job.status = RUNNING
+                    job.started_at = time.time()
+                    job.placement = placement
+            affinity = self.group_key(jobs[0])
+
+            start = time.monotonic()
+            try:
+                outcomes = self._run(jobs)
+            except Exception as e:
+                print(f"ERROR: Jobs {[job.submission_id for job in jobs]} crashed: {e}")
+                outcomes = [({'error': 'runner error', 'message': str(e)}, 500)] * len(jobs)
+            if all(code < 400 and response.get('status') != CANCELLED for response, code in outcomes):
+                with self._condition:
+                    self._latencies.append((affinity, len(jobs), time.monotonic() - start))
+
+            for job, (response, code) in zip(jobs, outcomes):
+                job.response, job.response_code = response, code
+                status = response.get('status') or (COMPLETED if code < 400 else FAILED)
+                with self._condition:
+                    job.status = status
+                    self._retire(job)
+                job.done.set()
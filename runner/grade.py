@@ -0,0 +1,298 @@
+"""
+Offline Bulk Grading
+Grades an archive of submission zips against one task without the backend:
+
+    python -m runner grade fizzbuzz 'archive/*.zip' --output grades.jsonl
+    (or python runner/grade.py ...; from the repository root or runner/)
+
+Submissions are spread over a process pool and graded with the service's
+own pre-check, extraction, run_pytest (or language plugin) and differential
+steps (grading.py); the service itself (web app, executor, CPU pinning,
+result store) is never started. Every result is appended to the JSONL file as soon as it is ready;
+a rerun skips zips already graded with the same content, so an interrupted
+run resumes where it stopped. The CSV next to it is rewritten at the end.
+"""
+
+import argparse
+import csv
+import glob
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Dict, List, Any, Optional
+
+import grading
+import allocations
+import complexity
+import datasets
+import differential
+import time_budget
+from language_plugins import plugin_manager
+
+# Per grading process, like the service's; threads only start with the first analysis
+dataset_store = datasets.DatasetStore(grading.DATASETS_DIR)
+analysis_pool = ThreadPoolExecutor(max_workers=grading.ANALYSIS_WORKERS, thread_name_prefix='analysis')
+
+CSV_COLUMNS = ['zip', 'status', 'score', 'totalTests', 'passedTests', 'failedTests', 'timedOut',
+               'duration', 'cpu', 'maxRssKb', 'feedback']
+
+
+def find_zips(sources: List[str]) -> List[str]:
+    """Zip files under the given directories (recursively) or matching the given globs"""
+    found = []
+    for source in sources:
+        if os.path.isdir(source):
+            found += glob.glob(os.path.join(source, '**', '*.zip'), recursive=True)
+        else:
+            found += [path for path in glob.glob(source, recursive=True) if path.endswith('.zip')]
+    return sorted(set(os.path.abspath(path) for path in found))
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_graded(output_path: str) -> Dict[str, Dict[str, Any]]:
+    """Results of earlier (possibly interrupted) runs by zip, the latest line winning"""
+    graded = {}
+    if not os.path.exists(output_path):
+        return graded
+    with open(output_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # a line cut short by the interruption
+            graded[record['zip']] = record
+    return graded
+
+
+def grade_submission(zip_path: str, tests_dir: str, task_dir: str, language: str,
+                     timeout: float) -> Dict[str, Any]:
+    """
+    Grade one zip like the service grades a /run job (without smoke tier, storage or callback)
+    Returns:
+        Dict with status ('completed', 'failed' or 'error'), counts, score, feedback,
+        per-test outcomes and resources
+    """
+    task_metadata = grading.load_task_metadata(task_dir)
+    start = time.perf_counter()
+    workdir = None
+    try:
+        with zipfile.ZipFile(zip_path, 'r') as zf:
+            precheck = grading.run_precheck(language, zf, task_metadata.get('precheck', {}))
+        if not precheck['ok']:
+            test_result = {
+                'total_tests': grading.count_test_functions(tests_dir),
+                'passed_tests': 0,
+                'failed_tests': 0,
+                'score': 0.0,
+                'feedback': 'Pre-check failed:\n' + '\n'.join(f"  • {error}" for error in precheck['errors']),
+                'pytest_executed': True
+            }
+        else:
+            workdir = tempfile.mkdtemp(prefix='grade_')
+            memory = allocations.memory_config(task_metadata) if language == 'python' else None
+            archive = None if grading.zip_import_blocker(language, zip_path, tests_dir, task_metadata, memory) \
+                else os.path.abspath(zip_path)
+            workdir_tests, extracted_files = grading.extract_submission(zip_path, tests_dir, workdir, extract=not archive)
+            data_dir = dataset_store.publish(task_dir, task_metadata)
+            if data_dir:
+                datasets.expose(data_dir, workdir)
+            settings = grading.analysis_settings(task_metadata)
+            analysis_future = analysis_pool.submit(
+                plugin_manager.analyze, language, workdir, settings, archive) if settings is not None else None
+            if language == 'python':
+                test_result = grading.run_pytest(workdir, workdir_tests, timeout=timeout, data_dir=data_dir,
+                                                memory=memory, archive=archive)
+                if memory:
+                    test_result['memory'] = allocations.memory_summary(test_result.get('tests', []), memory)
+            else:
+                test_result = grading.run_plugin_tests(language, workdir, extracted_files, workdir_tests, timeout)
+
+            config = differential.differential_config(task_metadata, task_dir) if language == 'python' else None
+            reference = time_budget.reference_dir(task_dir)
+            if config and reference and not test_result.get('timed_out'):
+                outcome = differential.run_differential(workdir, reference, config, timeout)
+                test_result = differential.merge_differential(test_result, outcome, config)
+            config = complexity.complexity_config(task_metadata, task_dir) if language == 'python' else None
+            if config and not test_result.get('timed_out'):
+                test_result = complexity.merge_complexity(test_result, complexity.run_complexity(workdir, config))
+            test_result['analysis'] = grading.collect_analysis(analysis_future)
+            if precheck['warnings']:
+                test_result['feedback'] = '\n'.join(
+                    part for part in (test_result.get('feedback'), grading.precheck_feedback(precheck)) if part)
+    except (zipfile.BadZipFile, OSError) as e:
+        return {'status': 'error', 'feedback': f"{type(e).__name__}: {e}",
+                'duration': round(time.perf_counter() - start, 4)}
+    finally:
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        'status': 'completed' if test_result.get('pytest_executed') else 'failed',
+        'score': round(test_result.get('score', 0.0), 6),
+        'totalTests': test_result.get('total_tests', 0),
+        'passedTests': test_result.get('passed_tests', 0),
+        'failedTests': test_result.get('failed_tests', 0),
+        'timedOut': bool(test_result.get('timed_out')),
+        'partial': test_result.get('partial'),
+        'duration': round(time.perf_counter() - start, 4),
+        'feedback': test_result.get('feedback', ''),
+        'tests': [{'nodeid': test['nodeid'], 'outcome': test['outcome'], 'message': test.get('message', '')}
+                  for test in test_result.get('tests', [])],
+        'memory': test_result.get('memory'),
+        'resources': test_result.get('resources'),
+        'complexity': test_result.get('complexity'),
+        'analysis': test_result.get('analysis')
+    }
+
+
+def _quiet_worker():
+    """Pool initializer: the service's DEBUG output would drown the progress lines"""
+    sys.stdout = open(os.devnull, 'w')
+
+
+def write_csv(path: str, records: List[Dict[str, Any]]):
+    """One row per zip; one extra column per test with its outcome"""
+    test_ids = sorted({test['nodeid'] for record in records for test in record.get('tests') or []})
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_COLUMNS + test_ids)
+        for record in sorted(records, key=lambda r: r['zip']):
+            resources = record.get('resources') or {}
+            row = dict(record,
+                       cpu=round(resources.get('cpu_user', 0.0) + resources.get('cpu_system', 0.0), 4)
+                       if resources else '',
+                       maxRssKb=resources.get('max_rss_kb', ''),
+                       feedback=' '.join(line.strip() for line in (record.get('feedback') or '').splitlines()))
+            outcomes = {test['nodeid']: test['outcome'] for test in record.get('tests') or []}
+            writer.writerow([row.get(column, '') for column in CSV_COLUMNS] + [outcomes.get(t, '') for t in test_ids])
+    os.replace(tmp_path, path)
+
+
+def grade_all(zips: List[str], tests_dir: str, task_dir: str, language: str, timeout: float,
+              output_path: str, csv_path: str, workers: int, root: Optional[str] = None,
+              force: bool = False) -> Dict[str, Any]:
+    """
+    Grade zips in a process pool, appending each result to output_path
+    Args:
+        root: Zip names in the output are relative to this directory
+        force: Regrade zips already present in output_path
+    Returns:
+        Dict with counts of graded, skipped and errored zips and the mean score
+    """
+    root = root or os.path.commonpath([os.path.dirname(path) for path in zips])
+    graded = {} if force else load_graded(output_path)
+    pending = []
+    for path in zips:
+        name = os.path.relpath(path, root)
+        digest = file_digest(path)
+        previous = graded.get(name)
+        if previous and previous.get('sha256') == digest and previous.get('status') != 'error':
+            continue
+        pending.append((path, name, digest))
+    print(f"Grading {len(pending)} of {len(zips)} zips with {workers} workers "
+          f"({len(zips) - len(pending)} already graded in {output_path})")
+
+    for path in (output_path, csv_path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    start = time.perf_counter()
+    done = 0
+    interrupted = False
+    with open(output_path, 'w' if force else 'a', encoding='utf-8') as out, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_quiet_worker) as pool:
+        futures = {pool.submit(grade_submission, path, tests_dir, task_dir, language, timeout): (name, digest)
+                   for path, name, digest in pending}
+        try:
+            for future in as_completed(futures):
+                name, digest = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {'status': 'error', 'feedback': f"{type(e).__name__}: {e}"}
+                record = dict(result, zip=name, sha256=digest, gradedAt=time.time())
+                out.write(json.dumps(record) + '\n')
+                out.flush()
+                graded[name] = record
+                done += 1
+                print(f"[{done}/{len(pending)}] {name}: {record['status']} "
+                      f"{record.get('passedTests', 0)}/{record.get('totalTests', 0)}")
+        except KeyboardInterrupt:
+            interrupted = True
+            print(f"Interrupted after {done} zips; rerun the same command to resume")
+            # Zips already handed to a worker still finish, nothing new starts
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    records = list(graded.values())
+    write_csv(csv_path, records)
+    scores = [record['score'] for record in records if record.get('status') != 'error']
+    return {
+        'zips': len(zips),
+        'graded': done,
+        'skipped': len(zips) - len(pending),
+        'errors': len([record for record in records if record.get('status') == 'error']),
+        'meanScore': round(sum(scores) / len(scores), 4) if scores else None,
+        'duration': round(time.perf_counter() - start, 2),
+        'interrupted': interrupted,
+        'output': output_path,
+        'csv': csv_path
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m runner grade',
+                                     description='Grade a directory of submission zips offline')
+    parser.add_argument('task', nargs='?', help='Task slug (built-in or teacher-uploaded)')
+    parser.add_argument('zips', nargs='+', help='Directories (searched recursively) or globs of zips')
+    parser.add_argument('--tests', help='Tests directory to use instead of a task slug')
+    parser.add_argument('--language', help="Submission language (default: task.json 'language', else python)")
+    parser.add_argument('--timeout', type=float, help="Per-zip test timeout (default: the task's time budget maximum)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help='Parallel grading processes')
+    parser.add_argument('--output', default='grades.jsonl', help='JSONL results, also the resume log')
+    parser.add_argument('--csv', help='CSV summary (default: --output with .csv)')
+    parser.add_argument('--force', action='store_true', help='Regrade zips that were already graded')
+    args = parser.parse_args(argv)
+
+    if args.tests:
+        # Without a slug every positional argument is a zip source
+        sources = ([args.task] if args.task else []) + args.zips
+        tests_dir = os.path.abspath(args.tests)
+        task_dir = os.path.dirname(tests_dir)
+    else:
+        if not args.task:
+            parser.error('a task slug or --tests is required')
+        sources = args.zips
+        task_dir = grading.task_dir_for(args.task)
+        tests_dir = os.path.join(task_dir, 'tests')
+    if not os.path.isdir(tests_dir):
+        parser.error(f'tests directory not found: {tests_dir}')
+
+    zips = find_zips(sources)
+    if not zips:
+        parser.error('no zip files found')
+
+    task_metadata = grading.load_task_metadata(task_dir)
+    language = args.language or task_metadata.get('language') or 'python'
+    timeout = args.timeout or time_budget.budget_config(task_metadata)['max']
+    output_path = os.path.abspath(args.output)
+    csv_path = os.path.abspath(args.csv or os.path.splitext(output_path)[0] + '.csv')
+    summary = grade_all(zips, tests_dir, task_dir, language, timeout, output_path, csv_path,
+                        max(1, args.workers), force=args.force)
+    print(json.dumps(summary, indent=2))
+    return 130 if summary['interrupted'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,752 @@
+"""
+Grading Steps
+The parts of grading a submission that the service (runner.py) and the
+offline bulk grader (grade.py) share: task lookup, the static pre-check,
+extraction, the pytest run (alone, batched or through a language plugin)
+and shaping its result. Importing this module starts nothing: no web
+app, no worker threads, no CPU pinning, no result store.
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import zipfile
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import allocations
+import partial_credit
+import profiling
+import tracing
+from aca_pytest import plugin_options
+from language_plugins import plugin_manager
+from language_plugins.output_capture import run_captured, ProcessCancelled, combine_usage
+from resources import share_usage
+
+# Get absolute paths relative to this file
+RUNNER_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(RUNNER_DIR)
+RESULTS_DIR = os.getenv('RESULTS_DIR', os.path.join(PROJECT_ROOT, 'backend', 'src', 'data', 'results'))
+TASKS_DIR = os.getenv('TASKS_DIR', os.path.join(PROJECT_ROOT, 'tasks'))
+CUSTOM_TASKS_DIR = os.path.join(PROJECT_ROOT, 'backend', 'src', 'data', 'tests')
+DATASETS_DIR = os.getenv('DATASETS_DIR', os.path.join(RESULTS_DIR, 'datasets'))
+
+# Source files larger than this are not loaded for the static pre-check
+PRECHECK_MAX_FILE_BYTES = int(os.getenv('PRECHECK_MAX_FILE_BYTES', 1024 * 1024))
+# Added to a batched session's timeout (the sum of its submissions' budgets) for collection
+BATCH_TIMEOUT_MARGIN = float(os.getenv('BATCH_TIMEOUT_MARGIN', 10))
+# Static analysis runs beside the tests on its own threads; a job waits at most this long for it after them
+ANALYSIS_WORKERS = int(os.getenv('ANALYSIS_WORKERS', 2))
+ANALYSIS_TIMEOUT = float(os.getenv('ANALYSIS_TIMEOUT', 10))
+
+
+def run_pytest(workdir, test_dir, profile_output=None, trace_span=None, timeout=60, cancel_event=None,
+               select=None, deselect=None, data_dir=None, memory=None, archive=None):
+    """
+    Run pytest and return results (sampling the child into profile_output, tracing under trace_span)
+    select runs only the given node ids instead of all of test_dir; deselect skips node ids;
+    data_dir is the task's published dataset (see datasets.py); memory enables per-test
+    memory instrumentation (allocations.memory_config); archive is the submission zip
+    when it is imported from there instead of extracted into workdir
+    """
+    report_path = os.path.join(workdir, 'report.json')
+    if os.path.exists(report_path):
+        os.remove(report_path)  # left by an earlier tier: a crashed run must not pass it off as its own
+    
+    # Ensure test_dir exists and has test files
+    if not os.path.exists(test_dir):
+        return {
+            'success': False,
+            'total_tests': 0,
+            'passed_tests': 0,
+            'failed_tests': 0,
+            'score': 0.0,
+            'feedback': f'Test directory not found: {test_dir}',
+            'pytest_executed': False  # Pytest won't execute
+        }
+    
+    test_files = [f for f in os.listdir(test_dir) if f.startswith('test_') and f.endswith('.py')]
+    if not test_files:
+        return {
+            'success': False,
+            'total_tests': 0,
+            'passed_tests': 0,
+            'failed_tests': 0,
+            'score': 0.0,
+            'feedback': f'No test files found in {test_dir}',
+            'pytest_executed': False  # Pytest won't execute (no test files)
+        }
+    
+    print(f"DEBUG: Running pytest with {len(test_files)} test files in {test_dir}")
+    
+    cmd = [
+        'python', '-m', 'pytest',
+        '-q',
+        # Let student prints reach our bounded pipes instead of pytest's
+        # unbounded capture (which would end up in report.json)
+        '--capture=no',
+        '--disable-warnings',
+        '--json-report',
+        f'--json-report-file={report_path}',
+        test_dir
+    ]
+    env = dict(os.environ)
+    if deselect:
+        deselect_path = os.path.join(workdir, '.aca-deselect')
+        with open(deselect_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(deselect) + '\n')
+        env['ACA_DESELECT_FILE'] = deselect_path
+        cmd[-1:-1] = plugin_options('deselect', env)
+    if data_dir:
+        env['ACA_DATA_DIR'] = data_dir
+        cmd[-1:-1] = plugin_options('data', env)
+    if profile_output:
+        cmd[-1:-1] = profiling.pytest_profile_options(profile_output, env)
+    memory_path = os.path.join(workdir, '.aca-memory.json') if memory else None
+    if memory:
+        if os.path.exists(memory_path):
+            os.remove(memory_path)  # left by an earlier tier
+        cmd[-1:-1] = allocations.pytest_memory_options(memory, workdir, memory_path, env)
+    progress_path = os.path.join(workdir, '.aca-progress.jsonl')
+    cmd[-1:-1] = partial_credit.pytest_progress_options(progress_path, env)
+    spans_path = os.path.join(workdir, '.aca-spans.jsonl') if trace_span and trace_span.tracer.enabled else None
+    if trace_span:
+        cmd[-1:-1] = tracing.pytest_trace_options(trace_span, spans_path, env)
+    if select:
+        cmd[-1:] = [os.path.join(workdir, nodeid) for nodeid in select]
+    if archive:
+        # First on the path, like the workdir it stands in for (ahead of the runner's own modules)
+        env['PYTHONPATH'] = os.pathsep.join([archive] + [path for path in env.get('PYTHONPATH', '').split(os.pathsep) if path])
+    
+    print(f"DEBUG: Pytest command: {' '.join(cmd)}")
+    
+    try:
+        result = run_captured(cmd, cwd=workdir, timeout=timeout, env=env, cancel_event=cancel_event)
+        if trace_span and spans_path and os.path.exists(spans_path):
+            trace_span.tracer.ingest_file(spans_path)
+            os.remove(spans_path)  # a later tier appends to a fresh file
+        
+        print(f"DEBUG: Pytest return code: {result.returncode}")
+        print(f"DEBUG: Pytest output bytes: stdout={result.stdout_bytes}, stderr={result.stderr_bytes}, truncated={result.truncated}")
+        print(f"DEBUG: Pytest stdout (first 1000 chars): {result.stdout[:1000] if result.stdout else 'None'}")
+        print(f"DEBUG: Pytest stderr (first 500 chars): {result.stderr[:500] if result.stderr else 'None'}")
+        
+        # Parse results
+        total_tests = 0
+        passed_tests = 0
+        failed_tests = 0
+        test_records = []
+        feedback = ""
+        pytest_executed = True  # pytest was executed (even if with errors)
+        
+        if result.overflowed:
+            # Killed for flooding output: whatever report exists is incomplete
+            feedback = (f"Test execution stopped: output limit exceeded on {result.overflowed} "
+                        f"({result.stdout_bytes + result.stderr_bytes} bytes written)")
+            tail = (result.stdout if result.overflowed == 'stdout' else result.stderr)[-500:]
+            if tail.strip():
+                feedback += f"\nLast output:\n{tail}"
+            print(f"DEBUG: Output overflow on {result.overflowed}, pytest killed")
+            partial = stopped_run_result(progress_path, 'output', feedback, partial_credit.CRASHED,
+                                         'Killed: output limit exceeded during this test',
+                                         result.duration, result.usage, result.truncated)
+            if partial:
+                return partial
+        elif os.path.exists(report_path):
+            try:
+                with open(report_path, 'r') as f:
+                    report = json.load(f)
+                
+                print(f"DEBUG: Full JSON report structure: {json.dumps(report, indent=2)[:2000]}")
+                
+                # CRITICAL FIX: Count from tests array FIRST - this is most reliable
+                # The tests array always exists and has the actual test results
+                tests_list = report.get('tests', [])
+                if tests_list:
+                    # Count directly from tests array - most reliable method
+                    total_tests = len(tests_list)
+                    passed_tests = len([t for t in tests_list if t.get('outcome') == 'passed'])
+                    failed_tests = len([t for t in tests_list if t.get('outcome') == 'failed'])
+                    skipped_tests = len([t for t in tests_list if t.get('outcome') == 'skipped'])
+                    print(f"DEBUG: COUNTED FROM TESTS ARRAY: total={total_tests}, passed={passed_tests}, failed={failed_tests}, skipped={skipped_tests}")
+                    
+                    test_records = extract_test_records(tests_list)
+                    if memory:
+                        test_records = allocations.attach_memory(test_records, memory_path)
+                    
+                    # Log each test for debugging
+                    for i, test in enumerate(tests_list):
+                        nodeid = test.get('nodeid', 'unknown')
+                        outcome = test.get('outcome', 'unknown')
+                        print(f"DEBUG: Test {i+1}: {nodeid} - outcome: {outcome}")
+                else:
+                    # Fallback to summary if tests array is empty
+                    summary = report.get('summary', {})
+                    
+                    # Try different possible structures for pytest-json-report
+                    # Structure 1: report.summary.total, report.summary.passed, etc.
+                    total_tests = summary.get('total', 0)
+                    passed_tests = summary.get('passed', 0)
+                    failed_tests = summary.get('failed', 0)
+                    
+                    # Structure 2: Maybe summary is directly the numbers?
+                    if total_tests == 0 and isinstance(summary, dict):
+                        # Try alternative keys
+                        total_tests = summary.get('total_tests', summary.get('count', 0))
+                        passed_tests = summary.get('passed_tests', summary.get('passed_count', 0))
+                        failed_tests = summary.get('failed_tests', summary.get('failed_count', 0))
+                    
+                    # Structure 3: Maybe the structure is different?
+                    if total_tests == 0:
+                        # Try report-level keys
+                        total_tests = report.get('total', report.get('total_tests', 0))
+                        passed_tests = report.get('passed', report.get('passed_tests', 0))
+                        failed_tests = report.get('failed', report.get('failed_tests', 0))
+                    
+                    print(f"DEBUG: Counted from summary: total={total_tests}, passed={passed_tests}, failed={failed_tests}")
+                
+                # LAST RESORT: Parse from pytest output if JSON report is empty or tests array was empty
+                if total_tests == 0 and result.stdout:
+                    # Try to parse from stdout: "X passed" or "X failed" or "X passed, Y failed"
+                    import re
+                    passed_match = re.search(r'(\d+)\s+passed', result.stdout)
+                    failed_match = re.search(r'(\d+)\s+failed', result.stdout)
+                    if passed_match or failed_match:
+                        passed_tests = int(passed_match.group(1)) if passed_match else 0
+                        failed_tests = int(failed_match.group(1)) if failed_match else 0
+                        total_tests = passed_tests + failed_tests
+                        print(f"DEBUG: Parsed from stdout: total={total_tests}, passed={passed_tests}, failed={failed_tests}")
+                
+                # Log final counts
+                print(f"DEBUG: ===== FINAL TEST COUNTS =====")
+                print(f"DEBUG: total_tests: {total_tests}")
+                print(f"DEBUG: passed_tests: {passed_tests}")
+                print(f"DEBUG: failed_tests: {failed_tests}")
+                if 'tests' in report and report.get('tests'):
+                    test_outcomes = {}
+                    for test in report.get('tests', []):
+                        outcome = test.get('outcome', 'unknown')
+                        test_outcomes[outcome] = test_outcomes.get(outcome, 0) + 1
+                    print(f"DEBUG: Test outcomes breakdown: {test_outcomes}")
+                
+                # Generate feedback from failed tests
+                tests = report.get('tests', [])
+                failed_tests_list = [t for t in tests if t.get('outcome') == 'failed']
+                
+                if failed_tests_list:
+                    feedback_parts = ["Failed tests:"]
+                    for test in failed_tests_list[:3]:  # Limit to first 3 failures
+                        nodeid = test.get('nodeid', 'Unknown test')
+                        longrepr = test.get('call', {}).get('longrepr', '')
+                        if longrepr:
+                            lines = longrepr.split('\n')
+                            error_line = next((line for line in lines if 'AssertionError' in line), lines[0] if lines else '')
+                            feedback_parts.append(f"  • {nodeid}: {error_line}")
+                    feedback = '\n'.join(feedback_parts)
+                elif total_tests > 0:
+                    feedback = f"All {passed_tests} tests passed!"
+                else:
+                    feedback = "Tests executed but no test results found in report"
+                    
+            except (json.JSONDecodeError, IOError) as e:
+                feedback = f"Failed to parse test results: {str(e)}"
+                print(f"DEBUG: JSON parse error: {e}")
+        else:
+            # Pytest was executed but no report.json was generated
+            # This could mean pytest-json-report is not installed, or pytest crashed or was killed mid-run
+            reason = partial_credit.crash_reason(result.returncode)
+            partial = stopped_run_result(progress_path, 'crash', f"Test execution stopped: pytest {reason}",
+                                         partial_credit.CRASHED, f"Crashed: pytest {reason} during this test",
+                                         result.duration, result.usage, result.truncated)
+            if partial:
+                return partial
+            feedback = result.stderr or result.stdout or "Test execution completed but no report generated"
+            print(f"DEBUG: No report.json found. Pytest returncode: {result.returncode}")
+            print(f"DEBUG: Pytest stdout: {result.stdout[:500] if result.stdout else 'None'}")
+            print(f"DEBUG: Pytest stderr: {result.stderr[:500] if result.stderr else 'None'}")
+        
+        # Calculate score - ensure it's a float between 0 and 1
+        # CRITICAL: Only calculate if we have tests
+        if total_tests > 0:
+            score = float(passed_tests) / float(total_tests)
+            print(f"DEBUG: Score calculation: {passed_tests} / {total_tests} = {score}")
+        else:
+            score = 0.0
+            print(f"ERROR: total_tests is 0! Cannot calculate score. Setting to 0.0")
+            print(f"ERROR: This means no tests were found or counted!")
+        
+        # Ensure score is between 0 and 1
+        score = max(0.0, min(1.0, score))
+        
+        print(f"DEBUG: ===== FINAL SCORE =====")
+        print(f"DEBUG: Score: {score} ({score * 100}%)")
+        print(f"DEBUG: passed_tests: {passed_tests}")
+        print(f"DEBUG: total_tests: {total_tests}")
+        print(f"DEBUG: =======================")
+        
+        return {
+            'success': result.returncode == 0,
+            'total_tests': total_tests,
+            'passed_tests': passed_tests,
+            'failed_tests': failed_tests,
+            'score': score,
+            'feedback': feedback,
+            'tests': test_records,
+            'output_truncated': result.truncated,
+            'duration': result.duration,
+            'resources': result.usage,
+            'pytest_executed': pytest_executed  # Track if pytest was actually executed
+        }
+        
+    except subprocess.TimeoutExpired as e:
+        # Pytest started but timed out - still counts as executed; the finished tests keep their outcomes
+        partial = stopped_run_result(progress_path, 'timeout', f'Test execution timed out after {timeout:g} seconds',
+                                     partial_credit.TIMED_OUT, f'Timed out after {timeout:g} seconds',
+                                     timeout, getattr(e, 'usage', None))
+        if partial:
+            return dict(partial, timed_out=True)
+        return {
+            'success': False,
+            'total_tests': 0,
+            'passed_tests': 0,
+            'failed_tests': 0,
+            'score': 0.0,
+            'feedback': f'Test execution timed out after {timeout:g} seconds',
+            'timed_out': True,
+            'duration': timeout,
+            'resources': getattr(e, 'usage', None),
+            'pytest_executed': True  # Pytest was executed but timed out
+        }
+    except ProcessCancelled:
+        raise
+    except Exception as e:
+        # Other exceptions mean pytest didn't execute
+        return {
+            'success': False,
+            'total_tests': 0,
+            'passed_tests': 0,
+            'failed_tests': 0,
+            'score': 0.0,
+            'feedback': f'Test execution failed: {str(e)}',
+            'pytest_executed': False  # Pytest didn't execute
+        }
+
+
+def failure_line(longrepr):
+    """The most telling line of a pytest failure representation"""
+    lines = longrepr.split('\n')
+    return next((line for line in lines if 'AssertionError' in line),
+                next((line for line in lines if line.startswith('E ')), lines[0] if lines else ''))
+
+
+def extract_test_records(tests_list):
+    """Per-test outcome, duration and failure message from a pytest-json-report tests array"""
+    records = []
+    for test in tests_list:
+        duration = 0.0
+        message = ''
+        for stage in ('setup', 'call', 'teardown'):
+            stage_info = test.get(stage) or {}
+            duration += stage_info.get('duration', 0.0) or 0.0
+            longrepr = stage_info.get('longrepr')
+            if longrepr and not message:
+                message = longrepr
+        records.append({
+            'nodeid': test.get('nodeid', 'unknown'),
+            'outcome': test.get('outcome', 'unknown'),
+            'duration': round(duration, 6),
+            'message': failure_line(message).strip() if message else '',
+            'longrepr': message
+        })
+    return records
+
+
+def partial_result(records, stopped, headline, duration, usage, truncated=False):
+    """
+    A result shaped like run_pytest's from a run that was cut short (see partial_credit.py)
+    Args:
+        records: Every collected test (partial_credit.complete_records)
+        stopped: Why the run stopped ('timeout', 'crash' or 'output')
+        headline: First feedback line
+    """
+    records = [dict(test, duration=round(test['duration'], 6) if test['duration'] is not None else None,
+                    message=failure_line(test['longrepr']).strip() if test['longrepr'] else '')
+               for test in records]
+    summary = partial_credit.partial_summary(records, stopped)
+    total_tests = len(records)
+    passed_tests = len([t for t in records if t['outcome'] == 'passed'])
+    failed = [t for t in records if t['outcome'] in ('failed', 'error', partial_credit.TIMED_OUT)]
+    feedback = f"{headline}\nPartial credit: {summary['finished']} of {total_tests} tests finished"
+    if summary['notRun']:
+        feedback += f" ({summary['notRun']} not run)"
+    if failed:
+        feedback += '\n' + '\n'.join(["Failed tests:"] + [f"  • {t['nodeid']}: {t['message']}" for t in failed[:3]])
+    print(f"DEBUG: Partial result ({stopped}): {passed_tests}/{total_tests} passed, {summary}")
+    return {
+        'success': False,
+        'total_tests': total_tests,
+        'passed_tests': passed_tests,
+        'failed_tests': len(failed),
+        'score': float(passed_tests) / float(total_tests) if total_tests else 0.0,
+        'feedback': feedback,
+        'tests': records,
+        'partial': summary,
+        'output_truncated': truncated,
+        'duration': duration,
+        'resources': usage,
+        'pytest_executed': True
+    }
+
+
+def stopped_run_result(progress_path, stopped, headline, outcome, message, duration, usage, truncated=False):
+    """partial_result from what aca_pytest.progress recorded; None if the run never finished collecting"""
+    progress = partial_credit.read_progress(progress_path)
+    if not progress or not progress['collected']:
+        return None
+    records = partial_credit.complete_records(progress['collected'], progress['tests'], progress['running'],
+                                              outcome, message)
+    return partial_result(records, stopped, headline, duration, usage, truncated)
+
+
+def batch_result(output, timeout, usage):
+    """A submission's result from a batched session (aca_pytest.batch), shaped like run_pytest's"""
+    if output['timed_out'] and output.get('collected'):
+        interrupted = output.get('interrupted')
+        records = partial_credit.complete_records(
+            output['collected'], [test for test in output['tests'] if test['nodeid'] != interrupted],
+            interrupted, partial_credit.TIMED_OUT, f'Timed out after {timeout:g} seconds')
+        return dict(partial_result(records, 'timeout', f'Test execution timed out after {timeout:g} seconds',
+                                   timeout, usage), timed_out=True)
+    if output['timed_out']:
+        return {
+            'success': False,
+            'total_tests': 0,
+            'passed_tests': 0,
+            'failed_tests': 0,
+            'score': 0.0,
+            'feedback': f'Test execution timed out after {timeout:g} seconds',
+            'timed_out': True,
+            'duration': timeout,
+            'resources': usage,
+            'pytest_executed': True
+        }
+    records = [dict(test, duration=round(test['duration'], 6),
+                    message=failure_line(test['longrepr']).strip() if test['longrepr'] else '')
+               for test in output['tests']]
+    total_tests = len(records)
+    passed_tests = len([t for t in records if t['outcome'] == 'passed'])
+    failed = [t for t in records if t['outcome'] == 'failed']
+    if failed:
+        feedback = '\n'.join(["Failed tests:"] + [f"  • {t['nodeid']}: {t['message']}" for t in failed[:3]])
+    elif total_tests > 0:
+        feedback = f"All {passed_tests} tests passed!"
+    else:
+        feedback = "Tests executed but no test results found in report"
+    return {
+        'success': not failed and passed_tests == total_tests,
+        'total_tests': total_tests,
+        'passed_tests': passed_tests,
+        'failed_tests': len(failed),
+        'score': float(passed_tests) / float(total_tests) if total_tests else 0.0,
+        'feedback': feedback,
+        'tests': records,
+        'output_truncated': False,
+        'duration': output['duration'],
+        'resources': usage,
+        'pytest_executed': True
+    }
+
+
+def run_pytest_batch(entries, tests_dir, data_dir=None):
+    """
+    Run one pytest session over several submissions' workdirs (see aca_pytest/batch.py)
+    Args:
+        entries: Job key -> {'workdir', 'timeout', 'archive'}
+        tests_dir: The assignment's tests, collected once for the whole batch
+    Returns:
+        Job key -> result shaped like run_pytest's; submissions without a result are left out
+    """
+    batch_dir = tempfile.mkdtemp(prefix='batch_')
+    try:
+        copy_tests(tests_dir, os.path.join(batch_dir, 'tests'))
+        submissions = [{'id': key, 'workdir': entry['workdir'], 'timeout': entry['timeout'],
+                        'archive': entry.get('archive'),
+                        'output': os.path.join(batch_dir, f'result-{index}.json')}
+                       for index, (key, entry) in enumerate(entries.items())]
+        spec_path = os.path.join(batch_dir, 'batch.json')
+        with open(spec_path, 'w', encoding='utf-8') as f:
+            json.dump(submissions, f)
+
+        env = dict(os.environ, ACA_BATCH_FILE=spec_path)
+        cmd = ['python', '-m', 'pytest', '-q', '--capture=no', '--disable-warnings'] + plugin_options('batch', env)
+        if data_dir:
+            env['ACA_DATA_DIR'] = data_dir
+            cmd += plugin_options('data', env)
+        cmd.append('tests')
+        # Every submission keeps its own budget; the margin covers the one-off collection
+        timeout = sum(entry['timeout'] for entry in entries.values()) + BATCH_TIMEOUT_MARGIN
+        print(f"DEBUG: Batch command: {' '.join(cmd)} ({len(submissions)} submissions, timeout {timeout:g}s)")
+        usage = None
+        try:
+            result = run_captured(cmd, cwd=batch_dir, timeout=timeout, env=env)
+            usage = result.usage
+            print(f"DEBUG: Batch return code: {result.returncode}, stdout (first 1000 chars): {result.stdout[:1000]}")
+            if result.overflowed:
+                # Cannot tell whose output flooded the pipe: regrade everyone alone
+                return {}
+        except subprocess.TimeoutExpired as e:
+            usage = getattr(e, 'usage', None)
+            print(f"DEBUG: Batch session timed out after {timeout:g}s")
+
+        outputs = {}
+        for submission in submissions:
+            try:
+                with open(submission['output'], 'r', encoding='utf-8') as f:
+                    outputs[submission['id']] = json.load(f)
+            except (IOError, json.JSONDecodeError):
+                continue
+        total = sum(output['duration'] for output in outputs.values()) or 1.0
+        return {
+            key: batch_result(output, entries[key]['timeout'],
+                              share_usage(usage, output['duration'] / total))
+            for key, output in outputs.items()
+        }
+    finally:
+        shutil.rmtree(batch_dir, ignore_errors=True)
+
+
+def run_plugin_tests(language, workdir, files, test_dir, timeout=None, cancel_event=None):
+    """Run tests through a language plugin and return results shaped like run_pytest's"""
+    execution = plugin_manager.execute_tests(language, workdir, files, test_dir, timeout, cancel_event)
+    result = execution.get('result') or {}
+    tests_executed = 'tests' in execution
+    
+    print(f"DEBUG: Plugin execution for {language}: success={execution.get('success')}, build={execution.get('build')}")
+    
+    return {
+        'success': execution.get('success', False) and result.get('failed_tests', 0) == 0,
+        'total_tests': result.get('total_tests', 0),
+        'passed_tests': result.get('passed_tests', 0),
+        'failed_tests': result.get('failed_tests', 0),
+        'score': max(0.0, min(1.0, float(result.get('score', 0.0)))),
+        'feedback': result.get('feedback') or execution.get('error', ''),
+        'tests': [
+            {'nodeid': t['name'], 'outcome': t['outcome'], 'duration': 0.0, 'message': t.get('message', '')}
+            for t in execution.get('tests', [])
+        ],
+        'build': execution.get('build'),
+        'resources': execution.get('resources'),
+        'timed_out': execution.get('timed_out', False),
+        # Only the test binary's run time counts towards the time budget
+        'duration': (execution.get('build') or {}).get('run_time') if tests_executed else None,
+        # Compile errors still count as an executed run, like pytest collection errors
+        'pytest_executed': tests_executed or 'build' in execution
+    }
+
+
+def copy_tests(tests_dir, workdir_tests):
+    """Copy an assignment's test files into a job workdir"""
+    os.makedirs(workdir_tests, exist_ok=True)
+    for name in os.listdir(tests_dir):
+        src = os.path.join(tests_dir, name)
+        dst = os.path.join(workdir_tests, name)
+        if os.path.isdir(src):
+            shutil.copytree(src, dst, dirs_exist_ok=True)
+        else:
+            shutil.copy2(src, dst)
+
+
+def extract_submission(submission_zip, tests_dir, workdir, extract=True):
+    """
+    Unpack a submission zip and the assignment's tests into a job workdir
+    With extract=False only the tests are copied: the submission is imported
+    straight from its zip (see zip_import_blocker)
+    Returns:
+        (workdir tests directory, names of the submitted files outside the tests)
+    """
+    # Extract submission files
+    if extract:
+        print("DEBUG: Extracting ZIP file...")  # Debug
+        with zipfile.ZipFile(submission_zip, 'r') as zf:
+            zf.extractall(workdir)
+        print("DEBUG: ZIP extracted successfully")  # Debug
+
+    # Copy test files to workdir
+    workdir_tests = os.path.join(workdir, 'tests')
+    copy_tests(tests_dir, workdir_tests)
+    print(f"DEBUG: Copied tests from {tests_dir} to {workdir_tests}")
+
+    # Get extracted files list
+    extracted_files = []
+    if not extract:
+        with zipfile.ZipFile(submission_zip, 'r') as zf:
+            extracted_files = [os.path.basename(name) for name in zf.namelist()
+                               if not name.endswith('/') and not os.path.basename(name).startswith('test_')]
+    for root, dirs, files in os.walk(workdir):
+        for file in files:
+            # Skip test files and files in test directories
+            if not file.startswith('test_') and 'tests' not in root:
+                extracted_files.append(file)
+
+    print(f"DEBUG: Found extracted files: {extracted_files}")
+    return workdir_tests, extracted_files
+
+
+def zip_import_blocker(language, submission_zip, tests_dir, task_metadata, memory=None):
+    """
+    Why a submission has to be extracted for this job; None if pytest can import it
+    straight from the zip (small pure-Python submissions, see PythonPlugin.zip_import_blocker)
+    """
+    if language != 'python':
+        return f'{language} is compiled from files'
+    if task_metadata.get('zipImport') is False:
+        return 'disabled in task.json'
+    # These load the submission by file path
+    for stage in ('differential', 'complexity'):
+        if task_metadata.get(stage):
+            return f'{stage} configured'
+    if memory:
+        return 'memory instrumentation'
+    with zipfile.ZipFile(submission_zip, 'r') as zf:
+        return plugin_manager.get_plugin(language).zip_import_blocker(zf, tests_dir)
+
+
+def task_dir_for(slug):
+    """Directory of a built-in task, or of a teacher-uploaded one"""
+    task_dir = os.path.join(TASKS_DIR, slug)
+    if not os.path.exists(task_dir):
+        task_dir = os.path.join(CUSTOM_TASKS_DIR, slug)
+    return task_dir
+
+
+def load_task_metadata(task_dir):
+    """Read a task's optional task.json (pre-check rules and other per-assignment settings)"""
+    metadata_path = os.path.join(task_dir, 'task.json')
+    if not os.path.exists(metadata_path):
+        return {}
+    try:
+        with open(metadata_path, 'r', encoding='utf-8') as f:
+            metadata = json.load(f)
+        return metadata if isinstance(metadata, dict) else {}
+    except (json.JSONDecodeError, IOError) as e:
+        print(f"ERROR: Could not read {metadata_path}: {e}")
+        return {}
+
+
+def list_test_functions(test_dir):
+    """Test ids ('file.py::test' or 'file.py::Class::test') found statically, without starting pytest"""
+    import ast
+    test_ids = []
+    for name in sorted(os.listdir(test_dir)):
+        if not (name.startswith('test_') and name.endswith('.py')):
+            continue
+        try:
+            with open(os.path.join(test_dir, name), 'r', encoding='utf-8') as f:
+                tree = ast.parse(f.read())
+        except (SyntaxError, ValueError, IOError):
+            continue
+        for node in tree.body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name.startswith('test'):
+                test_ids.append(f"{name}::{node.name}")
+            elif isinstance(node, ast.ClassDef) and node.name.startswith('Test'):
+                test_ids.extend(f"{name}::{node.name}::{n.name}" for n in node.body
+                                if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef)) and n.name.startswith('test'))
+    return test_ids
+
+
+def count_test_functions(test_dir):
+    """Count test functions statically, for results of runs that never start pytest"""
+    return len(list_test_functions(test_dir))
+
+
+def analysis_settings(task_metadata):
+    """The task's static analysis settings; None when it is switched off (it is on by default)"""
+    config = task_metadata.get('analysis', True)
+    if config is False or (isinstance(config, dict) and config.get('enabled') is False):
+        return None
+    return config if isinstance(config, dict) else {}
+
+
+def collect_analysis(future):
+    """Wait for the job's static analysis; never fails the job"""
+    if future is None:
+        return None
+    try:
+        return future.result(timeout=ANALYSIS_TIMEOUT)
+    except FutureTimeoutError:
+        future.cancel()
+        print(f"ERROR: Static analysis did not finish within {ANALYSIS_TIMEOUT}s")
+        return {'error': 'timed out'}
+    except Exception as e:
+        print(f"ERROR: Static analysis failed: {e}")
+        return {'error': str(e)}
+
+
+def merge_tier_results(smoke_result, rest_result):
+    """Combine the smoke tier and the remaining tests into one full-suite result"""
+    if not rest_result.get('pytest_executed') or (rest_result.get('timed_out') and not rest_result.get('tests')):
+        # No per-test outcomes for the rest: report it like an unsplit run would be
+        return dict(rest_result, duration=None,
+                    resources=combine_usage([smoke_result.get('resources'), rest_result.get('resources')]))
+    tests = smoke_result.get('tests', []) + rest_result.get('tests', [])
+    total_tests = smoke_result['total_tests'] + rest_result['total_tests']
+    passed_tests = smoke_result['passed_tests'] + rest_result['passed_tests']
+    failed = [test for test in tests if test['outcome'] == 'failed']
+    if rest_result.get('partial'):
+        feedback = rest_result['feedback']
+    elif failed:
+        feedback = '\n'.join(["Failed tests:"] + [f"  • {test['nodeid']}: {test['message']}" for test in failed[:3]])
+    elif total_tests > 0 and passed_tests == total_tests:
+        feedback = f"All {passed_tests} tests passed!"
+    else:
+        feedback = rest_result.get('feedback') or smoke_result.get('feedback', '')
+    durations = [result.get('duration') for result in (smoke_result, rest_result)]
+    return dict(
+        rest_result,
+        success=total_tests > 0 and passed_tests == total_tests,
+        total_tests=total_tests,
+        passed_tests=passed_tests,
+        failed_tests=smoke_result['failed_tests'] + rest_result['failed_tests'],
+        score=float(passed_tests) / float(total_tests) if total_tests else 0.0,
+        feedback=feedback,
+        tests=tests,
+        output_truncated=smoke_result.get('output_truncated') or rest_result.get('output_truncated'),
+        duration=sum(durations) if None not in durations else None,
+        resources=combine_usage([smoke_result.get('resources'), rest_result.get('resources')])
+    )
+
+
+def run_precheck(language, zf, precheck_config):
+    """Run the language plugin's static pre-check on an open submission zip"""
+    start = time.perf_counter()
+    plugin = plugin_manager.get_plugin(language)
+    if not plugin:
+        return {'ok': True, 'errors': [], 'warnings': [], 'duration': 0.0}
+    
+    extensions = tuple(plugin.config.get('extensions', []))
+    files = {}
+    for info in zf.infolist():
+        if info.is_dir():
+            continue
+        # Only source files are read, and only small ones; the rest is just listed
+        load = info.filename.endswith(extensions) and info.file_size <= PRECHECK_MAX_FILE_BYTES
+        files[info.filename] = zf.read(info) if load else None
+    
+    try:
+        result = plugin.pre_check(files, precheck_config)
+    except Exception as e:
+        # A broken checker must never reject a submission
+        print(f"ERROR: Pre-check crashed, skipping it: {e}")
+        result = {'ok': True, 'errors': []}
+    result.setdefault('warnings', [])
+    result['duration'] = time.perf_counter() - start
+    return result
+
+
+def precheck_feedback(precheck):
+    """Feedback lines for pre-check warnings (problems that fail only some tests); '' without any"""
+    if not precheck.get('warnings'):
+        return ''
+    return 'Pre-check warnings:\n' + '\n'.join(f"  • {warning}" for warning in precheck['warnings'])
@@ -5,8 +5,10 @@ Language Plugins Package
 from .plugin_manager import plugin_manager
 from .base_plugin import LanguagePlugin, TestResult
 from .python_plugin import PythonPlugin
+from .c_plugin import CPlugin, CppPlugin
+from .output_capture import run_captured, BoundedStream, ProcessCancelled, combine_usage
 
-__all__ = ['plugin_manager', 'LanguagePlugin', 'TestResult', 'PythonPlugin']
+__all__ = ['plugin_manager', 'LanguagePlugin', 'TestResult', 'PythonPlugin', 'CPlugin', 'CppPlugin', 'run_captured', 'BoundedStream', 'ProcessCancelled', 'combine_usage']
 
 
 
@@ -9,6 +9,30 @@ import tempfile
 import subprocess
 import json
 import os
+import threading
+import time
+import zipfile
+from .build_cache import BuildCache, content_key
+from .output_capture import run_captured, ProcessCancelled
+
+ANALYSIS_CACHE_DIR = os.getenv('ANALYSIS_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'aca-analysis-cache'))
+ANALYSIS_CACHE_MAX_MB = int(os.getenv('ANALYSIS_CACHE_MAX_MB', 64))
+# Findings sent with a result (counts always cover all of them)
+ANALYSIS_MAX_FINDINGS = int(os.getenv('ANALYSIS_MAX_FINDINGS', 100))
+# Directories of a job workdir that are not the submission
+ANALYSIS_SKIP_DIRS = {'tests', 'data'}
+
+_analysis_cache: Optional[BuildCache] = None
+_analysis_cache_lock = threading.Lock()
+
+
+def get_analysis_cache() -> BuildCache:
+    """Per-file analysis results, keyed by analyzer, settings and file content"""
+    global _analysis_cache
+    with _analysis_cache_lock:
+        if _analysis_cache is None:
+            _analysis_cache = BuildCache(ANALYSIS_CACHE_DIR, ANALYSIS_CACHE_MAX_MB)
+        return _analysis_cache
 
 
 class LanguagePlugin(ABC):
@@ -108,41 +132,192 @@ class LanguagePlugin(ABC):
         
         return {'is_valid': True, 'errors': []}
     
-    def run_command(self, cmd: List[str], cwd: str, timeout: Optional[int] = None) -> Dict[str, Any]:
+    def pre_check(self, files: Dict[str, Optional[bytes]], metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Cheap static checks run before the submission is extracted or tests start
+        Args:
+            files: Paths inside the submission mapped to their content; content is
+                   only loaded for files with this language's extensions (else None)
+            metadata: The 'precheck' section of the task's task.json
+        Returns:
+            Dict with 'ok', a list of human-readable 'errors' (no test can pass: the
+            submission is not run) and 'warnings' (some tests will fail: it still runs)
+        """
+        errors = [
+            f'Required file missing: {name}'
+            for name in metadata.get('requiredFiles', [])
+            if name not in files
+        ]
+        return {'ok': not errors, 'errors': errors, 'warnings': []}
+    
+    def analyzer_id(self) -> str:
+        """
+        Identifies the analyzers (and their versions) behind analyze_file; part of
+        the cache key, so changing them invalidates cached findings
+        """
+        return f"{self.language}-style-1"
+
+    def analyze_file(self, path: str, content: bytes, settings: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Static analysis of one source file (no submission code runs)
+        Args:
+            path: Path relative to the submission root (for messages only: results are cached by content)
+            content: The file's bytes
+            settings: The task's 'analysis' section
+        Returns:
+            Dict with 'findings' ({line, column, code, severity, source, message})
+            and 'functions' ({name, line, complexity}) when the plugin measures them
+        """
+        findings = []
+        max_line = int(settings.get('maxLineLength', 100))
+        text = content.decode('utf-8', errors='replace')
+        lines = text.split('\n')
+        for number, line in enumerate(lines, 1):
+            line = line.rstrip('\r')
+            if len(line) > max_line:
+                findings.append(make_finding(number, max_line + 1, 'E501', 'style', 'aca',
+                                         f'line too long ({len(line)} > {max_line} characters)'))
+            if line != line.rstrip():
+                findings.append(make_finding(number, len(line.rstrip()) + 1, 'W291', 'style', 'aca', 'trailing whitespace'))
+        if text and not text.endswith('\n'):
+            findings.append(make_finding(len(lines), 1, 'W292', 'style', 'aca', 'no newline at end of file'))
+        return {'findings': findings, 'functions': []}
+
+    def _analysis_sources(self, workdir: str, archive: Optional[str] = None):
+        """(relative path, content) of the submission's source files, from workdir or its zip"""
+        extensions = tuple(self.config.get('extensions', []))
+        if archive:
+            with zipfile.ZipFile(archive, 'r') as zf:
+                for info in sorted(zf.infolist(), key=lambda info: info.filename):
+                    parts = info.filename.split('/')
+                    if info.is_dir() or parts[0] in ANALYSIS_SKIP_DIRS or '__MACOSX' in parts or \
+                            any(part.startswith('.') for part in parts) or not info.filename.endswith(extensions):
+                        continue
+                    yield info.filename, zf.read(info)
+            return
+        for root, dirs, files in os.walk(workdir):
+            dirs[:] = sorted(d for d in dirs if not d.startswith('.') and
+                             not (root == workdir and d in ANALYSIS_SKIP_DIRS) and d != '__pycache__')
+            for name in sorted(files):
+                if not name.endswith(extensions) or name.startswith('.'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    with open(path, 'rb') as f:
+                        yield os.path.relpath(path, workdir), f.read()
+                except OSError:
+                    continue
+
+    def analyze(self, workdir: str, settings: Dict[str, Any], archive: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Analyze every source file of the submission in workdir, reusing cached
+        results for files whose content was analyzed before (e.g. unchanged
+        files of a resubmission)
+        Args:
+            workdir: Job workdir (tests/ and data/ are skipped)
+            settings: The task's 'analysis' section
+            archive: Read the sources from this submission zip instead (not extracted)
+        Returns:
+            Dict with findings, severity counts, per-function complexity and cache statistics
+        """
+        start = time.perf_counter()
+        cache = get_analysis_cache()
+        settings_key = json.dumps(settings, sort_keys=True)
+        disabled = set(settings.get('disable', []))
+        findings: List[Dict[str, Any]] = []
+        functions: List[Dict[str, Any]] = []
+        analyzed = cached = 0
+        for relative, content in self._analysis_sources(workdir, archive):
+            key = content_key(self.analyzer_id(), settings_key, content)
+            hit = cache.get(key, '.json')
+            result = None
+            if hit:
+                try:
+                    with open(hit, 'r', encoding='utf-8') as f:
+                        result = json.load(f)
+                    cached += 1
+                except (OSError, json.JSONDecodeError):
+                    result = None
+            if result is None:
+                result = self.analyze_file(relative, content, settings)
+                analyzed += 1
+                fd, tmp_path = tempfile.mkstemp(suffix='.json')
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(result, f)
+                cache.put(key, tmp_path, '.json')
+            findings += [dict(finding, file=relative) for finding in result['findings']
+                         if finding['code'] not in disabled]
+            functions += [dict(function, file=relative) for function in result.get('functions', [])]
+        if analyzed:
+            cache.prune()
+
+        counts: Dict[str, int] = {}
+        for finding in findings:
+            counts[finding['severity']] = counts.get(finding['severity'], 0) + 1
+        functions.sort(key=lambda function: -function['complexity'])
+        complexities = [function['complexity'] for function in functions]
+        return {
+            'files': analyzed + cached,
+            'analyzed': analyzed,
+            'cached': cached,
+            'counts': counts,
+            'findings': sorted(findings, key=lambda f: (f['file'], f['line'], f['column']))[:ANALYSIS_MAX_FINDINGS],
+            'truncated': len(findings) > ANALYSIS_MAX_FINDINGS,
+            'complexity': {
+                'max': max(complexities),
+                'mean': round(sum(complexities) / len(complexities), 2),
+                'functions': functions[:10]
+            } if complexities else None,
+            'analyzer': self.analyzer_id(),
+            'duration': round(time.perf_counter() - start, 4)
+        }
+
+    def run_command(self, cmd: List[str], cwd: str, timeout: Optional[int] = None,
+                    cancel_event: Optional[threading.Event] = None,
+                    env: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
         """
         Execute a command with proper error handling
         Args:
             cmd: Command to execute
             cwd: Working directory
             timeout: Command timeout (uses plugin timeout if not specified)
+            cancel_event: Kills the command when set (ProcessCancelled propagates)
+            env: Environment of the command (default: the runner's)
         Returns:
             Dict with execution results
         """
         timeout = timeout or self.timeout
         
         try:
-            result = subprocess.run(
-                cmd,
-                cwd=cwd,
-                capture_output=True,
-                text=True,
-                timeout=timeout,
-                check=False
-            )
+            # Stream output into bounded buffers instead of buffering it all
+            result = run_captured(cmd, cwd=cwd, timeout=timeout, env=env, cancel_event=cancel_event)
+            
+            stderr = result.stderr
+            if result.overflowed:
+                stderr = f"{stderr}\nOutput limit exceeded on {result.overflowed}, process was killed"
             
             return {
-                'success': result.returncode == 0,
+                'success': result.returncode == 0 and not result.overflowed,
                 'returncode': result.returncode,
                 'stdout': result.stdout,
-                'stderr': result.stderr
+                'stderr': stderr,
+                'truncated': result.truncated,
+                'overflowed': result.overflowed,
+                'duration': result.duration,
+                'usage': result.usage
             }
-        except subprocess.TimeoutExpired:
+        except subprocess.TimeoutExpired as e:
             return {
                 'success': False,
                 'returncode': -1,
-                'stdout': '',
-                'stderr': f'Command timed out after {timeout} seconds'
+                'stdout': e.output or '',
+                'stderr': f'Command timed out after {timeout:g} seconds',
+                'timed_out': True,
+                'duration': timeout,
+                'usage': getattr(e, 'usage', None)
             }
+        except ProcessCancelled:
+            raise
         except Exception as e:
             return {
                 'success': False,
@@ -152,6 +327,12 @@ class LanguagePlugin(ABC):
             }
 
 
+def make_finding(line: int, column: int, code: str, severity: str, source: str, message: str) -> Dict[str, Any]:
+    """One analysis finding; severity is 'error', 'warning' or 'style'"""
+    return {'line': line, 'column': column, 'code': code, 'severity': severity, 'source': source,
+            'message': message}
+
+
 class TestResult:
     """Standardized test result format"""
     
@@ -0,0 +1,110 @@
+"""
+Build Artifact Cache
+Content-addressed store for compiled objects and linked binaries
+"""
+
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from typing import Iterable, Optional
+
+BUILD_CACHE_DIR = os.getenv('BUILD_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'aca-build-cache'))
+BUILD_CACHE_MAX_MB = int(os.getenv('BUILD_CACHE_MAX_MB', 512))
+
+
+def content_key(*parts: Iterable) -> str:
+    """
+    Hash arbitrary key material into a cache key
+    Args:
+        parts: bytes, str or iterables of those (e.g. source, flags, compiler id)
+    Returns:
+        str: hex sha256 digest
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        items = [part] if isinstance(part, (bytes, str)) else list(part)
+        for item in items:
+            data = item.encode('utf-8') if isinstance(item, str) else item
+            # Length-prefix every item so ('ab', 'c') and ('a', 'bc') differ
+            digest.update(len(data).to_bytes(8, 'little'))
+            digest.update(data)
+    return digest.hexdigest()
+
+
+class BuildCache:
+    """Stores build artifacts under their content key"""
+
+    def __init__(self, root: str = BUILD_CACHE_DIR, max_mb: int = BUILD_CACHE_MAX_MB):
+        self.root = root
+        self.max_bytes = max_mb * 1024 * 1024
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def path_for(self, key: str, suffix: str = '') -> str:
+        """Location of an artifact, sharded by key prefix"""
+        return os.path.join(self.root, key[:2], key + suffix)
+
+    def get(self, key: str, suffix: str = '') -> Optional[str]:
+        """Return the cached artifact path or None"""
+        path = self.path_for(key, suffix)
+        if os.path.exists(path):
+            try:
+                os.utime(path)  # keep recently used artifacts through pruning
+            except OSError:
+                pass
+            with self._lock:
+                self.hits += 1
+            return path
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, source_path: str, suffix: str = '') -> str:
+        """
+        Move a freshly built artifact into the cache
+        Args:
+            key: Content key of the artifact
+            source_path: Path of the built file (moved, not copied)
+            suffix: File suffix for the cached artifact
+        Returns:
+            str: Path of the cached artifact
+        """
+        path = self.path_for(key, suffix)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Same-directory temp file + rename keeps concurrent writers safe
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        os.close(fd)
+        shutil.move(source_path, tmp_path)
+        os.replace(tmp_path, path)
+        return path
+
+    def prune(self):
+        """Drop least recently used artifacts once the cache exceeds its size limit"""
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.root):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        if total <= self.max_bytes:
+            return
+
+        entries.sort()
+        for _, size, path in entries:
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                continue
+            if total <= self.max_bytes * 0.8:
+                break
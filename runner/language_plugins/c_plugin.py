@@ -0,0 +1,345 @@
+"""
+C/C++ Language Plugin
+Compiles submissions with the local gcc/g++ and runs the aca_test.h harness,
+reusing compiled objects from a content-addressed build cache
+"""
+
+import os
+import shutil
+import tempfile
+import time
+from typing import Dict, List, Any, Optional, Tuple
+from .base_plugin import LanguagePlugin, TestResult
+from .build_cache import BuildCache, content_key
+from .output_capture import combine_usage
+
+SUPPORT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'c_support')
+HARNESS_MAIN = os.path.join(SUPPORT_DIR, 'aca_test_main.c')
+HEADER_EXTENSIONS = ('.h', '.hh', '.hpp', '.hxx')
+RESULT_PREFIX = 'ACA_RESULT '
+COUNT_PREFIX = 'ACA_COUNT '
+TEST_PREFIX = 'ACA_TEST '
+# Written by the harness (not stdout, which the student's code shares)
+RESULT_FILE = '.aca-results'
+
+# Shared by the C and C++ plugins so identical harness objects are reused
+_build_cache: Optional[BuildCache] = None
+
+
+def get_build_cache() -> BuildCache:
+    global _build_cache
+    if _build_cache is None:
+        _build_cache = BuildCache()
+    return _build_cache
+
+
+class CPlugin(LanguagePlugin):
+    """C language plugin using gcc and the aca_test.h harness"""
+
+    def __init__(self, language: str = 'c', config: Optional[Dict[str, Any]] = None):
+        config = config or {
+            'timeout': 60,
+            'memoryLimit': '512m',
+            'cpuLimit': '1.0',
+            'extensions': ['.c'],
+            'testFramework': 'aca_test.h',
+            'compiler': os.getenv('CC', 'gcc'),
+            'compileFlags': ['-std=c11', '-O1', '-Wall'],
+            'linkFlags': ['-lm']
+        }
+        super().__init__(language, config)
+        self.compiler = config['compiler']
+        self.compile_flags = list(config.get('compileFlags', []))
+        self.link_flags = list(config.get('linkFlags', []))
+        self._compiler_ids: Dict[str, str] = {}
+
+    def detect_language(self, files: List[str]) -> bool:
+        """Detect source files for this language"""
+        return any(os.path.splitext(f)[1] in self.config['extensions'] for f in files)
+
+    def prepare_environment(self, workdir: str, files: List[str]) -> Dict[str, Any]:
+        """Check that the compiler is available"""
+        if not shutil.which(self.compiler):
+            return {
+                'success': False,
+                'error': f'Compiler not found: {self.compiler}'
+            }
+
+        return {
+            'success': True,
+            'compiler': self.compiler,
+            'compiler_version': self._get_compiler_id()
+        }
+
+    def run_tests(self, workdir: str, test_dir: str, env_info: Dict[str, Any]) -> Dict[str, Any]:
+        """Build (through the cache) and run the test binary"""
+        if not env_info.get('success', True):
+            return {
+                'success': False,
+                'error': env_info.get('error', 'Environment preparation failed')
+            }
+
+        test_result = TestResult()
+        build_start = time.perf_counter()
+        stats = {'cache_hits': 0, 'cache_misses': 0, 'usage': []}
+
+        student_sources = self._find_sources(workdir, exclude=test_dir)
+        harness_sources = self._find_sources(test_dir)
+        if not student_sources or not harness_sources:
+            missing = 'submission' if not student_sources else 'tests'
+            test_result.feedback = f"No {self.language} source files found in {missing}"
+            test_result.errors.append(test_result.feedback)
+            return {
+                'success': False,
+                'result': test_result.to_dict(),
+                'build': {'build_time': 0.0, 'run_time': 0.0}
+            }
+
+        include_dirs = [workdir, test_dir, SUPPORT_DIR]
+        headers = self._header_contents(workdir) + self._header_contents(test_dir)
+
+        try:
+            objects = []
+            # Student code gets its main() renamed so the harness main can link
+            for source in student_sources:
+                objects.append(self._compile(source, include_dirs, headers, ['-Dmain=aca_student_main'], stats))
+            # Harness objects only change when the assignment's tests do
+            for source in harness_sources:
+                objects.append(self._compile(source, include_dirs, headers, [], stats))
+            objects.append(self._compile(HARNESS_MAIN, [SUPPORT_DIR], [], [], stats,
+                                         compiler=os.getenv('CC', 'gcc'), std_flags=['-std=c11']))
+            binary, linked = self._link(objects, stats)
+        except BuildError as e:
+            test_result.feedback = f"Compilation failed:\n{e.output}"
+            test_result.errors.append(test_result.feedback)
+            return {
+                'success': False,
+                'result': test_result.to_dict(),
+                'build': self._build_info(stats, time.perf_counter() - build_start, 0.0, False),
+                'resources': combine_usage(stats['usage']),
+                'raw_errors': e.output
+            }
+
+        build_time = time.perf_counter() - build_start
+
+        run_start = time.perf_counter()
+        # Run a private copy: the cached binary must stay immutable
+        local_binary = os.path.join(workdir, 'aca_tests')
+        shutil.copy2(binary, local_binary)
+        result_path = os.path.join(workdir, RESULT_FILE)
+        if os.path.exists(result_path):
+            os.remove(result_path)
+        result = self.run_command([local_binary], workdir, timeout=env_info.get('timeout'),
+                                  cancel_event=env_info.get('cancel_event'),
+                                  env=dict(os.environ, ACA_RESULT_FILE=result_path))
+        run_time = time.perf_counter() - run_start
+
+        registered, outcomes = self._read_results(result_path)
+        # Every registered test counts, also those the binary never got to
+        test_result.total_tests = max(registered, len(outcomes))
+        test_result.passed_tests = len([o for o in outcomes if o['outcome'] == 'passed'])
+        test_result.failed_tests = len([o for o in outcomes if o['outcome'] == 'failed'])
+        test_result.execution_time = build_time + run_time
+
+        failed = [o for o in outcomes if o['outcome'] == 'failed']
+        not_run = [o for o in outcomes if o['outcome'] == 'not-run']
+        if failed or not_run:
+            feedback_parts = ["Failed tests:"] if failed else []
+            for outcome in failed[:5]:  # Limit to first 5 failures
+                feedback_parts.append(f"  • {outcome['name']}: {outcome['message']}")
+            if not_run:
+                stopped = 'timed out' if result.get('timed_out') else 'stopped'
+                feedback_parts.append(f"Test binary {stopped} before {len(not_run)} of "
+                                      f"{test_result.total_tests} tests ran")
+            test_result.feedback = '\n'.join(feedback_parts)
+        elif outcomes:
+            test_result.feedback = f"All {test_result.passed_tests} tests passed!"
+        else:
+            test_result.feedback = result['stderr'] or "Test binary produced no results"
+            test_result.errors.append(test_result.feedback)
+
+        test_result.calculate_score()
+        get_build_cache().prune()
+
+        return {
+            'success': bool(outcomes),
+            'result': test_result.to_dict(),
+            'tests': outcomes,
+            'build': self._build_info(stats, build_time, run_time, linked),
+            'timed_out': result.get('timed_out', False),
+            'resources': combine_usage(stats['usage'] + [result.get('usage')]),
+            'raw_output': result['stdout'],
+            'raw_errors': result['stderr']
+        }
+
+    def generate_feedback(self, result: Dict[str, Any]) -> str:
+        """Generate human-readable feedback"""
+        test_data = result.get('result', {})
+        build = result.get('build', {})
+        total = test_data.get('total_tests', 0)
+        passed = test_data.get('passed_tests', 0)
+        score = test_data.get('score', 0.0)
+
+        feedback_parts = [
+            f"Tests: {passed}/{total} passed ({score:.1%})",
+            f"Build: {build.get('build_time', 0.0):.2f}s, run: {build.get('run_time', 0.0):.2f}s"
+        ]
+        if passed < total and test_data.get('feedback'):
+            feedback_parts.append(test_data['feedback'])
+
+        return '\n'.join(feedback_parts)
+
+    def get_docker_image(self) -> str:
+        """Get Docker image for C/C++"""
+        return 'gcc:13'
+
+    def _find_sources(self, root: str, exclude: Optional[str] = None) -> List[str]:
+        """Source files below root (sorted for stable cache keys)"""
+        sources = []
+        for dirpath, dirs, files in os.walk(root):
+            if exclude and os.path.abspath(dirpath).startswith(os.path.abspath(exclude)):
+                continue
+            for name in files:
+                if os.path.splitext(name)[1] in self.config['extensions']:
+                    sources.append(os.path.join(dirpath, name))
+        return sorted(sources)
+
+    def _header_contents(self, root: str) -> List[bytes]:
+        """Contents of local headers, part of every object's cache key"""
+        contents = []
+        for dirpath, _, files in os.walk(root):
+            for name in sorted(files):
+                if name.endswith(HEADER_EXTENSIONS):
+                    with open(os.path.join(dirpath, name), 'rb') as f:
+                        contents.append(name.encode('utf-8') + b'\0' + f.read())
+        return contents
+
+    def _get_compiler_id(self, compiler: Optional[str] = None) -> str:
+        """Compiler version string, part of every cache key"""
+        compiler = compiler or self.compiler
+        if compiler not in self._compiler_ids:
+            result = self.run_command([compiler, '--version'], '.', timeout=10)
+            lines = result['stdout'].splitlines() if result['success'] else []
+            self._compiler_ids[compiler] = lines[0] if lines else compiler
+        return self._compiler_ids[compiler]
+
+    def _compile(self, source: str, include_dirs: List[str], headers: List[bytes], extra_flags: List[str],
+                 stats: Dict[str, int], compiler: Optional[str] = None,
+                 std_flags: Optional[List[str]] = None) -> str:
+        """Compile one translation unit, or fetch it from the cache"""
+        compiler = compiler or self.compiler
+        flags = (std_flags if std_flags is not None else self.compile_flags) + extra_flags
+        with open(source, 'rb') as f:
+            source_bytes = f.read()
+
+        # Include paths are per-job temp dirs, so they stay out of the key
+        key = content_key(source_bytes, headers, flags, self._get_compiler_id(compiler))
+        cached = get_build_cache().get(key, '.o')
+        if cached:
+            stats['cache_hits'] += 1
+            return cached
+        stats['cache_misses'] += 1
+
+        fd, object_path = tempfile.mkstemp(suffix='.o')
+        os.close(fd)
+        # Relative path keeps __FILE__ (and so cached objects) independent of the workdir
+        cmd = [compiler, '-c', os.path.basename(source), '-o', object_path] + flags
+        for include_dir in include_dirs:
+            cmd += ['-I', include_dir]
+        result = self.run_command(cmd, os.path.dirname(source))
+        stats['usage'].append(result.get('usage'))
+        if not result['success']:
+            os.remove(object_path)
+            raise BuildError(result['stderr'] or result['stdout'])
+
+        return get_build_cache().put(key, object_path, '.o')
+
+    def _link(self, objects: List[str], stats: Dict[str, int]) -> Tuple[str, bool]:
+        """Link objects into a test binary; returns (path, whether a link ran)"""
+        # Object paths are content keys, so they identify the binary exactly
+        key = content_key([os.path.basename(o) for o in objects], self.link_flags,
+                          self._get_compiler_id())
+        cached = get_build_cache().get(key, '.bin')
+        if cached:
+            stats['cache_hits'] += 1
+            return cached, False
+        stats['cache_misses'] += 1
+
+        fd, binary_path = tempfile.mkstemp(suffix='.bin')
+        os.close(fd)
+        cmd = [self.compiler] + objects + ['-o', binary_path] + self.link_flags
+        result = self.run_command(cmd, os.path.dirname(binary_path))
+        stats['usage'].append(result.get('usage'))
+        if not result['success']:
+            os.remove(binary_path)
+            raise BuildError(result['stderr'] or result['stdout'])
+
+        return get_build_cache().put(key, binary_path, '.bin'), True
+
+    def _read_results(self, result_path: str) -> Tuple[int, List[Dict[str, Any]]]:
+        """
+        The harness's result file
+        Returns:
+            (number of registered tests, one outcome per test: tests without
+            an ACA_RESULT line, because the binary was stopped first, are 'not-run')
+        """
+        try:
+            with open(result_path, 'r', encoding='utf-8', errors='replace') as f:
+                lines = f.read().splitlines()
+        except IOError:
+            return 0, []
+        registered = 0
+        names = []
+        results = {}
+        for line in lines:
+            if line.startswith(COUNT_PREFIX):
+                registered = int(line[len(COUNT_PREFIX):].strip() or 0)
+            elif line.startswith(TEST_PREFIX):
+                names.append(line[len(TEST_PREFIX):])
+            elif line.startswith(RESULT_PREFIX):
+                parts = line[len(RESULT_PREFIX):].split(' ', 2)
+                if len(parts) < 2:
+                    continue
+                results[parts[1]] = {
+                    'name': parts[1],
+                    'outcome': 'passed' if parts[0] == 'PASS' else 'failed',
+                    'message': parts[2] if len(parts) > 2 else ''
+                }
+        outcomes = [results.pop(name, None) or {'name': name, 'outcome': 'not-run', 'message': 'did not run'}
+                    for name in names]
+        return registered, outcomes + list(results.values())
+
+    def _build_info(self, stats: Dict[str, int], build_time: float, run_time: float,
+                    linked: bool) -> Dict[str, Any]:
+        return {
+            'build_time': build_time,
+            'run_time': run_time,
+            'cache_hits': stats['cache_hits'],
+            'cache_misses': stats['cache_misses'],
+            'linked': linked
+        }
+
+
+class CppPlugin(CPlugin):
+    """C++ language plugin using g++ and the aca_test.h harness"""
+
+    def __init__(self):
+        config = {
+            'timeout': 60,
+            'memoryLimit': '512m',
+            'cpuLimit': '1.0',
+            'extensions': ['.cpp', '.cc', '.cxx'],
+            'testFramework': 'aca_test.h',
+            'compiler': os.getenv('CXX', 'g++'),
+            'compileFlags': ['-std=c++17', '-O1', '-Wall'],
+            'linkFlags': ['-lm']
+        }
+        super().__init__('cpp', config)
+
+
+class BuildError(Exception):
+    """Compilation or linking failed"""
+
+    def __init__(self, output: str):
+        super().__init__(output)
+        self.output = output
@@ -0,0 +1,82 @@
+/*
+ * Minimal test harness for C/C++ assignments.
+ *
+ * Test files include this header and define tests with TEST(name). Each test
+ * is registered automatically and run in its own process by aca_test_main.c,
+ * which reports one "ACA_RESULT" line per test to $ACA_RESULT_FILE.
+ */
+#ifndef ACA_TEST_H
+#define ACA_TEST_H
+
+#include <stdio.h>
+#include <string.h>
+#include <math.h>
+
+#ifdef __cplusplus
+extern "C" {
+#endif
+
+typedef void (*aca_test_fn)(void);
+
+void aca_register_test(const char *name, aca_test_fn fn);
+void aca_fail(const char *file, int line, const char *message);
+
+#ifdef __cplusplus
+}
+#endif
+
+#define TEST(name)                                                        \
+    static void name(void);                                               \
+    __attribute__((constructor)) static void aca_register_##name(void) {  \
+        aca_register_test(#name, name);                                   \
+    }                                                                     \
+    static void name(void)
+
+#define ASSERT_TRUE(cond)                                                 \
+    do {                                                                  \
+        if (!(cond)) {                                                    \
+            aca_fail(__FILE__, __LINE__, "ASSERT_TRUE(" #cond ")");       \
+            return;                                                       \
+        }                                                                 \
+    } while (0)
+
+#define ASSERT_EQ_INT(actual, expected)                                   \
+    do {                                                                  \
+        long long aca_a = (long long)(actual);                            \
+        long long aca_e = (long long)(expected);                          \
+        if (aca_a != aca_e) {                                             \
+            char aca_msg[256];                                            \
+            snprintf(aca_msg, sizeof aca_msg, "%s == %lld, expected %lld", \
+                     #actual, aca_a, aca_e);                              \
+            aca_fail(__FILE__, __LINE__, aca_msg);                        \
+            return;                                                       \
+        }                                                                 \
+    } while (0)
+
+#define ASSERT_NEAR(actual, expected, eps)                                \
+    do {                                                                  \
+        double aca_a = (double)(actual);                                  \
+        double aca_e = (double)(expected);                                \
+        if (fabs(aca_a - aca_e) > (eps)) {                                \
+            char aca_msg[256];                                            \
+            snprintf(aca_msg, sizeof aca_msg, "%s == %g, expected %g",    \
+                     #actual, aca_a, aca_e);                              \
+            aca_fail(__FILE__, __LINE__, aca_msg);                        \
+            return;                                                       \
+        }                                                                 \
+    } while (0)
+
+#define ASSERT_STR_EQ(actual, expected)                                   \
+    do {                                                                  \
+        const char *aca_a = (actual);                                     \
+        const char *aca_e = (expected);                                   \
+        if (aca_a == NULL || strcmp(aca_a, aca_e) != 0) {                 \
+            char aca_msg[256];                                            \
+            snprintf(aca_msg, sizeof aca_msg, "%s == \"%s\", expected \"%s\"", \
+                     #actual, aca_a ? aca_a : "(null)", aca_e);           \
+            aca_fail(__FILE__, __LINE__, aca_msg);                        \
+            return;                                                       \
+        }                                                                 \
+    } while (0)
+
+#endif /* ACA_TEST_H */
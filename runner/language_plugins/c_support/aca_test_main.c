@@ -0,0 +1,194 @@
+/*
+ * Test runner linked into every C/C++ test binary.
+ *
+ * Runs each registered test in a forked child so that a crash in student code
+ * only fails that test. The child reports its outcome to this process over a
+ * private pipe (not stdout, which student code writes to); a child that ends
+ * without reporting (exit(), a crash) fails its test. Results go to the file
+ * named by $ACA_RESULT_FILE, rewritten after every test so that it is complete
+ * up to the last finished test even if the binary is killed, or to stdout
+ * when it is unset:
+ *   ACA_COUNT <number of registered tests>
+ *   ACA_TEST <name>                (one per registered test)
+ *   ACA_RESULT PASS <name>
+ *   ACA_RESULT FAIL <name> <message>
+ */
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+
+#include "aca_test.h"
+
+#ifndef _WIN32
+#include <sys/types.h>
+#include <sys/wait.h>
+#include <unistd.h>
+#endif
+
+#define ACA_MAX_TESTS 1024
+#define ACA_MESSAGE_MAX 512
+
+static const char *aca_names[ACA_MAX_TESTS];
+static aca_test_fn aca_fns[ACA_MAX_TESTS];
+static int aca_count = 0;
+static int aca_current_failed = 0;
+static char aca_current_message[ACA_MESSAGE_MAX];
+
+/* Outcome of every test run so far: 1 passed, 0 failed, -1 not run yet */
+static int aca_passed[ACA_MAX_TESTS];
+static char aca_messages[ACA_MAX_TESTS][ACA_MESSAGE_MAX];
+
+void aca_register_test(const char *name, aca_test_fn fn)
+{
+    if (aca_count < ACA_MAX_TESTS) {
+        aca_names[aca_count] = name;
+        aca_fns[aca_count] = fn;
+        aca_count++;
+    }
+}
+
+void aca_fail(const char *file, int line, const char *message)
+{
+    if (!aca_current_failed) {
+        snprintf(aca_current_message, sizeof aca_current_message, "%s:%d: %s", file, line, message);
+    }
+    aca_current_failed = 1;
+}
+
+/* Run one test in this process; returns its report ("PASS" or "FAIL <message>") in report */
+static void aca_run_one(int index, char *report, size_t size)
+{
+    aca_current_failed = 0;
+    aca_current_message[0] = '\0';
+    aca_fns[index]();
+    if (aca_current_failed) {
+        snprintf(report, size, "FAIL %s", aca_current_message);
+    } else {
+        snprintf(report, size, "PASS");
+    }
+}
+
+static void aca_record(int index, const char *report)
+{
+    if (strncmp(report, "PASS", 4) == 0 && report[4] == '\0') {
+        aca_passed[index] = 1;
+        aca_messages[index][0] = '\0';
+    } else {
+        aca_passed[index] = 0;
+        snprintf(aca_messages[index], ACA_MESSAGE_MAX, "%s",
+                 strncmp(report, "FAIL ", 5) == 0 ? report + 5 : report);
+    }
+}
+
+static void aca_write_results(void)
+{
+    const char *path = getenv("ACA_RESULT_FILE");
+    FILE *out = path && *path ? fopen(path, "w") : stdout;
+    int i;
+
+    if (out == NULL) {
+        return;
+    }
+    fprintf(out, "ACA_COUNT %d\n", aca_count);
+    for (i = 0; i < aca_count; i++) {
+        fprintf(out, "ACA_TEST %s\n", aca_names[i]);
+    }
+    for (i = 0; i < aca_count; i++) {
+        if (aca_passed[i] == 1) {
+            fprintf(out, "ACA_RESULT PASS %s\n", aca_names[i]);
+        } else if (aca_passed[i] == 0) {
+            fprintf(out, "ACA_RESULT FAIL %s %s\n", aca_names[i], aca_messages[i]);
+        }
+    }
+    if (out != stdout) {
+        fclose(out);
+    } else {
+        fflush(stdout);
+    }
+}
+
+#ifndef _WIN32
+/* Fork a child for one test and read its report from the pipe; fills report */
+static void aca_run_forked(int index, char *report, size_t size)
+{
+    int fds[2];
+    int status = 0;
+    size_t length = 0;
+    ssize_t got;
+    pid_t pid;
+
+    if (pipe(fds) < 0) {
+        aca_run_one(index, report, size);
+        return;
+    }
+    fflush(stdout);
+    fflush(stderr);
+    pid = fork();
+    if (pid == 0) {
+        char own[ACA_MESSAGE_MAX + 8];
+        close(fds[0]);
+        aca_run_one(index, own, sizeof own);
+        if (write(fds[1], own, strlen(own)) < 0) {
+            _exit(2);
+        }
+        fflush(stdout);
+        _exit(0);
+    }
+    close(fds[1]);
+    if (pid < 0) {
+        close(fds[0]);
+        aca_run_one(index, report, size);
+        return;
+    }
+    while (length + 1 < size && (got = read(fds[0], report + length, size - 1 - length)) > 0) {
+        length += (size_t)got;
+    }
+    report[length] = '\0';
+    close(fds[0]);
+    if (waitpid(pid, &status, 0) < 0) {
+        status = 0;
+    }
+    if (WIFSIGNALED(status)) {
+        snprintf(report, size, "FAIL crashed with signal %d", WTERMSIG(status));
+    } else if (length == 0 || WEXITSTATUS(status) != 0) {
+        /* The test ended the process (exit(), _exit()) before it could report */
+        snprintf(report, size, "FAIL exited without a result (status %d)", WEXITSTATUS(status));
+    }
+}
+#endif
+
+int main(int argc, char **argv)
+{
+    int failures = 0;
+    int i;
+    char report[ACA_MESSAGE_MAX + 8];
+
+    (void)argc;
+    (void)argv;
+    fflush(stdout);
+
+    for (i = 0; i < aca_count; i++) {
+        aca_passed[i] = -1;
+    }
+    if (getenv("ACA_RESULT_FILE")) {
+        aca_write_results();
+    }
+
+    for (i = 0; i < aca_count; i++) {
+#ifndef _WIN32
+        aca_run_forked(i, report, sizeof report);
+#else
+        aca_run_one(i, report, sizeof report);
+#endif
+        aca_record(i, report);
+        failures += !aca_passed[i];
+        if (getenv("ACA_RESULT_FILE")) {
+            aca_write_results();
+        }
+    }
+    if (!getenv("ACA_RESULT_FILE")) {
+        aca_write_results();
+    }
+
+    return failures == 0 ? 0 : 1;
+}
@@ -0,0 +1,307 @@
+"""
+Bounded Output Capture
+Streams child process output into fixed-size head/tail buffers so that a
+submission printing in a loop cannot flood the runner's memory, and records
+the child's resource usage (rusage) when it is reaped
+"""
+
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, List, Any, Optional
+
+# Per-stream limits (bytes). Output beyond MAX_BYTES kills the process.
+OUTPUT_MAX_BYTES = int(os.getenv('OUTPUT_MAX_BYTES', 8 * 1024 * 1024))
+OUTPUT_HEAD_BYTES = int(os.getenv('OUTPUT_HEAD_BYTES', 16 * 1024))
+OUTPUT_TAIL_BYTES = int(os.getenv('OUTPUT_TAIL_BYTES', 16 * 1024))
+
+CHUNK_SIZE = 64 * 1024
+POLL_INTERVAL = 0.05
+
+
+class BoundedStream:
+    """Keeps the first and last bytes of a stream and counts everything in between"""
+
+    def __init__(self, head_bytes: int = OUTPUT_HEAD_BYTES, tail_bytes: int = OUTPUT_TAIL_BYTES):
+        self.head_limit = max(0, head_bytes)
+        self.tail_limit = max(0, tail_bytes)
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total_bytes = 0
+
+    def feed(self, chunk: bytes):
+        """Add a chunk of output, discarding the middle once both buffers are full"""
+        self.total_bytes += len(chunk)
+
+        room = self.head_limit - len(self.head)
+        if room > 0:
+            self.head.extend(chunk[:room])
+            chunk = chunk[room:]
+
+        if not chunk or self.tail_limit == 0:
+            return
+
+        self.tail.extend(chunk)
+        # Trim lazily so we don't shift the buffer on every small write
+        if len(self.tail) > 2 * self.tail_limit:
+            del self.tail[:len(self.tail) - self.tail_limit]
+
+    @property
+    def retained_bytes(self) -> int:
+        return len(self.head) + min(len(self.tail), self.tail_limit)
+
+    @property
+    def truncated(self) -> bool:
+        return self.total_bytes > self.retained_bytes
+
+    def text(self) -> str:
+        """Decode the retained excerpt, marking the omitted middle part"""
+        tail = bytes(self.tail[-self.tail_limit:]) if self.tail_limit else b''
+        head_text = bytes(self.head).decode('utf-8', errors='replace')
+        tail_text = tail.decode('utf-8', errors='replace')
+        omitted = self.total_bytes - len(self.head) - len(tail)
+        if omitted > 0:
+            return f"{head_text}\n... [{omitted} bytes of output omitted] ...\n{tail_text}"
+        return head_text + tail_text
+
+
+class CapturedProcess:
+    """Result of a bounded run, shaped like subprocess.CompletedProcess"""
+
+    def __init__(self, args: List[str], returncode: int, stdout: BoundedStream, stderr: BoundedStream,
+                 overflowed: Optional[str], duration: float, usage: Optional[Dict[str, Any]] = None):
+        self.args = args
+        self.returncode = returncode
+        self.stdout = stdout.text()
+        self.stderr = stderr.text()
+        self.stdout_bytes = stdout.total_bytes
+        self.stderr_bytes = stderr.total_bytes
+        self.truncated = stdout.truncated or stderr.truncated
+        self.overflowed = overflowed  # name of the stream that hit OUTPUT_MAX_BYTES, if any
+        self.duration = duration
+        self.usage = usage  # see usage_from_rusage; None where wait4 is unavailable
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'returncode': self.returncode,
+            'stdout': self.stdout,
+            'stderr': self.stderr,
+            'stdout_bytes': self.stdout_bytes,
+            'stderr_bytes': self.stderr_bytes,
+            'truncated': self.truncated,
+            'overflowed': self.overflowed,
+            'duration': self.duration,
+            'usage': self.usage
+        }
+
+
+def usage_from_rusage(rusage) -> Dict[str, Any]:
+    """CPU seconds, peak RSS (KiB), block I/O operations and context switches of a reaped child"""
+    # ru_maxrss is in bytes on macOS, KiB elsewhere
+    max_rss_kb = rusage.ru_maxrss // 1024 if sys.platform == 'darwin' else rusage.ru_maxrss
+    return {
+        'cpu_user': round(rusage.ru_utime, 4),
+        'cpu_system': round(rusage.ru_stime, 4),
+        'max_rss_kb': max_rss_kb,
+        'block_in': rusage.ru_inblock,
+        'block_out': rusage.ru_oublock,
+        'ctx_voluntary': rusage.ru_nvcsw,
+        'ctx_involuntary': rusage.ru_nivcsw
+    }
+
+
+def sched_stats(pid: int) -> Dict[str, Any]:
+    """
+    Scheduler counters of a process's main thread from /proc (Linux; empty elsewhere):
+    CPU migrations and seconds spent runnable but waiting for a CPU
+    Readable until the process is reaped.
+    """
+    stats: Dict[str, Any] = {}
+    try:
+        with open(f'/proc/{pid}/schedstat', 'r') as f:
+            stats['run_delay'] = round(int(f.read().split()[1]) / 1e9, 4)
+        with open(f'/proc/{pid}/sched', 'r') as f:
+            for line in f:
+                if line.startswith('se.nr_migrations'):
+                    stats['migrations'] = int(line.split(':')[1])
+                    break
+    except (OSError, IndexError, ValueError):
+        pass
+    return stats
+
+
+def combine_usage(usages: List[Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+    """Total usage of several sequential runs: counters add up, peak RSS is the largest peak"""
+    usages = [usage for usage in usages if usage]
+    if not usages:
+        return None
+    combined = {key: sum(usage.get(key, 0) for usage in usages) for key in usages[0] if key != 'max_rss_kb'}
+    combined['cpu_user'] = round(combined['cpu_user'], 4)
+    combined['cpu_system'] = round(combined['cpu_system'], 4)
+    if 'run_delay' in combined:
+        combined['run_delay'] = round(combined['run_delay'], 4)
+    combined['max_rss_kb'] = max(usage.get('max_rss_kb', 0) for usage in usages)
+    return combined
+
+
+def kill_process_tree(proc: subprocess.Popen):
+    """Kill a process started by run_captured together with its children"""
+    try:
+        if os.name == 'posix':
+            # The child leads its own session, so this also reaches grandchildren
+            # that outlived it
+            os.killpg(proc.pid, signal.SIGKILL)
+        elif proc.poll() is None:
+            proc.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+class ProcessCancelled(Exception):
+    """The run was cancelled (superseded or abandoned job); its process group was killed"""
+
+
+def _reap(proc: subprocess.Popen, timeout: Optional[float]) -> Optional[Dict[str, Any]]:
+    """
+    Wait for the child like proc.wait(timeout), but through wait4 so its rusage is kept
+    Returns:
+        The child's usage (None without wait4)
+    Raises:
+        subprocess.TimeoutExpired: if the child is still running after timeout
+    """
+    if not hasattr(os, 'wait4'):
+        proc.wait(timeout=timeout)
+        return None
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    delay = 0.0005
+    while True:
+        stats = {}
+        if hasattr(os, 'waitid'):
+            # Wait without reaping first: the scheduler counters go with the process
+            flags = os.WEXITED | os.WNOWAIT | (os.WNOHANG if deadline is not None else 0)
+            if os.waitid(os.P_PID, proc.pid, flags) is not None:
+                stats = sched_stats(proc.pid)
+        pid, status, rusage = os.wait4(proc.pid, os.WNOHANG if deadline is not None else 0)
+        if pid == proc.pid:
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            return dict(usage_from_rusage(rusage), **stats)
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise subprocess.TimeoutExpired(proc.args, timeout)
+        delay = min(delay * 2, remaining, POLL_INTERVAL)
+        time.sleep(delay)
+
+
+def _pump(proc: subprocess.Popen, pipe, stream: BoundedStream, max_bytes: int, name: str,
+          overflow: Dict[str, Any]):
+    """Reader thread: copy a pipe into a bounded stream until EOF or overflow"""
+    try:
+        while True:
+            chunk = pipe.read1(CHUNK_SIZE) if hasattr(pipe, 'read1') else pipe.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            stream.feed(chunk)
+            if max_bytes and stream.total_bytes > max_bytes and not overflow['event'].is_set():
+                overflow['stream'] = name
+                overflow['event'].set()
+                # Kill right here rather than at the next poll tick
+                kill_process_tree(proc)
+    except (OSError, ValueError):
+        pass
+    finally:
+        try:
+            pipe.close()
+        except OSError:
+            pass
+
+
+def run_captured(cmd: List[str], cwd: str, timeout: Optional[float] = None,
+                 env: Optional[Dict[str, str]] = None,
+                 cancel_event: Optional[threading.Event] = None,
+                 max_bytes: int = OUTPUT_MAX_BYTES,
+                 head_bytes: int = OUTPUT_HEAD_BYTES,
+                 tail_bytes: int = OUTPUT_TAIL_BYTES) -> CapturedProcess:
+    """
+    Run a command while streaming its output into bounded buffers
+    Args:
+        cmd: Command to execute
+        cwd: Working directory
+        timeout: Wall-clock limit in seconds
+        env: Environment for the child (inherits ours if None)
+        cancel_event: When set, the process group is killed and ProcessCancelled raised
+        max_bytes: Per-stream byte cap; the process group is killed when exceeded
+        head_bytes: Bytes kept from the start of each stream
+        tail_bytes: Bytes kept from the end of each stream
+    Returns:
+        CapturedProcess with the retained excerpts and the child's usage
+    Raises:
+        subprocess.TimeoutExpired: if the command runs longer than timeout
+            (with the killed child's usage as its `usage` attribute)
+        ProcessCancelled: if cancel_event was set while the command ran
+    """
+    start = time.monotonic()
+    proc = subprocess.Popen(
+        cmd,
+        cwd=cwd,
+        env=env,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        start_new_session=(os.name == 'posix')
+    )
+
+    stdout = BoundedStream(head_bytes, tail_bytes)
+    stderr = BoundedStream(head_bytes, tail_bytes)
+    overflow = {'event': threading.Event(), 'stream': None}
+    readers = [
+        threading.Thread(target=_pump, args=(proc, proc.stdout, stdout, max_bytes, 'stdout', overflow), daemon=True),
+        threading.Thread(target=_pump, args=(proc, proc.stderr, stderr, max_bytes, 'stderr', overflow), daemon=True)
+    ]
+    for reader in readers:
+        reader.start()
+
+    deadline = start + timeout if timeout else None
+    timed_out = False
+    cancelled = False
+    usage = None
+    while True:
+        try:
+            usage = _reap(proc, POLL_INTERVAL)
+            break
+        except subprocess.TimeoutExpired:
+            pass
+        if overflow['event'].is_set():
+            kill_process_tree(proc)
+            usage = _reap(proc, None)
+            break
+        if cancel_event is not None and cancel_event.is_set():
+            cancelled = True
+            kill_process_tree(proc)
+            usage = _reap(proc, None)
+            break
+        if deadline is not None and time.monotonic() >= deadline:
+            timed_out = True
+            kill_process_tree(proc)
+            usage = _reap(proc, None)
+            break
+
+    # Leftover grandchildren may still hold the pipes open
+    for reader in readers:
+        reader.join(timeout=1.0)
+    if any(reader.is_alive() for reader in readers):
+        kill_process_tree(proc)
+        for reader in readers:
+            reader.join(timeout=1.0)
+
+    captured = CapturedProcess(cmd, proc.returncode, stdout, stderr, overflow['stream'],
+                               time.monotonic() - start, usage)
+    if cancelled:
+        raise ProcessCancelled(f"{cmd[0]} cancelled after {captured.duration:.1f}s")
+    if timed_out:
+        expired = subprocess.TimeoutExpired(cmd, timeout, output=captured.stdout, stderr=captured.stderr)
+        expired.usage = usage
+        raise expired
+    return captured
@@ -6,7 +6,9 @@ Manages and loads language-specific plugins
 from typing import Dict, List, Optional, Any
 import importlib
 import os
+import threading
 from .base_plugin import LanguagePlugin
+from .output_capture import ProcessCancelled
 
 
 class PluginManager:
@@ -21,6 +23,8 @@ class PluginManager:
         # Plugin registry - maps language names to plugin classes
         plugin_registry = {
             'python': 'python_plugin.PythonPlugin',
+            'c': 'c_plugin.CPlugin',
+            'cpp': 'c_plugin.CppPlugin',
             # Future languages can be added here easily
             # 'java': 'java_plugin.JavaPlugin',
             # 'javascript': 'javascript_plugin.JavaScriptPlugin',
@@ -104,8 +108,14 @@ class PluginManager:
             plugin = self.get_plugin(detected_language)
             return plugin.validate_submission(files)
     
-    def execute_tests(self, language: str, workdir: str, files: List[str], test_dir: str) -> Dict[str, Any]:
-        """Execute tests for a specific language"""
+    def execute_tests(self, language: str, workdir: str, files: List[str], test_dir: str,
+                      timeout: Optional[float] = None,
+                      cancel_event: Optional[threading.Event] = None) -> Dict[str, Any]:
+        """
+        Execute tests for a specific language
+        timeout overrides the plugin's test-run limit; setting cancel_event kills
+        the run and raises ProcessCancelled
+        """
         plugin = self.get_plugin(language)
         if not plugin:
             return {
@@ -123,6 +133,10 @@ class PluginManager:
         try:
             # Prepare environment
             env_info = plugin.prepare_environment(workdir, files)
+            if timeout:
+                env_info = dict(env_info, timeout=timeout)
+            if cancel_event is not None:
+                env_info = dict(env_info, cancel_event=cancel_event)
             
             # Run tests
             result = plugin.run_tests(workdir, test_dir, env_info)
@@ -135,6 +149,8 @@ class PluginManager:
             
             return result
             
+        except ProcessCancelled:
+            raise
         except Exception as e:
             return {
                 'success': False,
@@ -148,6 +164,21 @@ class PluginManager:
                 }
             }
     
+    def analyze(self, language: str, workdir: str, settings: Optional[Dict[str, Any]] = None,
+                archive: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Static analysis of a submission (see LanguagePlugin.analyze)
+        Returns None if the language is not supported; analyzer crashes become {'error': ...}
+        """
+        plugin = self.get_plugin(language)
+        if not plugin:
+            return None
+        try:
+            return plugin.analyze(workdir, settings or {}, archive)
+        except Exception as e:
+            print(f"ERROR: Static analysis failed for {language}: {e}")
+            return {'error': f'Analysis failed: {str(e)}'}
+
     def get_plugin_info(self, language: str) -> Optional[Dict[str, Any]]:
         """Get information about a plugin"""
         plugin = self.get_plugin(language)
@@ -4,10 +4,42 @@ Implements Python-specific test execution using pytest
 """
 
 import os
+import ast
 import json
 import tempfile
-from typing import Dict, List, Any
-from .base_plugin import LanguagePlugin, TestResult
+import zipfile
+from typing import Dict, List, Any, Optional, Tuple
+from .base_plugin import LanguagePlugin, TestResult, make_finding
+
+try:
+    import pyflakes
+    import pyflakes.checker
+except ImportError:
+    pyflakes = None
+
+try:
+    import pycodestyle
+except ImportError:
+    pycodestyle = None
+
+# flake8's codes for the pyflakes messages students run into most
+PYFLAKES_CODES = {
+    'UnusedImport': 'F401', 'ImportStarUsed': 'F403', 'RedefinedWhileUnused': 'F811',
+    'UndefinedName': 'F821', 'UndefinedLocal': 'F823', 'UnusedVariable': 'F841',
+    'ReturnOutsideFunction': 'F706', 'DuplicateArgument': 'F831', 'IsLiteral': 'F632',
+    'FStringMissingPlaceholders': 'F541', 'MultiValueRepeatedKeyLiteral': 'F601'
+}
+# Submissions up to this size (uncompressed) are imported straight from their zip instead of extracted
+ZIP_IMPORT_MAX_BYTES = int(os.getenv('ZIP_IMPORT_MAX_BYTES', 256 * 1024))
+# zipimport reads only these
+ZIP_IMPORT_METHODS = (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED)
+# Calls that look at the files next to the code (there are none inside a zip)
+DIRECTORY_CALLS = {'listdir', 'scandir', 'walk', 'glob', 'iglob', 'iterdir'}
+# Ways a test suite loads the submission by file path instead of importing it
+PATH_LOADERS = {'spec_from_file_location', 'SourceFileLoader', 'run_path', 'load_source'}
+# Decision points counted by cyclomatic complexity (plus boolean operators and comprehension filters)
+BRANCH_NODES = (ast.If, ast.IfExp, ast.For, ast.AsyncFor, ast.While, ast.ExceptHandler, ast.Assert,
+                ast.comprehension) + ((ast.match_case,) if hasattr(ast, 'match_case') else ())
 
 
 class PythonPlugin(LanguagePlugin):
@@ -69,6 +101,7 @@ class PythonPlugin(LanguagePlugin):
             'pytest',
             '-q',
             '--maxfail=1',
+            '--capture=no',
             '--disable-warnings',
             '--json-report',
             f'--json-report-file={report_path}',
@@ -76,7 +109,8 @@ class PythonPlugin(LanguagePlugin):
         ]
         
         # Execute tests
-        result = self.run_command(cmd, workdir)
+        result = self.run_command(cmd, workdir, timeout=env_info.get('timeout'),
+                                  cancel_event=env_info.get('cancel_event'))
         
         # Parse results
         test_result = TestResult()
@@ -110,6 +144,7 @@ class PythonPlugin(LanguagePlugin):
         return {
             'success': result['success'],
             'result': test_result.to_dict(),
+            'resources': result.get('usage'),
             'raw_output': result['stdout'],
             'raw_errors': result['stderr']
         }
@@ -137,6 +172,274 @@ class PythonPlugin(LanguagePlugin):
         
         return '\n'.join(feedback_parts)
     
+    def pre_check(self, files: Dict[str, Optional[bytes]], metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Parse the submission and check required symbols without running anything
+        metadata example (task.json "precheck" section):
+            {
+                "requiredFiles": ["solution.py"],
+                "module": "solution.py",
+                "symbols": [
+                    {"name": "fizzbuzz", "kind": "function", "params": 1},
+                    {"name": "Vector2D", "kind": "class",
+                     "methods": [{"name": "dot", "params": 1}]}
+                ]
+            }
+        "params" is the number of positional arguments the tests pass (excluding self)
+        Only problems that fail every test (a syntax error, a missing file, module or
+        symbol) are errors; a missing method or a mismatched signature fails only the
+        tests that use it, so it is a warning and the tests still run.
+        """
+        result = super().pre_check(files, metadata)
+        errors = list(result['errors'])
+        warnings = []
+        trees = {}
+        module = metadata.get('module', 'solution.py')
+        
+        # Only files the tests are known to import; a broken scratch file elsewhere
+        # in the zip should not fail the submission
+        checked = {module} | {f for f in metadata.get('requiredFiles', []) if f.endswith('.py')}
+        for path in sorted(checked):
+            content = files.get(path)
+            if content is None:
+                continue
+            try:
+                trees[path] = ast.parse(content, filename=path)
+            except SyntaxError as e:
+                location = f"line {e.lineno}" + (f", column {e.offset}" if e.offset else '')
+                message = f"Syntax error in {path} ({location}): {e.msg}"
+                if e.text and e.text.strip():
+                    message += f"\n      {e.text.strip()}"
+                errors.append(message)
+            except ValueError as e:  # e.g. null bytes in the source
+                errors.append(f"Could not parse {path}: {e}")
+        
+        symbols = metadata.get('symbols', [])
+        if symbols and module in trees:
+            bindings = self._module_bindings(trees[module])
+            for symbol in symbols:
+                symbol_errors, symbol_warnings = self._check_symbol(module, symbol, bindings)
+                errors.extend(symbol_errors)
+                warnings.extend(symbol_warnings)
+        
+        return {'ok': not errors, 'errors': errors, 'warnings': warnings}
+    
+    def zip_import_blocker(self, zf: zipfile.ZipFile, tests_dir: Optional[str] = None) -> Optional[str]:
+        """
+        Whether the submission can run straight from its zip (zipimport) instead of being extracted
+        Only small, pure-Python submissions that never look at their own files qualify, tested
+        by a suite that imports them (rather than loading e.g. 'solution.py' by path).
+        Returns:
+            None if it can, otherwise the reason it needs a real filesystem
+        """
+        if ZIP_IMPORT_MAX_BYTES <= 0:
+            return 'zip import disabled'
+        if tests_dir:
+            blocker = self._suite_reads_files(tests_dir)
+            if blocker:
+                return blocker
+        infos = [info for info in zf.infolist() if not info.is_dir() and '__MACOSX' not in info.filename]
+        if not infos:
+            return 'empty archive'
+        if sum(info.file_size for info in infos) > ZIP_IMPORT_MAX_BYTES:
+            return f'larger than {ZIP_IMPORT_MAX_BYTES} bytes'
+        names = {info.filename for info in infos}
+        for info in infos:
+            name = info.filename
+            parts = name.split('/')
+            if name.startswith('/') or '..' in parts or '\\' in name:
+                return f'{name}: unusual path'
+            if parts[0] in ('tests', 'data'):
+                return f'ships its own {parts[0]}/'
+            if not name.endswith('.py'):
+                return f'{name} is not a Python module'
+            if info.flag_bits & 0x1 or info.compress_type not in ZIP_IMPORT_METHODS:
+                return f'{name}: encrypted or unsupported compression'
+            for depth in range(1, len(parts)):
+                if '/'.join(parts[:depth] + ['__init__.py']) not in names:
+                    return f"{'/'.join(parts[:depth])}/ is a namespace package"
+            try:
+                tree = ast.parse(zf.read(info), filename=name)
+            except (SyntaxError, ValueError):
+                # Let the error point at a real file
+                return f'{name} does not parse'
+            for node in ast.walk(tree):
+                if isinstance(node, ast.Name) and node.id == '__file__':
+                    return f'{name} uses __file__'
+                called = node.func if isinstance(node, ast.Call) else None
+                if called is not None and (getattr(called, 'attr', None) or getattr(called, 'id', None)) in DIRECTORY_CALLS:
+                    return f'{name} lists directories'
+        return None
+    
+    def _suite_reads_files(self, tests_dir: str) -> Optional[str]:
+        for root, dirs, files in os.walk(tests_dir):
+            for name in sorted(files):
+                if not name.endswith('.py'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    with open(path, 'rb') as f:
+                        tree = ast.parse(f.read(), filename=path)
+                except (OSError, SyntaxError, ValueError):
+                    return f'{name} does not parse'
+                for node in ast.walk(tree):
+                    if isinstance(node, ast.Constant) and isinstance(node.value, str) and node.value.endswith('.py'):
+                        return f'{name} refers to {node.value}'
+                    if (isinstance(node, ast.Attribute) and node.attr in PATH_LOADERS) or \
+                            (isinstance(node, ast.Name) and node.id in PATH_LOADERS):
+                        return f'{name} loads modules by path'
+        return None
+    
+    def analyzer_id(self) -> str:
+        tools = ['python-ast-1']
+        if pyflakes is not None:
+            tools.append(f'pyflakes-{pyflakes.__version__}')
+        if pycodestyle is not None:
+            tools.append(f'pycodestyle-{pycodestyle.__version__}')
+        return '+'.join(tools)
+    
+    def analyze_file(self, path: str, content: bytes, settings: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Lint (pyflakes when installed, else built-in checks), style (pycodestyle when
+        installed, else the base checks) and per-function cyclomatic complexity
+        settings: maxLineLength (100), maxComplexity (10)
+        """
+        try:
+            tree = ast.parse(content, filename=path)
+        except (SyntaxError, ValueError) as e:
+            return {'findings': [make_finding(getattr(e, 'lineno', None) or 1, getattr(e, 'offset', None) or 1,
+                                              'E999', 'error', 'python', f"{type(e).__name__}: {getattr(e, 'msg', e)}")],
+                    'functions': []}
+        
+        findings = []
+        if pyflakes is not None:
+            findings += self._pyflakes_findings(tree, path)
+        else:
+            findings += self._unused_imports(tree)
+        if pycodestyle is not None:
+            findings += self._pycodestyle_findings(content, path, settings)
+        else:
+            findings += super().analyze_file(path, content, settings)['findings']
+            findings += self._builtin_style(tree)
+        findings += self._mutable_defaults(tree)
+        
+        functions = self._function_complexity(tree)
+        max_complexity = int(settings.get('maxComplexity', 10))
+        findings += [
+            make_finding(function['line'], 1, 'C901', 'warning', 'python',
+                         f"'{function['name']}' is too complex ({function['complexity']} > {max_complexity})")
+            for function in functions if function['complexity'] > max_complexity
+        ]
+        
+        unique = {(f['line'], f['column'], f['code']): f for f in findings}
+        return {'findings': sorted(unique.values(), key=lambda f: (f['line'], f['column'], f['code'])),
+                'functions': functions}
+    
+    def _pyflakes_findings(self, tree: ast.AST, path: str) -> List[Dict[str, Any]]:
+        checker = pyflakes.checker.Checker(tree, filename=path)
+        findings = []
+        for message in checker.messages:
+            code = PYFLAKES_CODES.get(type(message).__name__, 'F')
+            severity = 'error' if code in ('F821', 'F823', 'F706', 'F831') else 'warning'
+            findings.append(make_finding(message.lineno, (getattr(message, 'col', 0) or 0) + 1, code, severity,
+                                         'pyflakes', message.message % message.message_args))
+        return findings
+    
+    def _pycodestyle_findings(self, content: bytes, path: str, settings: Dict[str, Any]) -> List[Dict[str, Any]]:
+        findings = []
+        
+        class Collect(pycodestyle.BaseReport):
+            def error(self, line_number, offset, text, check):
+                code = text[:4]
+                if super().error(line_number, offset, code, check):
+                    findings.append(make_finding(line_number, offset + 1, code, 'style', 'pycodestyle', text[5:]))
+        
+        style = pycodestyle.StyleGuide(quiet=True, max_line_length=int(settings.get('maxLineLength', 100)))
+        lines = content.decode('utf-8', errors='replace').splitlines(True)
+        pycodestyle.Checker(path, lines=lines, options=style.options, report=Collect(style.options)).check_all()
+        return findings
+    
+    def _unused_imports(self, tree: ast.AST) -> List[Dict[str, Any]]:
+        """Module-level imports never referenced (only when pyflakes is not installed)"""
+        used = {node.id for node in ast.walk(tree) if isinstance(node, ast.Name)}
+        exported = set()
+        for node in tree.body:
+            # Names listed in __all__ are re-exports, not unused
+            if isinstance(node, ast.Assign) and any(isinstance(t, ast.Name) and t.id == '__all__' for t in node.targets) \
+                    and isinstance(node.value, (ast.List, ast.Tuple)):
+                exported |= {e.value for e in node.value.elts if isinstance(e, ast.Constant)}
+        findings = []
+        for node in tree.body:
+            if not isinstance(node, (ast.Import, ast.ImportFrom)) or (
+                    isinstance(node, ast.ImportFrom) and node.module == '__future__'):
+                continue
+            for alias in node.names:
+                name = (alias.asname or alias.name).split('.')[0]
+                if alias.name != '*' and name not in used and name not in exported:
+                    findings.append(make_finding(node.lineno, node.col_offset + 1, 'F401', 'warning', 'python',
+                                                 f"'{alias.name}' imported but unused"))
+        return findings
+    
+    def _builtin_style(self, tree: ast.AST) -> List[Dict[str, Any]]:
+        """The pycodestyle checks that matter most for correctness (only when it is not installed)"""
+        findings = []
+        for node in ast.walk(tree):
+            if isinstance(node, ast.ExceptHandler) and node.type is None:
+                findings.append(make_finding(node.lineno, node.col_offset + 1, 'E722', 'style', 'python',
+                                             "do not use bare 'except'"))
+            elif isinstance(node, ast.Compare):
+                for op, right in zip(node.ops, node.comparators):
+                    if isinstance(op, (ast.Eq, ast.NotEq)) and isinstance(right, ast.Constant) and right.value is None:
+                        findings.append(make_finding(node.lineno, node.col_offset + 1, 'E711', 'style', 'python',
+                                                     "comparison to None should be 'if cond is None:'"))
+        return findings
+    
+    def _mutable_defaults(self, tree: ast.AST) -> List[Dict[str, Any]]:
+        findings = []
+        for node in ast.walk(tree):
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)):
+                for default in list(node.args.defaults) + [d for d in node.args.kw_defaults if d is not None]:
+                    if isinstance(default, (ast.List, ast.Dict, ast.Set, ast.ListComp, ast.DictComp, ast.SetComp)):
+                        findings.append(make_finding(default.lineno, default.col_offset + 1, 'B006', 'warning', 'python',
+                                                     'mutable default argument (shared between calls)'))
+        return findings
+    
+    def _function_complexity(self, tree: ast.AST) -> List[Dict[str, Any]]:
+        """Cyclomatic complexity of every function and method (nested functions count on their own)"""
+        functions = []
+        
+        def visit(node, prefix):
+            for child in ast.iter_child_nodes(node):
+                if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    name = f"{prefix}{child.name}"
+                    functions.append({'name': name, 'line': child.lineno, 'complexity': self._complexity(child)})
+                    visit(child, f"{name}.")
+                elif isinstance(child, ast.ClassDef):
+                    visit(child, f"{prefix}{child.name}.")
+                else:
+                    visit(child, prefix)
+        
+        visit(tree, '')
+        return functions
+    
+    def _complexity(self, function: ast.AST) -> int:
+        complexity = 1
+        pending = list(ast.iter_child_nodes(function))
+        while pending:
+            node = pending.pop()
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda)):
+                continue  # measured separately
+            if isinstance(node, BRANCH_NODES):
+                complexity += 1
+            if isinstance(node, ast.comprehension):
+                complexity += len(node.ifs)
+            elif isinstance(node, ast.BoolOp):
+                complexity += len(node.values) - 1
+            elif isinstance(node, (ast.For, ast.AsyncFor, ast.While, ast.Try)) and node.orelse:
+                complexity += 1
+            pending.extend(ast.iter_child_nodes(node))
+        return complexity
+    
     def get_docker_image(self) -> str:
         """Get Docker image for Python"""
         return 'python:3.11-slim'
@@ -177,10 +480,101 @@ class PythonPlugin(LanguagePlugin):
                     feedback_parts.append(f"  • {message}")
         
         return '\n'.join(feedback_parts)
-
-
-
-
-
-
-
+    
+    def _module_bindings(self, tree: ast.AST) -> Dict[str, ast.AST]:
+        """Names bound at module level, including inside top-level if/try/with blocks"""
+        bindings = {}
+        pending = list(tree.body)
+        while pending:
+            node = pending.pop(0)
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                bindings[node.name] = node
+            elif isinstance(node, ast.Assign):
+                for target in node.targets:
+                    if isinstance(target, ast.Name):
+                        bindings[target.id] = node.value
+            elif isinstance(node, (ast.AnnAssign, ast.AugAssign)) and isinstance(node.target, ast.Name):
+                bindings[node.target.id] = node.value
+            elif isinstance(node, (ast.Import, ast.ImportFrom)):
+                for alias in node.names:
+                    bindings[(alias.asname or alias.name).split('.')[0]] = node
+            elif isinstance(node, (ast.If, ast.Try, ast.With)):
+                pending.extend(node.body)
+                pending.extend(getattr(node, 'orelse', []))
+                for handler in getattr(node, 'handlers', []):
+                    pending.extend(handler.body)
+                pending.extend(getattr(node, 'finalbody', []))
+        return bindings
+    
+    def _check_symbol(self, module: str, symbol: Dict[str, Any],
+                      bindings: Dict[str, ast.AST]) -> Tuple[List[str], List[str]]:
+        """Check that a required function or class exists (errors) with a usable signature (warnings)"""
+        name = symbol['name']
+        kind = symbol.get('kind', 'function')
+        node = bindings.get(name)
+        
+        if node is None:
+            return [f"{module} does not define required {kind} '{name}'"], []
+        
+        # Imported or computed bindings can't be checked statically
+        if isinstance(node, (ast.Import, ast.ImportFrom)) or not isinstance(
+                node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda)):
+            return [], []
+        
+        if kind == 'class':
+            if not isinstance(node, ast.ClassDef):
+                return [], [f"'{name}' in {module} should be a class"]
+            return [], self._check_methods(module, node, symbol.get('methods', []))
+        
+        if isinstance(node, ast.ClassDef):
+            return [], [f"'{name}' in {module} should be a function, not a class"]
+        if 'params' in symbol:
+            problem = self._signature_problem(node.args, symbol['params'])
+            if problem:
+                return [], [f"{name}() in {module} {problem}"]
+        return [], []
+    
+    def _check_methods(self, module: str, node: ast.ClassDef, methods: List[Dict[str, Any]]) -> List[str]:
+        """Warnings for listed methods that are missing or can't be called the way the tests call them"""
+        warnings = []
+        defined = {
+            item.name: item for item in node.body
+            if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef))
+        }
+        # Base classes and decorators (e.g. @dataclass) may provide methods we can't see
+        may_inherit = bool(node.bases) or bool(node.decorator_list)
+        
+        for method in methods:
+            method_node = defined.get(method['name'])
+            if method_node is None:
+                if not may_inherit:
+                    warnings.append(f"class {node.name} in {module} is missing method '{method['name']}'")
+                continue
+            if 'params' not in method:
+                continue
+            is_static = any(
+                isinstance(d, ast.Name) and d.id == 'staticmethod' for d in method_node.decorator_list
+            )
+            problem = self._signature_problem(method_node.args, method['params'], skip_self=not is_static)
+            if problem:
+                warnings.append(f"{node.name}.{method['name']}() in {module} {problem}")
+        return warnings
+    
+    def _signature_problem(self, args: ast.arguments, count: int, skip_self: bool = False) -> Optional[str]:
+        """Describe why a call with `count` positional arguments would fail, if it would"""
+        positional = list(args.posonlyargs) + list(args.args)
+        defaults = len(args.defaults)
+        if skip_self and positional:
+            positional = positional[1:]
+        required = max(0, len(positional) - defaults)
+        
+        if count < required:
+            return f"requires {required} arguments but the tests call it with {count}"
+        if count > len(positional) and args.vararg is None:
+            return f"accepts {len(positional)} arguments but the tests call it with {count}"
+        missing_kwonly = [
+            a.arg for a, default in zip(args.kwonlyargs, args.kw_defaults) if default is None
+        ]
+        if missing_kwonly:
+            return f"has required keyword-only arguments: {', '.join(missing_kwonly)}"
+        return None
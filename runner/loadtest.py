@@ -0,0 +1,485 @@
+"""
+Runner Load Generator
+Closed-loop load test for /run with a built-in stub backend, so the runner
+can be soaked with real submission zips and no other services
+
+Usage:
+    python loadtest.py --spawn --zips DIR [--profile steady|spike|storm] [--users N] [--duration S]
+    python loadtest.py --runner-url URL --submissions-dir DIR --from-db database.json [--runner-pid PID]
+    python loadtest.py --spawn --references
+
+Zips come from DIR/<task-slug>/*.zip, from the submissions listed in a
+backend database.json, or are built from the tasks' reference solutions. With --spawn a runner is started against the stub
+backend with private SUBMISSIONS_DIR/RESULTS_DIR; otherwise point the
+external runner's BACKEND_URL at the printed stub URL.
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Any, Optional, Tuple
+
+import requests
+
+from analytics import QuantileSketch
+
+RUNNER_DIR = os.path.dirname(os.path.abspath(__file__))
+TASKS_DIR = os.getenv('TASKS_DIR', os.path.join(os.path.dirname(RUNNER_DIR), 'tasks'))
+PERCENTILES = (0.5, 0.9, 0.99)
+
+
+class StubBackend:
+    """Serves /api/runner/assignments and records /api/runner/callback arrivals"""
+
+    def __init__(self, assignments: List[Dict[str, Any]], host: str = '127.0.0.1', port: int = 0):
+        self.assignments = assignments
+        self._waiters: Dict[str, Tuple[threading.Event, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        self.unexpected_callbacks = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status: int, body: Any):
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path.rstrip('/') == '/api/runner/assignments':
+                    self._reply(200, stub.assignments)
+                else:
+                    self._reply(404, {'error': 'not found'})
+
+            def do_POST(self):
+                if self.path.rstrip('/') != '/api/runner/callback':
+                    self._reply(404, {'error': 'not found'})
+                    return
+                length = int(self.headers.get('Content-Length', 0))
+                try:
+                    stub._deliver(json.loads(self.rfile.read(length) or b'{}'))
+                except json.JSONDecodeError:
+                    self._reply(400, {'error': 'bad json'})
+                    return
+                self._reply(200, {'ok': True})
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://{host}:{self.server.server_port}/api"
+
+    def start(self) -> 'StubBackend':
+        threading.Thread(target=self.server.serve_forever, name='stub-backend', daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+    def expect(self, submission_id: str) -> Tuple[threading.Event, Dict[str, Any]]:
+        """Register interest in a submission's callback before sending it"""
+        waiter = (threading.Event(), {})
+        with self._lock:
+            self._waiters[submission_id] = waiter
+        return waiter
+
+    def forget(self, submission_id: str):
+        with self._lock:
+            self._waiters.pop(submission_id, None)
+
+    def _deliver(self, body: Dict[str, Any]):
+        submission_id = str(body.get('submissionId'))
+        with self._lock:
+            waiter = self._waiters.get(submission_id)
+        if waiter is None:
+            self.unexpected_callbacks += 1
+            return
+        event, result = waiter
+        # Intermediate (e.g. provisional) callbacks do not finish a job
+        if body.get('status') in ('completed', 'failed', 'cancelled'):
+            result.update(body, received_at=time.monotonic())
+            event.set()
+
+
+class LoadStats:
+    """Counters and latency sketches, cumulative and per report interval"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.monotonic()
+        self.sent = 0
+        self.completed = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.statuses: Dict[str, int] = {}
+        self.latency = QuantileSketch()
+        self.accept_latency = QuantileSketch()
+        self.interval_latency = QuantileSketch()
+        self.interval_completed = 0
+        self.rss_samples: List[Tuple[float, int]] = []
+
+    def record_sent(self):
+        with self._lock:
+            self.sent += 1
+
+    def record_accept(self, seconds: float):
+        with self._lock:
+            self.accept_latency.add(seconds)
+
+    def record_done(self, status: str, seconds: float):
+        with self._lock:
+            self.completed += 1
+            self.interval_completed += 1
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            self.latency.add(seconds)
+            self.interval_latency.add(seconds)
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def take_interval(self) -> Tuple[int, QuantileSketch]:
+        with self._lock:
+            interval = (self.interval_completed, self.interval_latency)
+            self.interval_completed = 0
+            self.interval_latency = QuantileSketch()
+            return interval
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            elapsed = time.monotonic() - self.started_at
+            finished = self.completed + self.errors + self.timeouts
+            rss = [value for _, value in self.rss_samples]
+            summary = {
+                'duration': round(elapsed, 1),
+                'sent': self.sent,
+                'completed': self.completed,
+                'throughput': round(self.completed / elapsed, 3) if elapsed else 0.0,
+                'errorRate': round(self.errors / finished, 4) if finished else 0.0,
+                'timeoutRate': round(self.timeouts / finished, 4) if finished else 0.0,
+                'errors': self.errors,
+                'timeouts': self.timeouts,
+                'statuses': dict(self.statuses),
+                'latency': _percentiles(self.latency),
+                'acceptLatency': _percentiles(self.accept_latency)
+            }
+            if rss:
+                hours = (self.rss_samples[-1][0] - self.rss_samples[0][0]) / 3600
+                summary['rss'] = {
+                    'startMb': round(rss[0] / 2**20, 1),
+                    'endMb': round(rss[-1] / 2**20, 1),
+                    'maxMb': round(max(rss) / 2**20, 1),
+                    # Short runs extrapolate noise, so growth is only reported for soaks
+                    'growthMbPerHour': round((rss[-1] - rss[0]) / 2**20 / hours, 2) if hours >= 0.25 else None
+                }
+            return summary
+
+
+def _percentiles(sketch: QuantileSketch) -> Dict[str, Optional[float]]:
+    values = {f'p{int(q * 100)}': sketch.quantile(q) for q in PERCENTILES}
+    values['max'] = sketch.max if sketch.count else None
+    return {k: round(v, 4) if v is not None else None for k, v in values.items()}
+
+
+def read_rss(pid: int) -> Optional[int]:
+    """Resident set size of a process in bytes (Linux /proc)"""
+    try:
+        with open(f'/proc/{pid}/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        return None
+    return None
+
+
+def target_users(profile: str, elapsed: float, args) -> int:
+    """Number of active virtual users at a point in the run"""
+    if profile == 'spike':
+        spike_start = args.duration * args.spike_at
+        if spike_start <= elapsed < spike_start + args.spike_duration:
+            return args.users * args.spike_factor
+    return args.users
+
+
+def zip_references(tasks_dir: str, target_dir: str) -> str:
+    """Zip each task's reference solution into target_dir/<slug>/reference.zip"""
+    for slug in sorted(os.listdir(tasks_dir)):
+        reference = os.path.join(tasks_dir, slug, 'reference')
+        if not os.path.isdir(reference):
+            continue
+        os.makedirs(os.path.join(target_dir, slug), exist_ok=True)
+        with zipfile.ZipFile(os.path.join(target_dir, slug, 'reference.zip'), 'w') as zf:
+            for root, _, files in os.walk(reference):
+                for name in files:
+                    path = os.path.join(root, name)
+                    zf.write(path, os.path.relpath(path, reference))
+    return target_dir
+
+
+def load_assignments(args) -> Tuple[List[Dict[str, Any]], Dict[int, List[str]]]:
+    """Assignments for the stub backend and the zips available per assignment id"""
+    assignments: List[Dict[str, Any]] = []
+    zips: Dict[int, List[str]] = {}
+    if args.references:
+        args.zips = zip_references(TASKS_DIR, tempfile.mkdtemp(prefix='aca-loadtest-zips-'))
+    if args.from_db:
+        with open(args.from_db, 'r', encoding='utf-8') as f:
+            database = json.load(f)
+        source_dir = args.db_submissions_dir or os.path.join(os.path.dirname(args.from_db), 'submissions')
+        for assignment in database.get('assignments', []):
+            assignments.append({k: assignment[k] for k in ('id', 'slug', 'language') if k in assignment})
+        for submission in database.get('submissions', []):
+            path = os.path.join(source_dir, submission.get('filename', ''))
+            if os.path.isfile(path):
+                zips.setdefault(submission.get('assignmentId'), []).append(path)
+    else:
+        for number, slug in enumerate(sorted(os.listdir(args.zips)), start=1):
+            slug_dir = os.path.join(args.zips, slug)
+            if not os.path.isdir(slug_dir):
+                continue
+            assignments.append({'id': number, 'slug': slug})
+            zips[number] = [os.path.join(slug_dir, name) for name in sorted(os.listdir(slug_dir))
+                            if name.endswith('.zip')]
+    zips = {k: v for k, v in zips.items() if v}
+    return assignments, zips
+
+
+def stage_zips(zips: Dict[int, List[str]], submissions_dir: str) -> Dict[int, List[str]]:
+    """Copy zips where the runner looks for them; returns file names per assignment"""
+    os.makedirs(submissions_dir, exist_ok=True)
+    staged: Dict[int, List[str]] = {}
+    for assignment_id, paths in zips.items():
+        for index, path in enumerate(paths):
+            name = f"loadtest-{assignment_id}-{index}-{os.path.basename(path)}"
+            shutil.copy2(path, os.path.join(submissions_dir, name))
+            staged.setdefault(assignment_id, []).append(name)
+    return staged
+
+
+def spawn_runner(port: int, backend_url: str, submissions_dir: str, results_dir: str,
+                 log_path: str) -> subprocess.Popen:
+    env = dict(os.environ, PORT=str(port), BACKEND_URL=backend_url,
+               SUBMISSIONS_DIR=submissions_dir, RESULTS_DIR=results_dir)
+    log = open(log_path, 'ab')
+    return subprocess.Popen([sys.executable, os.path.join(RUNNER_DIR, 'runner.py')], cwd=RUNNER_DIR,
+                            env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def wait_healthy(runner_url: str, timeout: float = 60) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"{runner_url}/health", timeout=2).ok:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    return False
+
+
+class LoadGenerator:
+    """Virtual users submitting, waiting for the callback, thinking, repeating"""
+
+    def __init__(self, args, stub: StubBackend, staged: Dict[int, List[str]], stats: LoadStats):
+        self.args = args
+        self.stub = stub
+        self.staged = staged
+        self.stats = stats
+        self.stop_event = threading.Event()
+        self.started_at = 0.0
+        self._counter = 0
+        self._counter_lock = threading.Lock()
+
+    def _next_id(self) -> str:
+        with self._counter_lock:
+            self._counter += 1
+            return f"lt-{os.getpid()}-{self._counter}"
+
+    def submit(self, session: requests.Session, user_id: str, assignment_id: int, filename: str):
+        """Send one job and wait until its final callback (or the job timeout)"""
+        submission_id = self._next_id()
+        event, result = self.stub.expect(submission_id)
+        payload = {'submissionId': submission_id, 'assignmentId': assignment_id,
+                   'userId': user_id, 'filename': filename}
+        start = time.monotonic()
+        self.stats.record_sent()
+        try:
+            response = session.post(f"{self.args.runner_url}/run", json=payload, timeout=self.args.job_timeout)
+            self.stats.record_accept(time.monotonic() - start)
+            if response.status_code >= 400:
+                self.stats.record_error()
+                return
+            remaining = self.args.job_timeout - (time.monotonic() - start)
+            if not event.wait(max(remaining, 0)):
+                self.stats.record_timeout()
+                return
+            status = result.get('status', 'unknown')
+            if status == 'failed':
+                self.stats.record_error()
+            self.stats.record_done(status, result['received_at'] - start)
+        except requests.Timeout:
+            self.stats.record_timeout()
+        except requests.RequestException:
+            self.stats.record_error()
+        finally:
+            self.stub.forget(submission_id)
+
+    def user_loop(self, index: int):
+        rng = random.Random(self.args.seed * 100003 + index)
+        session = requests.Session()
+        user_id = f"lt-user-{index}"
+        # Storm users hammer one assignment; others pick one per attempt
+        storm_assignment = rng.choice(sorted(self.staged))
+        while not self.stop_event.is_set():
+            elapsed = time.monotonic() - self.started_at
+            if index >= target_users(self.args.profile, elapsed, self.args):
+                self.stop_event.wait(0.2)
+                continue
+            if self.args.profile == 'storm':
+                filename = rng.choice(self.staged[storm_assignment])
+                burst = [threading.Thread(target=self.submit,
+                                          args=(requests.Session(), user_id, storm_assignment, filename))
+                         for _ in range(self.args.storm_burst)]
+                for thread in burst:
+                    thread.start()
+                for thread in burst:
+                    thread.join()
+                continue
+            assignment_id = rng.choice(sorted(self.staged))
+            self.submit(session, user_id, assignment_id, rng.choice(self.staged[assignment_id]))
+            if self.args.think > 0:
+                self.stop_event.wait(rng.expovariate(1 / self.args.think))
+
+    def run(self, runner_pid: Optional[int]):
+        max_users = self.args.users * (self.args.spike_factor if self.args.profile == 'spike' else 1)
+        self.started_at = time.monotonic()
+        self.stats.started_at = self.started_at
+        users = [threading.Thread(target=self.user_loop, args=(i,), daemon=True) for i in range(max_users)]
+        for user in users:
+            user.start()
+
+        next_report = self.started_at + self.args.report_interval
+        end = self.started_at + self.args.duration
+        while time.monotonic() < end:
+            time.sleep(min(1.0, max(0.0, end - time.monotonic())))
+            if time.monotonic() >= next_report:
+                self.report(runner_pid)
+                next_report += self.args.report_interval
+
+        self.stop_event.set()
+        # Let in-flight jobs finish so they are counted
+        for user in users:
+            user.join(self.args.job_timeout)
+
+    def report(self, runner_pid: Optional[int]):
+        completed, sketch = self.stats.take_interval()
+        elapsed = time.monotonic() - self.started_at
+        rss = read_rss(runner_pid) if runner_pid else None
+        if rss is not None:
+            self.stats.rss_samples.append((time.monotonic(), rss))
+        p = _percentiles(sketch)
+        print(f"[{elapsed:8.0f}s] users={target_users(self.args.profile, elapsed, self.args):3d} "
+              f"done={completed:5d} ({completed / self.args.report_interval:6.2f}/s) "
+              f"p50={p['p50']} p90={p['p90']} p99={p['p99']} "
+              f"errors={self.stats.errors} timeouts={self.stats.timeouts}"
+              + (f" rss={rss / 2**20:.1f}MB" if rss else ''), flush=True)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Closed-loop load test for the runner')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--zips', help='Directory with <task-slug>/*.zip submissions')
+    source.add_argument('--from-db', help='Backend database.json whose submissions are replayed')
+    source.add_argument('--references', action='store_true', help="Submit the tasks' reference solutions")
+    parser.add_argument('--db-submissions-dir', help='Zips of --from-db (default: next to the database)')
+    parser.add_argument('--profile', choices=['steady', 'spike', 'storm'], default='steady')
+    parser.add_argument('--users', type=int, default=4, help='Concurrent virtual users')
+    parser.add_argument('--duration', type=float, default=300, help='Seconds to generate load')
+    parser.add_argument('--think', type=float, default=1.0, help='Mean think time between submissions')
+    parser.add_argument('--spike-factor', type=int, default=5, help='User multiplier during the spike')
+    parser.add_argument('--spike-at', type=float, default=0.5, help='Spike start as a fraction of --duration')
+    parser.add_argument('--spike-duration', type=float, default=60, help='Spike length in seconds')
+    parser.add_argument('--storm-burst', type=int, default=3, help='Simultaneous resubmissions per storm user')
+    parser.add_argument('--job-timeout', type=float, default=300, help='Seconds before a job counts as timed out')
+    parser.add_argument('--report-interval', type=float, default=10)
+    parser.add_argument('--spawn', action='store_true', help='Start a private runner against the stub backend')
+    parser.add_argument('--runner-url', default='http://127.0.0.1:5001')
+    parser.add_argument('--runner-port', type=int, default=5099, help='Port of the spawned runner')
+    parser.add_argument('--runner-pid', type=int, help='PID of an external runner for RSS sampling')
+    parser.add_argument('--submissions-dir', help="Runner's SUBMISSIONS_DIR (external runner)")
+    parser.add_argument('--stub-host', default='127.0.0.1')
+    parser.add_argument('--stub-port', type=int, default=0)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='Write the final summary as JSON')
+    args = parser.parse_args(argv)
+
+    assignments, zips = load_assignments(args)
+    if not zips:
+        parser.error('no submission zips found')
+
+    stub = StubBackend(assignments, args.stub_host, args.stub_port).start()
+    print(f"Stub backend at {stub.url} serving {len(assignments)} assignments "
+          f"({sum(len(v) for v in zips.values())} zips)")
+
+    workspace = tempfile.mkdtemp(prefix='aca-loadtest-') if args.spawn else None
+    runner = None
+    runner_pid = args.runner_pid
+    try:
+        if args.spawn:
+            submissions_dir = os.path.join(workspace, 'submissions')
+            args.runner_url = f"http://127.0.0.1:{args.runner_port}"
+            staged = stage_zips(zips, submissions_dir)
+            runner = spawn_runner(args.runner_port, stub.url, submissions_dir,
+                                  os.path.join(workspace, 'results'), os.path.join(workspace, 'runner.log'))
+            runner_pid = runner.pid
+            print(f"Spawned runner pid {runner.pid}, log {os.path.join(workspace, 'runner.log')}")
+        else:
+            if not args.submissions_dir:
+                parser.error('--submissions-dir is required without --spawn')
+            staged = stage_zips(zips, args.submissions_dir)
+        if not wait_healthy(args.runner_url):
+            raise SystemExit(f"Runner at {args.runner_url} did not become healthy")
+
+        stats = LoadStats()
+        print(f"Profile {args.profile}: {args.users} users for {args.duration:.0f}s against {args.runner_url}")
+        LoadGenerator(args, stub, staged, stats).run(runner_pid)
+
+        summary = stats.summary()
+        summary.update(profile=args.profile, users=args.users, unexpectedCallbacks=stub.unexpected_callbacks)
+        print(json.dumps(summary, indent=2))
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(summary, f, indent=2)
+    finally:
+        stub.stop()
+        if runner:
+            runner.terminate()
+            try:
+                runner.wait(10)
+            except subprocess.TimeoutExpired:
+                runner.kill()
+        if workspace:
+            shutil.rmtree(workspace, ignore_errors=True)
+        if args.references:
+            shutil.rmtree(args.zips, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,390 @@
+"""
+Mutation Testing of Assignment Test Suites
+Generates AST mutants of a reference solution (flipped operators and
+comparisons, changed constants, negated conditions, dropped return values)
+and runs the assignment's tests against each of them. A mutant is killed
+by its first failing test (pytest -x); a surviving mutant is a wrong
+solution the tests accept.
+
+Only tests whose line coverage (one traced run of the reference) reaches
+the mutated lines are run, fastest first, and mutants are spread over a
+pool of workers, each reusing its own work directory.
+"""
+
+import argparse
+import ast
+import copy
+import json
+import os
+import queue
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Set
+
+from aca_pytest import plugin_options
+from language_plugins.output_capture import run_captured, ProcessCancelled
+
+MUTATION_WORKERS = int(os.getenv('MUTATION_WORKERS', os.cpu_count() or 2))
+MUTATION_MAX_MUTANTS = int(os.getenv('MUTATION_MAX_MUTANTS', 500))
+MUTATION_MIN_TIMEOUT = float(os.getenv('MUTATION_MIN_TIMEOUT', 2))
+# Mutant timeout relative to the reference run (infinite loops count as killed)
+MUTATION_TIMEOUT_FACTOR = 5
+REFERENCE_TIMEOUT = 120
+
+KILLED = 'killed'
+SURVIVED = 'survived'
+TIMEOUT = 'timeout'
+NO_COVERAGE = 'no_coverage'
+ERROR = 'error'
+
+_FAILED_LINE = re.compile(r'^(?:FAILED|ERROR) (\S+)', re.MULTILINE)
+
+_BINOP_SWAPS = {
+    ast.Add: ast.Sub, ast.Sub: ast.Add,
+    ast.Mult: ast.Div, ast.Div: ast.Mult,
+    ast.FloorDiv: ast.Div, ast.Mod: ast.FloorDiv,
+    ast.Pow: ast.Mult
+}
+_COMPARE_SWAPS = {
+    ast.Lt: ast.LtE, ast.LtE: ast.Lt,
+    ast.Gt: ast.GtE, ast.GtE: ast.Gt,
+    ast.Eq: ast.NotEq, ast.NotEq: ast.Eq,
+    ast.Is: ast.IsNot, ast.IsNot: ast.Is,
+    ast.In: ast.NotIn, ast.NotIn: ast.In
+}
+_BOOLOP_SWAPS = {ast.And: ast.Or, ast.Or: ast.And}
+
+
+class Mutant:
+    """One changed copy of the module source"""
+
+    def __init__(self, mutant_id: int, operator: str, node: ast.AST, original: str, replacement: str, source: str):
+        self.id = mutant_id
+        self.operator = operator
+        self.line = node.lineno
+        self.end_line = getattr(node, 'end_lineno', None) or node.lineno
+        self.col = node.col_offset
+        self.original = original
+        self.replacement = replacement
+        self.source = source
+        self.status: Optional[str] = None
+        self.killed_by: Optional[str] = None
+        self.tests_run = 0
+        self.duration = 0.0
+
+    @property
+    def lines(self) -> Set[int]:
+        return set(range(self.line, self.end_line + 1))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'operator': self.operator,
+            'line': self.line,
+            'col': self.col,
+            'original': self.original,
+            'replacement': self.replacement,
+            'status': self.status,
+            'killedBy': self.killed_by,
+            'testsSelected': self.tests_run,
+            'duration': round(self.duration, 4)
+        }
+
+
+def _excluded_nodes(tree: ast.AST) -> Set[int]:
+    """Nodes not worth mutating: docstrings, annotations and f-string internals"""
+    excluded = set()
+    for node in ast.walk(tree):
+        roots = []
+        if isinstance(node, (ast.Module, ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            body = node.body
+            if body and isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant) \
+                    and isinstance(body[0].value.value, str):
+                roots.append(body[0].value)
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.returns:
+            roots.append(node.returns)
+        if isinstance(node, ast.arg) and node.annotation:
+            roots.append(node.annotation)
+        if isinstance(node, ast.AnnAssign):
+            roots.append(node.annotation)
+        if isinstance(node, ast.JoinedStr):
+            roots.append(node)
+        for root in roots:
+            excluded.update(id(child) for child in ast.walk(root))
+    return excluded
+
+
+def _variants(node: ast.AST):
+    """(operator name, mutated copy of node) pairs for one node"""
+    if isinstance(node, (ast.BinOp, ast.AugAssign)) and type(node.op) in _BINOP_SWAPS:
+        mutated = copy.deepcopy(node)
+        mutated.op = _BINOP_SWAPS[type(node.op)]()
+        yield 'arithmetic', mutated
+    elif isinstance(node, ast.Compare):
+        for i, op in enumerate(node.ops):
+            if type(op) in _COMPARE_SWAPS:
+                mutated = copy.deepcopy(node)
+                mutated.ops[i] = _COMPARE_SWAPS[type(op)]()
+                yield 'comparison', mutated
+    elif isinstance(node, ast.BoolOp):
+        mutated = copy.deepcopy(node)
+        mutated.op = _BOOLOP_SWAPS[type(node.op)]()
+        yield 'boolean', mutated
+    elif isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+        yield 'negation', copy.deepcopy(node.operand)
+    elif isinstance(node, ast.Constant):
+        value = node.value
+        if isinstance(value, bool):
+            yield 'constant', ast.Constant(not value)
+        elif isinstance(value, (int, float)):
+            yield 'constant', ast.Constant(value + 1)
+        elif isinstance(value, str):
+            yield 'constant', ast.Constant('' if value else 'mutated')
+    elif isinstance(node, ast.Return) and node.value is not None \
+            and not (isinstance(node.value, ast.Constant) and node.value.value is None):
+        yield 'return', ast.Return(ast.Constant(None))
+
+
+def _condition_variants(node: ast.AST):
+    """Negated conditions of if/while/ternaries (the test expression is replaced)"""
+    if isinstance(node, (ast.If, ast.While, ast.IfExp)) and not (
+            isinstance(node.test, ast.UnaryOp) and isinstance(node.test.op, ast.Not)):
+        yield 'condition', node.test, ast.UnaryOp(ast.Not(), copy.deepcopy(node.test))
+
+
+def _splice(lines: List[str], node: ast.AST, replacement: str) -> str:
+    """Replace the source text of node (positions are UTF-8 byte offsets) with replacement"""
+    start_line, end_line = node.lineno - 1, node.end_lineno - 1
+    head = lines[start_line].encode('utf-8')[:node.col_offset].decode('utf-8')
+    tail = lines[end_line].encode('utf-8')[node.end_col_offset:].decode('utf-8')
+    return ''.join(lines[:start_line]) + head + replacement + tail + ''.join(lines[end_line + 1:])
+
+
+def generate_mutants(source: str, limit: int = MUTATION_MAX_MUTANTS) -> List[Mutant]:
+    """All first-order mutants of a module, in source order (duplicates and non-compiling ones dropped)"""
+    tree = ast.parse(source)
+    lines = source.splitlines(keepends=True)
+    excluded = _excluded_nodes(tree)
+    original_dump = ast.dump(tree)
+    seen = {original_dump}
+
+    candidates = []
+    for node in ast.walk(tree):
+        if id(node) in excluded or not hasattr(node, 'lineno'):
+            continue
+        for operator, mutated in _variants(node):
+            candidates.append((operator, node, mutated))
+        for operator, target, mutated in _condition_variants(node):
+            candidates.append((operator, target, mutated))
+    candidates.sort(key=lambda candidate: (candidate[1].lineno, candidate[1].col_offset))
+
+    mutants = []
+    for operator, node, mutated in candidates:
+        original = ast.get_source_segment(source, node) or ''
+        replacement = ast.unparse(mutated)
+        if isinstance(node, ast.expr) and not isinstance(node, (ast.Constant, ast.Name)):
+            replacement = f"({replacement})"  # keep precedence where the expression is embedded
+        mutated_source = _splice(lines, node, replacement)
+        try:
+            dump = ast.dump(ast.parse(mutated_source))
+        except SyntaxError:
+            continue
+        if dump in seen:
+            continue
+        seen.add(dump)
+        mutants.append(Mutant(len(mutants) + 1, operator, node, original, replacement, mutated_source))
+        if len(mutants) >= limit:
+            break
+    return mutants
+
+
+def _pytest_command(targets: List[str], extra: Optional[List[str]] = None) -> List[str]:
+    return ['python', '-m', 'pytest', '-q', '-p', 'no:cacheprovider', *(extra or []), *targets]
+
+
+def _pytest_env(data_dir: Optional[str] = None) -> Dict[str, str]:
+    env = dict(os.environ)
+    # Mutants of the same size can be written within one mtime tick: never trust cached bytecode
+    env['PYTHONDONTWRITEBYTECODE'] = '1'
+    if data_dir:
+        env['ACA_DATA_DIR'] = data_dir
+    return env
+
+
+def _data_options(env: Dict[str, str]) -> List[str]:
+    """Load the dataset fixtures when the task has a dataset"""
+    return plugin_options('data', env) if env.get('ACA_DATA_DIR') else []
+
+
+def _prepare_workdir(reference_dir: str, tests_dir: str, prefix: str, data_dir: Optional[str] = None) -> str:
+    workdir = tempfile.mkdtemp(prefix=prefix)
+    shutil.copytree(reference_dir, workdir, dirs_exist_ok=True)
+    shutil.copytree(tests_dir, os.path.join(workdir, 'tests'), dirs_exist_ok=True)
+    if data_dir and not os.path.lexists(os.path.join(workdir, 'data')):
+        os.symlink(data_dir, os.path.join(workdir, 'data'), target_is_directory=True)
+    return workdir
+
+
+def trace_reference(reference_dir: str, tests_dir: str, module: str, data_dir: Optional[str] = None) -> Dict[str, Any]:
+    """Run the tests once against the reference solution, recording per-test line coverage"""
+    workdir = _prepare_workdir(reference_dir, tests_dir, 'mutation_ref_', data_dir)
+    try:
+        coverage_path = os.path.join(workdir, '.aca-linecov.json')
+        env = _pytest_env(data_dir)
+        env['ACA_LINECOV_TARGET'] = os.path.join(workdir, module)
+        env['ACA_LINECOV_OUTPUT'] = coverage_path
+        cmd = _pytest_command(['tests'], plugin_options('linecov', env) + _data_options(env))
+        result = run_captured(cmd, cwd=workdir, timeout=REFERENCE_TIMEOUT, env=env)
+        if not os.path.exists(coverage_path):
+            raise RuntimeError(f"Reference run produced no coverage: {(result.stderr or result.stdout)[-500:]}")
+        with open(coverage_path, 'r', encoding='utf-8') as f:
+            coverage = json.load(f)
+        coverage['duration'] = result.duration
+        return coverage
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def tests_for_mutant(mutant: Mutant, coverage: Dict[str, Any], passing: List[str]) -> List[str]:
+    """Passing tests that reach the mutated lines, fastest first (all of them for import-time code)"""
+    if mutant.lines & set(coverage.get('session', [])):
+        return passing
+    tests = coverage['tests']
+    return [nodeid for nodeid in passing if mutant.lines & set(tests[nodeid].get('lines', []))]
+
+
+def run_mutant(mutant: Mutant, workdir: str, module: str, tests: List[str], timeout: float,
+               cancel_event: Optional[threading.Event] = None, data_dir: Optional[str] = None) -> Mutant:
+    """Run the selected tests against one mutant, stopping at the first failure"""
+    start = time.perf_counter()
+    mutant.tests_run = len(tests)
+    if not tests:
+        mutant.status = NO_COVERAGE
+        return mutant
+    with open(os.path.join(workdir, module), 'w', encoding='utf-8') as f:
+        f.write(mutant.source)
+    env = _pytest_env(data_dir)
+    cmd = _pytest_command(tests, ['-x', '--tb=no', '-rfE'] + _data_options(env))
+    try:
+        result = run_captured(cmd, cwd=workdir, timeout=timeout, env=env, cancel_event=cancel_event)
+        if result.returncode == 0:
+            mutant.status = SURVIVED
+        elif result.returncode in (1, 2):
+            mutant.status = KILLED
+            match = _FAILED_LINE.search(result.stdout)
+            mutant.killed_by = match.group(1) if match else None
+        else:
+            mutant.status = ERROR  # usage error, no tests collected, ...
+    except subprocess.TimeoutExpired:
+        mutant.status = TIMEOUT
+    mutant.duration = time.perf_counter() - start
+    return mutant
+
+
+def run_mutation_testing(reference_dir: str, tests_dir: str, module: str = 'solution.py',
+                         workers: int = MUTATION_WORKERS, limit: int = MUTATION_MAX_MUTANTS,
+                         cancel_event: Optional[threading.Event] = None,
+                         data_dir: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Mutation-test an assignment's test suite against its reference solution
+    Args:
+        reference_dir: Directory with the reference solution (module inside it is mutated)
+        tests_dir: The assignment's tests
+        module: File to mutate, relative to reference_dir
+        workers: Mutants run in parallel
+        limit: Maximum number of mutants
+        cancel_event: Stops the run (ProcessCancelled propagates)
+        data_dir: The task's dataset (linked into every workdir)
+    Returns:
+        Report with the mutation score, per-status counts and the surviving mutants
+    """
+    start = time.perf_counter()
+    with open(os.path.join(reference_dir, module), 'r', encoding='utf-8') as f:
+        source = f.read()
+    mutants = generate_mutants(source, limit)
+
+    coverage = trace_reference(reference_dir, tests_dir, module, data_dir)
+    outcomes = {nodeid: test.get('outcome') for nodeid, test in coverage['tests'].items()}
+    passing = sorted((nodeid for nodeid, outcome in outcomes.items() if outcome == 'passed'),
+                     key=lambda nodeid: coverage['tests'][nodeid].get('duration', 0.0))
+    reference_failures = sorted(nodeid for nodeid, outcome in outcomes.items() if outcome == 'failed')
+    if not passing:
+        raise RuntimeError('No test passes against the reference solution')
+    timeout = max(MUTATION_MIN_TIMEOUT, coverage['duration'] * MUTATION_TIMEOUT_FACTOR)
+    print(f"DEBUG: Mutation testing {module}: {len(mutants)} mutants, {len(passing)} passing tests, "
+          f"timeout {timeout:.1f}s, {workers} workers")
+
+    workdirs: 'queue.Queue[str]' = queue.Queue()
+    for i in range(max(1, min(workers, len(mutants)))):
+        workdirs.put(_prepare_workdir(reference_dir, tests_dir, f'mutation_{i}_', data_dir))
+
+    def work(mutant: Mutant) -> Mutant:
+        if cancel_event is not None and cancel_event.is_set():
+            raise ProcessCancelled('mutation run cancelled')
+        workdir = workdirs.get()
+        try:
+            return run_mutant(mutant, workdir, module, tests_for_mutant(mutant, coverage, passing),
+                              timeout, cancel_event, data_dir)
+        finally:
+            workdirs.put(workdir)
+
+    try:
+        with ThreadPoolExecutor(max_workers=workdirs.qsize() or 1) as pool:
+            list(pool.map(work, mutants))
+    finally:
+        while not workdirs.empty():
+            shutil.rmtree(workdirs.get(), ignore_errors=True)
+
+    return build_report(mutants, passing, reference_failures, time.perf_counter() - start, workers)
+
+
+def build_report(mutants: List[Mutant], passing: List[str], reference_failures: List[str],
+                 duration: float, workers: int) -> Dict[str, Any]:
+    counts = {status: 0 for status in (KILLED, TIMEOUT, SURVIVED, NO_COVERAGE, ERROR)}
+    killers: Dict[str, int] = {}
+    for mutant in mutants:
+        counts[mutant.status] += 1
+        if mutant.killed_by:
+            killers[mutant.killed_by] = killers.get(mutant.killed_by, 0) + 1
+    scored = len(mutants) - counts[ERROR]
+    detected = counts[KILLED] + counts[TIMEOUT]
+    return {
+        'mutants': len(mutants),
+        'counts': counts,
+        'mutationScore': round(detected / scored, 4) if scored else None,
+        'tests': len(passing),
+        'referenceFailures': reference_failures,
+        # Coverage-selected test runs vs. every test against every mutant
+        'selectedTestRuns': sum(mutant.tests_run for mutant in mutants),
+        'exhaustiveTestRuns': len(mutants) * len(passing),
+        'killedBy': dict(sorted(killers.items(), key=lambda item: -item[1])),
+        'survivors': [mutant.to_dict() for mutant in mutants if mutant.status in (SURVIVED, NO_COVERAGE)],
+        'duration': round(duration, 2),
+        'workers': workers
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Mutation testing of an assignment test suite')
+    parser.add_argument('task_dir', help='Task directory with tests/ (and reference/ unless --reference is given)')
+    parser.add_argument('--reference', help='Reference solution directory (default: TASK_DIR/reference)')
+    parser.add_argument('--module', default='solution.py', help='File to mutate, relative to the reference directory')
+    parser.add_argument('--workers', type=int, default=MUTATION_WORKERS, help='Mutants run in parallel')
+    parser.add_argument('--limit', type=int, default=MUTATION_MAX_MUTANTS, help='Maximum number of mutants')
+    parser.add_argument('--data', help='Task dataset directory (default: TASK_DIR/data if present)')
+    args = parser.parse_args(argv)
+
+    data_dir = args.data or os.path.join(args.task_dir, 'data')
+    report = run_mutation_testing(args.reference or os.path.join(args.task_dir, 'reference'),
+                                  os.path.join(args.task_dir, 'tests'), args.module, args.workers, args.limit,
+                                  data_dir=os.path.abspath(data_dir) if os.path.isdir(data_dir) else None)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
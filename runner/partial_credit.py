@@ -0,0 +1,104 @@
+"""
+Partial Credit
+Every pytest run loads the aca_pytest.progress plugin, which records each
+test's outcome the moment it finishes. When the run is cut short (time
+budget exceeded, interpreter crash, out-of-memory kill, output flood) the
+tests that finished keep their outcomes, the test that was running becomes
+TIMED_OUT (or 'error' when the run crashed) and the tests that never started
+become NOT_RUN. The score counts the passed tests out of all collected ones,
+so a slow last test no longer zeroes a submission.
+"""
+
+import json
+import os
+import signal
+from typing import Dict, List, Any, Optional
+
+from aca_pytest import plugin_options
+
+TIMED_OUT = 'timed-out'
+NOT_RUN = 'not-run'
+# Outcome of the test that was running when the run crashed (as for a broken fixture)
+CRASHED = 'error'
+
+
+def pytest_progress_options(output_path: str, env: Dict[str, str]) -> List[str]:
+    """Enable the plugin for a run; updates env in place and returns extra pytest args"""
+    if os.path.exists(output_path):
+        os.remove(output_path)  # left by an earlier tier
+    env['ACA_PROGRESS_OUTPUT'] = output_path
+    return plugin_options('progress', env)
+
+
+def read_progress(output_path: str) -> Optional[Dict[str, Any]]:
+    """
+    What the plugin recorded before the run stopped
+    Returns:
+        {'collected': node ids, 'tests': finished test records, 'running': node id or None};
+        None when the run never finished collecting
+    """
+    collected = None
+    finished = {}
+    running = None
+    try:
+        with open(output_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # the line being written when the process died
+                if 'collected' in entry:
+                    collected = entry['collected']
+                elif 'started' in entry:
+                    running = entry['started']
+                else:
+                    finished[entry['nodeid']] = entry
+                    running = None
+    except IOError:
+        return None
+    if collected is None:
+        return None
+    return {'collected': collected, 'tests': list(finished.values()), 'running': running}
+
+
+def complete_records(collected: List[str], finished: List[Dict[str, Any]], running: Optional[str],
+                     stopped_outcome: str, stopped_message: str) -> List[Dict[str, Any]]:
+    """Records for every collected test: finished ones as recorded, the running one stopped, the rest NOT_RUN"""
+    by_nodeid = {record['nodeid']: record for record in finished}
+    records = []
+    for nodeid in collected:
+        if nodeid in by_nodeid:
+            records.append(by_nodeid.pop(nodeid))
+        elif nodeid == running:
+            # No duration: the test never finished
+            records.append({'nodeid': nodeid, 'outcome': stopped_outcome, 'duration': None,
+                            'longrepr': stopped_message, 'interrupted': True})
+        else:
+            records.append({'nodeid': nodeid, 'outcome': NOT_RUN, 'duration': None, 'longrepr': ''})
+    # Tests the plugin saw but collection did not list (should not happen) still count
+    return records + list(by_nodeid.values())
+
+
+def crash_reason(returncode: Optional[int]) -> str:
+    """Why a run ended without its report, from its exit status"""
+    if returncode is not None and returncode < 0:
+        try:
+            name = signal.Signals(-returncode).name
+        except ValueError:
+            name = f"signal {-returncode}"
+        if -returncode == signal.SIGKILL:
+            return f"killed by {name} (out of memory?)"
+        return f"killed by {name}"
+    return f"exited with code {returncode} before writing its report"
+
+
+def partial_summary(records: List[Dict[str, Any]], stopped: str) -> Dict[str, Any]:
+    """The result's 'partial' block: how far the run got and why it stopped ('timeout', 'crash' or 'output')"""
+    not_run = len([record for record in records if record['outcome'] == NOT_RUN])
+    interrupted = [record['nodeid'] for record in records if record.get('interrupted')]
+    return {
+        'stopped': stopped,
+        'finished': len(records) - not_run - len(interrupted),
+        'interrupted': interrupted[0] if interrupted else None,
+        'notRun': not_run
+    }
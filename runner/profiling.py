@@ -0,0 +1,62 @@
+"""
+Opt-in Job Profiling
+Samples the /run handler thread and (through the aca_pytest.profile plugin)
+the pytest child, writing collapsed-stack files per job. Nothing is started
+unless a job asks for it or falls into the sampled fraction.
+"""
+
+import os
+import random
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+from aca_pytest import plugin_options
+from aca_pytest.sampling import StackSampler
+
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', 5))
+
+
+def should_profile(requested: Any) -> bool:
+    """Profile when the payload asks for it, or for a random PROFILE_SAMPLE_RATE share of jobs"""
+    if requested:
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def pytest_profile_options(output_path: str, env: Dict[str, str]) -> List[str]:
+    """Enable the pytest-side sampler; updates env in place and returns extra pytest args"""
+    env['ACA_PROFILE_OUTPUT'] = output_path
+    env['ACA_PROFILE_INTERVAL'] = str(PROFILE_INTERVAL_MS / 1000)
+    return plugin_options('profile', env)
+
+
+class JobProfile:
+    """Profile files of one job: runner.collapsed (handler) and pytest.collapsed (child)"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.runner_path = os.path.join(directory, 'runner.collapsed')
+        self.pytest_path = os.path.join(directory, 'pytest.collapsed')
+        self._sampler: Optional[StackSampler] = None
+        os.makedirs(directory, exist_ok=True)
+
+    def start(self) -> 'JobProfile':
+        self._sampler = StackSampler(PROFILE_INTERVAL_MS / 1000, thread_id=threading.get_ident()).start()
+        return self
+
+    def stop(self) -> Dict[str, Any]:
+        """Stop sampling the handler and write its profile"""
+        if self._sampler is None:
+            return {}
+        self._sampler.stop().write_collapsed(self.runner_path)
+        summary = {'samples': self._sampler.samples, 'elapsed': round(self._sampler.elapsed, 6)}
+        self._sampler = None
+        return summary
+
+
+def list_profiles(directory: str) -> List[Tuple[str, int]]:
+    """(file name, size) of the collapsed-stack files in a job's profile directory"""
+    if not os.path.isdir(directory):
+        return []
+    return [(name, os.path.getsize(os.path.join(directory, name)))
+            for name in sorted(os.listdir(directory)) if name.endswith('.collapsed')]
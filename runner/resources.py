@@ -0,0 +1,177 @@
+"""
+Resource Accounting
+What grading jobs actually consume: the child processes' CPU time, peak RSS,
+block I/O, context switches and CPU migrations (collected by run_captured), plus the job's
+wall time split by phase. Every result carries its job's numbers; a rolling
+window per assignment summarizes them for capacity planning and flags jobs
+far above the assignment's median.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Any, Optional
+
+from time_budget import percentile
+
+RESOURCE_WINDOW = int(os.getenv('RESOURCE_WINDOW', 500))
+# A job is an outlier when a metric exceeds this multiple of the assignment's median
+RESOURCE_OUTLIER_FACTOR = float(os.getenv('RESOURCE_OUTLIER_FACTOR', 3))
+# Samples needed before outliers are flagged at all
+MIN_OUTLIER_SAMPLES = 10
+OUTLIERS_KEPT = 20
+
+METRICS = ('wall', 'cpu', 'max_rss_kb', 'block_io')
+
+
+class PhaseTimer:
+    """Wall time per job phase; a phase entered more than once adds up"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+
+def job_resources(usage: Optional[Dict[str, Any]], timer: PhaseTimer,
+                  queued: Optional[float] = None, placement: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    The 'resources' block of a result
+    Args:
+        usage: Combined usage of the job's child processes (combine_usage), None if nothing ran
+        timer: The job's phase timer
+        queued: Seconds the job waited in the queue before it started
+        placement: The executor slot (and CPUs) the job ran on, when slots are pinned
+    """
+    resources = dict(usage or {})
+    resources['wall'] = round(timer.elapsed(), 4)
+    resources['phases'] = {name: round(seconds, 4) for name, seconds in timer.phases.items()}
+    if queued is not None:
+        resources['queued'] = round(queued, 4)
+    if placement and placement.get('cpus'):
+        resources['placement'] = placement
+    return resources
+
+
+def share_usage(usage: Optional[Dict[str, Any]], fraction: float) -> Optional[Dict[str, Any]]:
+    """One job's part of a process shared by several jobs: counters scaled, peak RSS kept"""
+    if not usage:
+        return usage
+    return {key: value if key == 'max_rss_kb' else
+            (round(value * fraction, 4) if isinstance(value, float) else int(value * fraction))
+            for key, value in usage.items()}
+
+
+def sample_metrics(resources: Dict[str, Any]) -> Dict[str, float]:
+    """The summarized metrics of one job"""
+    return {
+        'wall': resources.get('wall', 0.0),
+        'cpu': round(resources.get('cpu_user', 0.0) + resources.get('cpu_system', 0.0), 4),
+        'max_rss_kb': resources.get('max_rss_kb', 0),
+        'block_io': resources.get('block_in', 0) + resources.get('block_out', 0)
+    }
+
+
+def distribution(values: List[float]) -> Dict[str, float]:
+    return {
+        'p50': percentile(values, 0.5),
+        'p95': percentile(values, 0.95),
+        'max': max(values),
+        'mean': round(sum(values) / len(values), 4)
+    }
+
+
+class ResourceSummary:
+    """Per-assignment windows of job resource samples, persisted as one JSON file"""
+
+    def __init__(self, path: str, window: int = RESOURCE_WINDOW):
+        self.path = path
+        self.window = window
+        self._lock = threading.Lock()
+        self._assignments: Dict[str, Dict[str, Any]] = {}
+        self._load()
+
+    def record(self, assignment_id: Any, submission_id: Any, resources: Dict[str, Any]) -> List[str]:
+        """
+        Add a finished job to its assignment's window
+        Returns:
+            The metrics on which the job is an outlier (compared with the window before it)
+        """
+        sample = dict(sample_metrics(resources), submissionId=submission_id, at=time.time(),
+                      phases=resources.get('phases', {}))
+        with self._lock:
+            entry = self._assignments.setdefault(str(assignment_id), {'jobs': 0, 'samples': [], 'outliers': []})
+            outlying = []
+            if len(entry['samples']) >= MIN_OUTLIER_SAMPLES:
+                for metric in METRICS:
+                    median = percentile([s[metric] for s in entry['samples']], 0.5)
+                    if median > 0 and sample[metric] > median * RESOURCE_OUTLIER_FACTOR:
+                        outlying.append(metric)
+            if outlying:
+                entry['outliers'] = (entry['outliers'] + [dict(sample, metrics=outlying)])[-OUTLIERS_KEPT:]
+            entry['samples'] = (entry['samples'] + [sample])[-self.window:]
+            entry['jobs'] += 1
+            self._save()
+        return outlying
+
+    def summary(self, assignment_id: Any) -> Optional[Dict[str, Any]]:
+        """Distributions (p50/p95/max/mean) of the window's metrics and phase times, plus recent outliers"""
+        with self._lock:
+            entry = self._assignments.get(str(assignment_id))
+            if not entry or not entry['samples']:
+                return None
+            samples = list(entry['samples'])
+            outliers = list(entry['outliers'])
+            jobs = entry['jobs']
+
+        phases: Dict[str, List[float]] = {}
+        for sample in samples:
+            for name, seconds in sample.get('phases', {}).items():
+                phases.setdefault(name, []).append(seconds)
+        return {
+            'assignmentId': assignment_id,
+            'jobs': jobs,
+            'samples': len(samples),
+            'metrics': {metric: distribution([s[metric] for s in samples]) for metric in METRICS},
+            'phases': {name: distribution(values) for name, values in phases.items()},
+            'outlierFactor': RESOURCE_OUTLIER_FACTOR,
+            'outliers': outliers
+        }
+
+    def overview(self) -> Dict[str, Any]:
+        """p95 of every metric per assignment"""
+        with self._lock:
+            windows = {key: list(entry['samples']) for key, entry in self._assignments.items() if entry['samples']}
+        return {
+            key: dict({f'{metric}_p95': percentile([s[metric] for s in samples], 0.95) for metric in METRICS},
+                      samples=len(samples))
+            for key, samples in windows.items()
+        }
+
+    def _save(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._assignments, f, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._assignments = json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            print(f"ERROR: Could not load resource summary {self.path}: {e}")
+            self._assignments = {}
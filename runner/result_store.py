@@ -0,0 +1,272 @@
+"""
+Per-Test Result Store
+Append-only, compressed, segment-based log of every grading run with
+in-memory indexes by submission, assignment, user and test node id
+
+Layout under the store directory:
+    segments/seg-000001.log   length-prefixed zlib-compressed JSON records
+    index.jsonl               one line per record: location + index keys
+Sealed segments are never rewritten; a crash can at most leave records
+without their index lines at the end of the last indexed segment or in
+segments rolled over to after it, and these are recovered on load.
+"""
+
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import Dict, List, Any, Optional, Iterator
+
+SEGMENT_MAX_BYTES = int(os.getenv('RESULT_SEGMENT_MAX_BYTES', 4 * 1024 * 1024))
+MESSAGE_MAX_CHARS = 2000
+PASSING_OUTCOMES = ('passed', 'skipped')
+
+_HEADER = struct.Struct('<I')
+
+
+class ResultStore:
+    """Stores grading runs and answers per-test history queries from indexes"""
+
+    def __init__(self, directory: str, segment_max_bytes: int = SEGMENT_MAX_BYTES):
+        self.directory = directory
+        self.segments_dir = os.path.join(directory, 'segments')
+        self.index_path = os.path.join(directory, 'index.jsonl')
+        self.segment_max_bytes = segment_max_bytes
+        self._lock = threading.Lock()
+        self._entries: List[Dict[str, Any]] = []
+        self._by_submission: Dict[str, List[int]] = {}
+        self._by_assignment: Dict[str, List[int]] = {}
+        self._by_user: Dict[str, List[int]] = {}
+        self._by_test: Dict[str, List[int]] = {}
+        self._active_segment = 1
+        os.makedirs(self.segments_dir, exist_ok=True)
+        self._load()
+
+    # ----- writing -----
+
+    def append(self, run: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Persist one grading run
+        Args:
+            run: Dict with submissionId, assignmentId, userId, status, score and a
+                 'tests' list of {nodeid, outcome, duration, message}
+        Returns:
+            The index entry of the stored record
+        """
+        run = dict(run)
+        run.setdefault('timestamp', time.time())
+        run['tests'] = [dict(test) for test in run.get('tests', [])]
+        for test in run['tests']:
+            for key in ('message', 'longrepr'):
+                if test.get(key) and len(test[key]) > MESSAGE_MAX_CHARS:
+                    test[key] = test[key][:MESSAGE_MAX_CHARS] + '...'
+        payload = zlib.compress(json.dumps(run, separators=(',', ':')).encode('utf-8'))
+
+        with self._lock:
+            path = self._segment_path(self._active_segment)
+            if os.path.exists(path) and os.path.getsize(path) + len(payload) > self.segment_max_bytes:
+                self._active_segment += 1
+                path = self._segment_path(self._active_segment)
+
+            with open(path, 'ab') as f:
+                offset = f.tell()
+                f.write(_HEADER.pack(len(payload)) + payload)
+                f.flush()
+                os.fsync(f.fileno())
+
+            entry = self._entry_for(run, self._active_segment, offset)
+            with open(self.index_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, separators=(',', ':')) + '\n')
+            self._add_entry(entry)
+        return entry
+
+    # ----- queries -----
+
+    def submission_runs(self, submission_id: Any) -> List[Dict[str, Any]]:
+        """All stored runs of a submission (oldest first)"""
+        return self._read_many(self._lookup(self._by_submission, submission_id))
+
+    def user_runs(self, user_id: Any, assignment_id: Any = None) -> List[Dict[str, Any]]:
+        """All runs of a user, optionally for one assignment"""
+        positions = self._lookup(self._by_user, user_id)
+        if assignment_id is not None:
+            positions = [p for p in positions if self._entries[p]['assignment'] == str(assignment_id)]
+        return self._read_many(positions)
+
+    def test_history(self, nodeid: str, assignment_id: Any = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """Outcomes of one test across runs, newest first"""
+        positions = self._lookup(self._by_test, nodeid)
+        if assignment_id is not None:
+            positions = [p for p in positions if self._entries[p]['assignment'] == str(assignment_id)]
+        history = []
+        for run in self._read_many(list(reversed(positions))[:limit]):
+            for test in run.get('tests', []):
+                if test.get('nodeid') == nodeid:
+                    history.append(self._test_view(run, test))
+        return history
+
+    def failures(self, assignment_id: Any, nodeid: Optional[str] = None, limit: int = 500) -> List[Dict[str, Any]]:
+        """Failed tests of an assignment, newest first; only runs with failures are read"""
+        with self._lock:
+            positions = [
+                p for p in reversed(self._by_assignment.get(str(assignment_id), []))
+                if any(outcome not in PASSING_OUTCOMES and (nodeid is None or test == nodeid)
+                       for test, outcome in self._entries[p]['tests'].items())
+            ]
+        failures = []
+        for run in self._read_many(positions):
+            for test in run.get('tests', []):
+                if test.get('outcome') in PASSING_OUTCOMES or (nodeid is not None and test.get('nodeid') != nodeid):
+                    continue
+                failures.append(self._test_view(run, test))
+                if len(failures) >= limit:
+                    return failures
+        return failures
+
+    def last_failed_tests(self, user_id: Any, assignment_id: Any) -> List[str]:
+        """Node ids that failed in a user's most recent run of an assignment (index only)"""
+        with self._lock:
+            for position in reversed(self._by_user.get(str(user_id), [])):
+                entry = self._entries[position]
+                if entry['assignment'] == str(assignment_id) and entry['tests']:
+                    return [test for test, outcome in entry['tests'].items() if outcome not in PASSING_OUTCOMES]
+        return []
+
+    def iter_runs(self) -> Iterator[Dict[str, Any]]:
+        """Every stored run, oldest first (segments are read sequentially)"""
+        with self._lock:
+            entries = list(self._entries)
+        for entry in entries:
+            yield self._read(entry['seg'], entry['off'])
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'records': len(self._entries),
+                'segments': self._active_segment,
+                'submissions': len(self._by_submission),
+                'assignments': len(self._by_assignment),
+                'users': len(self._by_user),
+                'tests': len(self._by_test)
+            }
+
+    # ----- internals -----
+
+    def _segment_path(self, number: int) -> str:
+        return os.path.join(self.segments_dir, f'seg-{number:06d}.log')
+
+    def _entry_for(self, run: Dict[str, Any], segment: int, offset: int) -> Dict[str, Any]:
+        return {
+            'seg': segment,
+            'off': offset,
+            'submission': str(run.get('submissionId')),
+            'assignment': str(run.get('assignmentId')),
+            'user': str(run.get('userId')),
+            'ts': run['timestamp'],
+            # Outcomes live in the index so failure queries can skip passing runs
+            'tests': {t['nodeid']: t.get('outcome') for t in run.get('tests', []) if t.get('nodeid')}
+        }
+
+    def _add_entry(self, entry: Dict[str, Any]):
+        position = len(self._entries)
+        self._entries.append(entry)
+        self._by_submission.setdefault(entry['submission'], []).append(position)
+        self._by_assignment.setdefault(entry['assignment'], []).append(position)
+        self._by_user.setdefault(entry['user'], []).append(position)
+        for nodeid in entry['tests']:
+            self._by_test.setdefault(nodeid, []).append(position)
+        self._active_segment = max(self._active_segment, entry['seg'])
+
+    def _lookup(self, index: Dict[str, List[int]], key: Any) -> List[int]:
+        with self._lock:
+            return list(index.get(str(key), []))
+
+    def _read_many(self, positions: List[int]) -> List[Dict[str, Any]]:
+        with self._lock:
+            entries = [self._entries[p] for p in positions]
+        return [self._read(entry['seg'], entry['off']) for entry in entries]
+
+    def _read(self, segment: int, offset: int) -> Dict[str, Any]:
+        with open(self._segment_path(segment), 'rb') as f:
+            f.seek(offset)
+            (length,) = _HEADER.unpack(f.read(_HEADER.size))
+            return json.loads(zlib.decompress(f.read(length)).decode('utf-8'))
+
+    def _test_view(self, run: Dict[str, Any], test: Dict[str, Any]) -> Dict[str, Any]:
+        view = {
+            'submissionId': run.get('submissionId'),
+            'assignmentId': run.get('assignmentId'),
+            'userId': run.get('userId'),
+            'timestamp': run.get('timestamp')
+        }
+        view.update(test)
+        return view
+
+    def _load(self):
+        """Rebuild the in-memory indexes and recover records missing from the index"""
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                content = f.read()
+            for line in content.splitlines():
+                try:
+                    self._add_entry(json.loads(line))
+                except (json.JSONDecodeError, KeyError):
+                    continue  # torn last line
+            if content and not content.endswith('\n'):
+                with open(self.index_path, 'a', encoding='utf-8') as f:
+                    f.write('\n')
+
+        # Records written before a crash follow the last indexed one: at the end of its
+        # segment, or in segments rolled over to after it before their index lines were written
+        last_indexed = self._active_segment
+        for segment in self._segments_on_disk():
+            if segment >= last_indexed:
+                self._recover_segment(segment)
+
+    def _segments_on_disk(self) -> List[int]:
+        numbers = []
+        for name in os.listdir(self.segments_dir):
+            number = name[len('seg-'):-len('.log')]
+            if name.startswith('seg-') and name.endswith('.log') and number.isdigit():
+                numbers.append(int(number))
+        return sorted(numbers)
+
+    def _recover_segment(self, segment: int):
+        """Index the records of a segment that follow its last indexed one"""
+        path = self._segment_path(segment)
+        self._active_segment = max(self._active_segment, segment)
+        indexed = {e['off'] for e in self._entries if e['seg'] == segment}
+        offset = max(indexed) if indexed else 0
+        recovered = []
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            while True:
+                header = f.read(_HEADER.size)
+                if len(header) < _HEADER.size:
+                    break
+                (length,) = _HEADER.unpack(header)
+                payload = f.read(length)
+                if len(payload) < length:
+                    break
+                if offset not in indexed:
+                    try:
+                        run = json.loads(zlib.decompress(payload).decode('utf-8'))
+                        recovered.append(self._entry_for(run, segment, offset))
+                    except (zlib.error, json.JSONDecodeError):
+                        break
+                offset += _HEADER.size + length
+            valid_end = offset
+
+        if os.path.getsize(path) > valid_end:
+            # Drop a partially written record so new appends stay aligned
+            with open(path, 'r+b') as f:
+                f.truncate(valid_end)
+
+        if recovered:
+            print(f"DEBUG: Result store recovered {len(recovered)} unindexed record(s) from segment {segment}")
+            with open(self.index_path, 'a', encoding='utf-8') as f:
+                for entry in recovered:
+                    f.write(json.dumps(entry, separators=(',', ':')) + '\n')
+                    self._add_entry(entry)
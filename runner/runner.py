@@ -1,12 +1,46 @@
-from flask import Flask, request, jsonify
+import sys
+
+if __name__ == '__main__' and sys.argv[1:2] == ['grade']:
+    # Offline bulk grading (python -m runner grade ...) needs none of the service below
+    import grade
+    sys.exit(grade.main(sys.argv[2:]))
+
+from flask import Flask, request, jsonify, send_from_directory
+import atexit
 import os
 import zipfile
 import tempfile
-import subprocess
 import json
 import shutil
+import threading
+import time
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from language_plugins import plugin_manager
+from language_plugins.output_capture import ProcessCancelled
+import similarity
+from result_store import ResultStore
+from analytics import Analytics
+import profiling
+import tracing
+import time_budget
+import mutation
+import differential
+import complexity
+import cpu_topology
+import allocations
+import datasets
+from batching import SubmissionBatch, batch_safe
+from time_budget import TimeBudgets
+from resources import PhaseTimer, ResourceSummary, job_resources
+from concurrency import ConcurrencyTuner
+from executor import Job, JobExecutor
+from werkzeug.utils import secure_filename
+from grading import (PROJECT_ROOT, RESULTS_DIR, CUSTOM_TASKS_DIR, DATASETS_DIR, ANALYSIS_WORKERS, run_pytest,
+                     run_pytest_batch, run_plugin_tests, copy_tests, extract_submission, zip_import_blocker,
+                     task_dir_for, load_task_metadata, list_test_functions, count_test_functions,
+                     analysis_settings, collect_analysis, merge_tier_results, run_precheck,
+                     precheck_feedback)
 
 app = Flask(__name__)
 
@@ -14,239 +48,169 @@ PORT = int(os.getenv('PORT', 5001))
 BACKEND_URL = os.getenv('BACKEND_URL', 'http://localhost:3000/api')
 print(f"DEBUG: Runner started with BACKEND_URL={BACKEND_URL}, PORT={PORT}")
 
-# Get absolute paths relative to this file
-RUNNER_DIR = os.path.dirname(os.path.abspath(__file__))
-PROJECT_ROOT = os.path.dirname(RUNNER_DIR)
-SUBMISSIONS_DIR = os.path.join(PROJECT_ROOT, 'backend', 'src', 'data', 'submissions')
-RESULTS_DIR = os.path.join(PROJECT_ROOT, 'backend', 'src', 'data', 'results')
-TASKS_DIR = os.path.join(PROJECT_ROOT, 'tasks')
-CUSTOM_TASKS_DIR = os.path.join(PROJECT_ROOT, 'backend', 'src', 'data', 'tests')
+SUBMISSIONS_DIR = os.getenv('SUBMISSIONS_DIR', os.path.join(PROJECT_ROOT, 'backend', 'src', 'data', 'submissions'))
 os.makedirs(CUSTOM_TASKS_DIR, exist_ok=True)
 
 os.makedirs(RESULTS_DIR, exist_ok=True)
+PROFILES_DIR = os.path.join(RESULTS_DIR, 'profiles')
+MUTATION_DIR = os.path.join(RESULTS_DIR, 'mutation')
+tracer = tracing.tracer_from_env(os.path.join(RESULTS_DIR, 'traces.jsonl'))
+time_budgets = TimeBudgets(os.path.join(RESULTS_DIR, 'time_budgets.json'))
+resource_summary = ResourceSummary(os.path.join(RESULTS_DIR, 'resources.json'))
 
-def run_pytest(workdir, test_dir):
-    """Run pytest and return results"""
-    report_path = os.path.join(workdir, 'report.json')
-    
-    # Ensure test_dir exists and has test files
-    if not os.path.exists(test_dir):
-        return {
-            'success': False,
-            'total_tests': 0,
-            'passed_tests': 0,
-            'failed_tests': 0,
-            'score': 0.0,
-            'feedback': f'Test directory not found: {test_dir}',
-            'pytest_executed': False  # Pytest won't execute
-        }
-    
-    test_files = [f for f in os.listdir(test_dir) if f.startswith('test_') and f.endswith('.py')]
-    if not test_files:
-        return {
-            'success': False,
-            'total_tests': 0,
-            'passed_tests': 0,
-            'failed_tests': 0,
-            'score': 0.0,
-            'feedback': f'No test files found in {test_dir}',
-            'pytest_executed': False  # Pytest won't execute (no test files)
-        }
-    
-    print(f"DEBUG: Running pytest with {len(test_files)} test files in {test_dir}")
-    
-    cmd = [
-        'python', '-m', 'pytest',
-        '-q',
-        '--disable-warnings',
-        '--json-report',
-        f'--json-report-file={report_path}',
-        test_dir
-    ]
-    
-    print(f"DEBUG: Pytest command: {' '.join(cmd)}")
-    
+result_store = ResultStore(os.path.join(RESULTS_DIR, 'store'))
+analytics = Analytics(os.path.join(RESULTS_DIR, 'analytics.json'))
+atexit.register(analytics.flush)
+dataset_store = datasets.DatasetStore(DATASETS_DIR)
+if not analytics.loaded_from_snapshot and result_store.stats()['records']:
+    print("DEBUG: Rebuilding analytics aggregates from the result store")
+    analytics.rebuild(result_store.iter_runs())
+
+# How long DELETE /jobs/<id> waits for a running job to wind down
+CANCEL_WAIT_SECONDS = 5
+
+# Pinned slots (CPU_PINNING): threads not owned by a slot stay off the slots' isolated cores
+topology = cpu_topology.CpuTopology.from_env()
+if topology:
+    cpu_topology.pin(topology.shared_cpus)
+    print(f"DEBUG: CPU topology: {topology.to_dict()}")
+analysis_pool = ThreadPoolExecutor(max_workers=ANALYSIS_WORKERS, thread_name_prefix='analysis',
+                                   initializer=cpu_topology.pin, initargs=(topology and topology.shared_cpus,))
+# Assignment id -> job class (cpu_topology.TIMING or None), learned from task.json as jobs run
+job_classes = {}
+
+def store_run(submission_id, assignment_id, user_id, language, status, test_result, extra=None):
+    """Append a run's per-test records to the result store and analytics (never fails the job)"""
+    run_record = {
+        'submissionId': submission_id,
+        'assignmentId': assignment_id,
+        'userId': user_id,
+        'language': language,
+        'status': status,
+        'score': test_result.get('score', 0.0),
+        'totalTests': test_result.get('total_tests', 0),
+        'passedTests': test_result.get('passed_tests', 0),
+        'feedback': test_result.get('feedback', ''),
+        'timeBudget': (test_result.get('time_budget') or {}).get('timeout'),
+        'resources': test_result.get('resources'),
+        'tests': [
+            {k: v for k, v in record.items() if k != 'longrepr' or record.get('outcome') != 'passed'}
+            for record in test_result.get('tests', [])
+        ]
+    }
+    run_record.update(extra or {})
     try:
-        result = subprocess.run(
-            cmd,
-            cwd=workdir,
-            capture_output=True,
-            text=True,
-            timeout=60
-        )
-        
-        print(f"DEBUG: Pytest return code: {result.returncode}")
-        print(f"DEBUG: Pytest stdout (first 1000 chars): {result.stdout[:1000] if result.stdout else 'None'}")
-        print(f"DEBUG: Pytest stderr (first 500 chars): {result.stderr[:500] if result.stderr else 'None'}")
-        
-        # Parse results
-        total_tests = 0
-        passed_tests = 0
-        failed_tests = 0
-        feedback = ""
-        pytest_executed = True  # pytest was executed (even if with errors)
-        
-        if os.path.exists(report_path):
+        result_store.append(run_record)
+    except Exception as e:
+        print(f"ERROR: Failed to store results for submission {submission_id}: {e}")
+    try:
+        analytics.record(run_record)
+    except Exception as e:
+        print(f"ERROR: Failed to update analytics for submission {submission_id}: {e}")
+
+def calibrate_time_budget(assignment_id, language, task_dir, tests_dir, fingerprint, task_metadata):
+    """Seed an assignment's time budget by running its reference solution (once per test version)"""
+    reference = time_budget.reference_dir(task_dir)
+    if not reference or not time_budgets.needs_calibration(assignment_id, fingerprint):
+        return
+    with time_budgets.calibration_lock(assignment_id):
+        if not time_budgets.needs_calibration(assignment_id, fingerprint):
+            return  # another job calibrated while we waited
+        limit = time_budget.budget_config(task_metadata)['max']
+        data_dir = dataset_store.publish(task_dir, task_metadata)
+        durations = []
+        for _ in range(time_budget.CALIBRATION_RUNS):
+            workdir = tempfile.mkdtemp(prefix=f"calibrate_{assignment_id}_")
             try:
-                with open(report_path, 'r') as f:
-                    report = json.load(f)
-                
-                print(f"DEBUG: Full JSON report structure: {json.dumps(report, indent=2)[:2000]}")
-                
-                # CRITICAL FIX: Count from tests array FIRST - this is most reliable
-                # The tests array always exists and has the actual test results
-                tests_list = report.get('tests', [])
-                if tests_list:
-                    # Count directly from tests array - most reliable method
-                    total_tests = len(tests_list)
-                    passed_tests = len([t for t in tests_list if t.get('outcome') == 'passed'])
-                    failed_tests = len([t for t in tests_list if t.get('outcome') == 'failed'])
-                    skipped_tests = len([t for t in tests_list if t.get('outcome') == 'skipped'])
-                    print(f"DEBUG: COUNTED FROM TESTS ARRAY: total={total_tests}, passed={passed_tests}, failed={failed_tests}, skipped={skipped_tests}")
-                    
-                    # Log each test for debugging
-                    for i, test in enumerate(tests_list):
-                        nodeid = test.get('nodeid', 'unknown')
-                        outcome = test.get('outcome', 'unknown')
-                        print(f"DEBUG: Test {i+1}: {nodeid} - outcome: {outcome}")
+                shutil.copytree(reference, workdir, dirs_exist_ok=True)
+                workdir_tests = os.path.join(workdir, 'tests')
+                copy_tests(tests_dir, workdir_tests)
+                if data_dir:
+                    datasets.expose(data_dir, workdir)
+                if language == 'python':
+                    result = run_pytest(workdir, workdir_tests, timeout=limit, data_dir=data_dir)
                 else:
-                    # Fallback to summary if tests array is empty
-                    summary = report.get('summary', {})
-                    
-                    # Try different possible structures for pytest-json-report
-                    # Structure 1: report.summary.total, report.summary.passed, etc.
-                    total_tests = summary.get('total', 0)
-                    passed_tests = summary.get('passed', 0)
-                    failed_tests = summary.get('failed', 0)
-                    
-                    # Structure 2: Maybe summary is directly the numbers?
-                    if total_tests == 0 and isinstance(summary, dict):
-                        # Try alternative keys
-                        total_tests = summary.get('total_tests', summary.get('count', 0))
-                        passed_tests = summary.get('passed_tests', summary.get('passed_count', 0))
-                        failed_tests = summary.get('failed_tests', summary.get('failed_count', 0))
-                    
-                    # Structure 3: Maybe the structure is different?
-                    if total_tests == 0:
-                        # Try report-level keys
-                        total_tests = report.get('total', report.get('total_tests', 0))
-                        passed_tests = report.get('passed', report.get('passed_tests', 0))
-                        failed_tests = report.get('failed', report.get('failed_tests', 0))
-                    
-                    print(f"DEBUG: Counted from summary: total={total_tests}, passed={passed_tests}, failed={failed_tests}")
-                
-                # LAST RESORT: Parse from pytest output if JSON report is empty or tests array was empty
-                if total_tests == 0 and result.stdout:
-                    # Try to parse from stdout: "X passed" or "X failed" or "X passed, Y failed"
-                    import re
-                    passed_match = re.search(r'(\d+)\s+passed', result.stdout)
-                    failed_match = re.search(r'(\d+)\s+failed', result.stdout)
-                    if passed_match or failed_match:
-                        passed_tests = int(passed_match.group(1)) if passed_match else 0
-                        failed_tests = int(failed_match.group(1)) if failed_match else 0
-                        total_tests = passed_tests + failed_tests
-                        print(f"DEBUG: Parsed from stdout: total={total_tests}, passed={passed_tests}, failed={failed_tests}")
-                
-                # Log final counts
-                print(f"DEBUG: ===== FINAL TEST COUNTS =====")
-                print(f"DEBUG: total_tests: {total_tests}")
-                print(f"DEBUG: passed_tests: {passed_tests}")
-                print(f"DEBUG: failed_tests: {failed_tests}")
-                if 'tests' in report and report.get('tests'):
-                    test_outcomes = {}
-                    for test in report.get('tests', []):
-                        outcome = test.get('outcome', 'unknown')
-                        test_outcomes[outcome] = test_outcomes.get(outcome, 0) + 1
-                    print(f"DEBUG: Test outcomes breakdown: {test_outcomes}")
-                
-                # Generate feedback from failed tests
-                tests = report.get('tests', [])
-                failed_tests_list = [t for t in tests if t.get('outcome') == 'failed']
-                
-                if failed_tests_list:
-                    feedback_parts = ["Failed tests:"]
-                    for test in failed_tests_list[:3]:  # Limit to first 3 failures
-                        nodeid = test.get('nodeid', 'Unknown test')
-                        longrepr = test.get('call', {}).get('longrepr', '')
-                        if longrepr:
-                            lines = longrepr.split('\n')
-                            error_line = next((line for line in lines if 'AssertionError' in line), lines[0] if lines else '')
-                            feedback_parts.append(f"  • {nodeid}: {error_line}")
-                    feedback = '\n'.join(feedback_parts)
-                elif total_tests > 0:
-                    feedback = f"All {passed_tests} tests passed!"
-                else:
-                    feedback = "Tests executed but no test results found in report"
-                    
-            except (json.JSONDecodeError, IOError) as e:
-                feedback = f"Failed to parse test results: {str(e)}"
-                print(f"DEBUG: JSON parse error: {e}")
-        else:
-            # Pytest was executed but no report.json was generated
-            # This could mean pytest-json-report is not installed or there was an issue
-            feedback = result.stderr or result.stdout or "Test execution completed but no report generated"
-            print(f"DEBUG: No report.json found. Pytest returncode: {result.returncode}")
-            print(f"DEBUG: Pytest stdout: {result.stdout[:500] if result.stdout else 'None'}")
-            print(f"DEBUG: Pytest stderr: {result.stderr[:500] if result.stderr else 'None'}")
-        
-        # Calculate score - ensure it's a float between 0 and 1
-        # CRITICAL: Only calculate if we have tests
-        if total_tests > 0:
-            score = float(passed_tests) / float(total_tests)
-            print(f"DEBUG: Score calculation: {passed_tests} / {total_tests} = {score}")
-        else:
-            score = 0.0
-            print(f"ERROR: total_tests is 0! Cannot calculate score. Setting to 0.0")
-            print(f"ERROR: This means no tests were found or counted!")
-        
-        # Ensure score is between 0 and 1
-        score = max(0.0, min(1.0, score))
-        
-        print(f"DEBUG: ===== FINAL SCORE =====")
-        print(f"DEBUG: Score: {score} ({score * 100}%)")
-        print(f"DEBUG: passed_tests: {passed_tests}")
-        print(f"DEBUG: total_tests: {total_tests}")
-        print(f"DEBUG: =======================")
-        
-        return {
-            'success': result.returncode == 0,
-            'total_tests': total_tests,
-            'passed_tests': passed_tests,
-            'failed_tests': failed_tests,
-            'score': score,
-            'feedback': feedback,
-            'pytest_executed': pytest_executed  # Track if pytest was actually executed
-        }
-        
-    except subprocess.TimeoutExpired:
-        # Pytest started but timed out - still counts as executed
-        return {
-            'success': False,
-            'total_tests': 0,
-            'passed_tests': 0,
-            'failed_tests': 0,
-            'score': 0.0,
-            'feedback': 'Test execution timed out after 60 seconds',
-            'pytest_executed': True  # Pytest was executed but timed out
-        }
+                    result = run_plugin_tests(language, workdir, os.listdir(reference), workdir_tests, limit)
+            finally:
+                shutil.rmtree(workdir, ignore_errors=True)
+            if result.get('timed_out') or result.get('duration') is None:
+                print(f"ERROR: Reference solution of assignment {assignment_id} did not finish within {limit}s")
+                return
+            durations.append(result['duration'])
+        time_budgets.calibrate(assignment_id, fingerprint, durations)
+        print(f"DEBUG: Calibrated time budget for assignment {assignment_id}: {durations}")
+
+def smoke_selection(task_metadata, tests_dir, user_id, assignment_id):
+    """
+    Node ids (relative to the job workdir) of the smoke tier: the tests tagged in
+    task.json plus, for resubmissions, the tests that failed in the user's last run
+    """
+    config = task_metadata.get('smoke') or {}
+    tagged = config.get('tests') or []
+    if not tagged:
+        return []
+    selection = [f"tests/{test_id}" for test_id in tagged]
+    if config.get('previousFailures', True) and user_id is not None:
+        selection += result_store.last_failed_tests(user_id, assignment_id)
+    # Renamed or removed tests would make pytest reject the whole selection
+    known = set(list_test_functions(tests_dir))
+    known.update(test_id.split('::')[0] for test_id in list(known))
+    return [nodeid for nodeid in dict.fromkeys(selection)
+            if nodeid.startswith('tests/') and nodeid[len('tests/'):].split('[')[0] in known]
+
+def queued_seconds(job):
+    """How long a job waited in the queue before a worker picked it up"""
+    return job.started_at - job.enqueued_at if job.started_at else None
+
+def record_resources(job, resources):
+    """Add a job's resource usage to its assignment's rolling summary (never fails the job)"""
+    try:
+        outlying = resource_summary.record(job.assignment_id, job.submission_id, resources)
     except Exception as e:
-        # Other exceptions mean pytest didn't execute
-        return {
-            'success': False,
-            'total_tests': 0,
-            'passed_tests': 0,
-            'failed_tests': 0,
-            'score': 0.0,
-            'feedback': f'Test execution failed: {str(e)}',
-            'pytest_executed': False  # Pytest didn't execute
-        }
+        print(f"ERROR: Failed to record resources for submission {job.submission_id}: {e}")
+        return
+    if outlying:
+        print(f"DEBUG: Submission {job.submission_id} is a resource outlier for assignment {job.assignment_id}: {outlying} {resources}")
+
+def send_callback(callback_data, trace_parent=None):
+    """POST a result to the backend's runner callback (in a 'callback' span under trace_parent)"""
+    print(f"DEBUG: Sending callback to backend: {BACKEND_URL}/runner/callback")
+    print(f"DEBUG: Callback data: {callback_data}")
+    span = tracer.start_span('runner.callback', trace_parent, status=callback_data.get('status', ''))
+    headers = {'Content-Type': 'application/json', 'traceparent': span.traceparent}
+    callback_data = dict(callback_data, traceId=span.context.trace_id)
+    try:
+        callback_response = requests.post(
+            f"{BACKEND_URL}/runner/callback", 
+            json=callback_data, 
+            timeout=30,
+            headers=headers
+        )
+        span.set(http_status=callback_response.status_code)
+        print(f"DEBUG: Callback response status: {callback_response.status_code}")
+        print(f"DEBUG: Callback response body: {callback_response.text}")
+        if callback_response.status_code != 200:
+            print(f"ERROR: Callback failed with status {callback_response.status_code}")
+            print(f"ERROR: Response: {callback_response.text}")
+    except requests.exceptions.Timeout as e:
+        print(f"ERROR: Callback timeout after 30 seconds: {e}")
+    except requests.exceptions.ConnectionError as e:
+        print(f"ERROR: Could not connect to backend at {BACKEND_URL}: {e}")
+    except Exception as e:
+        print(f"ERROR: Failed to send callback: {type(e).__name__}: {e}")
+        import traceback
+        print(f"ERROR: Traceback: {traceback.format_exc()}")
+        span.error = f"{type(e).__name__}: {e}"
+    finally:
+        span.end()
 
 print("DEBUG: About to register /health route")  # Debug before route
 @app.route('/health', methods=['GET'])
 def health():
     return jsonify({
         "ok": True,
-        "supported_languages": plugin_manager.get_supported_languages()
+        "supported_languages": plugin_manager.get_supported_languages(),
+        "jobs": dict(executor.stats(), concurrency=concurrency_tuner.metrics())
     })
 
 @app.route('/languages', methods=['GET'])
@@ -261,13 +225,178 @@ def get_languages():
         "languages_info": languages_info
     })
 
+@app.route('/similarity/<int:assignment_id>', methods=['GET'])
+def similarity_clusters(assignment_id):
+    """Clusters of near-duplicate submissions for an assignment"""
+    threshold = request.args.get('threshold', similarity.SIMILARITY_THRESHOLD, type=float)
+    index = similarity.get_index(assignment_id)
+    return jsonify({
+        'assignmentId': assignment_id,
+        'threshold': threshold,
+        'indexedSubmissions': len(index.signatures),
+        'clusters': index.clusters(threshold)
+    })
+
+@app.route('/similarity/<int:assignment_id>/<submission_id>', methods=['GET'])
+def similarity_candidates(assignment_id, submission_id):
+    """Near-duplicates of a single submission"""
+    threshold = request.args.get('threshold', similarity.SIMILARITY_THRESHOLD, type=float)
+    index = similarity.get_index(assignment_id)
+    if submission_id not in index:
+        return jsonify({'error': 'submission not indexed'}), 404
+    return jsonify({
+        'assignmentId': assignment_id,
+        'submissionId': submission_id,
+        'threshold': threshold,
+        'candidates': index.candidates(submission_id, threshold)
+    })
+
+@app.route('/results/submissions/<submission_id>', methods=['GET'])
+def results_for_submission(submission_id):
+    """Stored runs (with per-test records) of a submission"""
+    return jsonify({'submissionId': submission_id, 'runs': result_store.submission_runs(submission_id)})
+
+@app.route('/results/users/<user_id>', methods=['GET'])
+def results_for_user(user_id):
+    """Stored runs of a user, optionally filtered by ?assignmentId="""
+    assignment_id = request.args.get('assignmentId')
+    return jsonify({'userId': user_id, 'runs': result_store.user_runs(user_id, assignment_id)})
+
+@app.route('/results/assignments/<assignment_id>/failures', methods=['GET'])
+def results_failures(assignment_id):
+    """Failed test records of an assignment, optionally for one ?nodeid="""
+    nodeid = request.args.get('nodeid')
+    limit = request.args.get('limit', 500, type=int)
+    return jsonify({
+        'assignmentId': assignment_id,
+        'failures': result_store.failures(assignment_id, nodeid, limit)
+    })
+
+@app.route('/results/tests', methods=['GET'])
+def results_test_history():
+    """History of a single test: ?nodeid=...&assignmentId=..."""
+    nodeid = request.args.get('nodeid')
+    if not nodeid:
+        return jsonify({'error': 'nodeid is required'}), 400
+    assignment_id = request.args.get('assignmentId')
+    limit = request.args.get('limit', 100, type=int)
+    return jsonify({'nodeid': nodeid, 'history': result_store.test_history(nodeid, assignment_id, limit)})
+
+@app.route('/budgets', methods=['GET'])
+def time_budget_state():
+    """Per-assignment runtime windows behind the adaptive timeouts"""
+    return jsonify(time_budgets.snapshot())
+
+@app.route('/resources', methods=['GET'])
+def resource_overview():
+    """p95 resource usage of every assignment"""
+    return jsonify(resource_summary.overview())
+
+@app.route('/resources/<assignment_id>', methods=['GET'])
+def resource_report(assignment_id):
+    """Rolling resource summary of an assignment's grading jobs"""
+    summary = resource_summary.summary(assignment_id)
+    if summary is None:
+        return jsonify({'error': 'no jobs recorded for this assignment'}), 404
+    return jsonify(summary)
+
+@app.route('/analytics/<assignment_id>', methods=['GET'])
+def analytics_summary(assignment_id):
+    """Precomputed dashboard aggregates: pass rates, failure clusters, duration percentiles, score histogram"""
+    summary = analytics.summary(assignment_id)
+    if summary is None:
+        return jsonify({'error': 'no results for assignment'}), 404
+    summary['assignmentId'] = assignment_id
+    return jsonify(summary)
+
+@app.route('/analytics/<assignment_id>/export', methods=['GET'])
+def analytics_export(assignment_id):
+    """Per-test aggregates as ?format=csv (default) or ?format=columns (JSON arrays per column)"""
+    export_format = request.args.get('format', 'csv')
+    if export_format == 'columns':
+        return jsonify({'assignmentId': assignment_id, 'columns': analytics.export_columns(assignment_id)})
+    if export_format != 'csv':
+        return jsonify({'error': f'unsupported format: {export_format}'}), 400
+    return app.response_class(
+        analytics.export_csv(assignment_id),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename=assignment-{assignment_id}-tests.csv'}
+    )
+
+@app.route('/profiles/<submission_id>', methods=['GET'])
+def profiles_for_submission(submission_id):
+    """Profiled runs of a submission and their collapsed-stack files"""
+    directory = os.path.join(PROFILES_DIR, secure_filename(submission_id))
+    runs = sorted(os.listdir(directory)) if os.path.isdir(directory) else []
+    return jsonify({
+        'submissionId': submission_id,
+        'profiles': [
+            {'id': f"{secure_filename(submission_id)}/{run_id}",
+             'files': [{'name': name, 'bytes': size}
+                       for name, size in profiling.list_profiles(os.path.join(directory, run_id))]}
+            for run_id in runs
+        ]
+    })
+
+@app.route('/profiles/<submission_id>/<run_id>/<name>', methods=['GET'])
+def profile_file(submission_id, run_id, name):
+    """One collapsed-stack file (feed it to flamegraph.pl or speedscope)"""
+    directory = os.path.join(PROFILES_DIR, secure_filename(submission_id), secure_filename(run_id))
+    return send_from_directory(directory, secure_filename(name), mimetype='text/plain')
+
+def cancelled_callback(job, language=None):
+    """Callback payload for a job that was cancelled before it finished"""
+    return {
+        'submissionId': job.submission_id,
+        'status': 'cancelled',
+        'score': 0,
+        'totalTests': 0,
+        'passedTests': 0,
+        'feedback': f"Cancelled: {job.cancel_reason or 'cancelled'}",
+        'language': language or job.payload.get('language')
+    }
+
+def report_cancelled(job):
+    """Tell the backend about a job cancelled while still queued"""
+    print(f"DEBUG: Job {job.submission_id} cancelled before it started: {job.cancel_reason}")
+    if job.payload.get('type') == 'mutation':
+        return  # nobody waits for a callback
+    send_callback(cancelled_callback(job), tracing.SpanContext.from_traceparent(job.traceparent))
+
+@app.route('/jobs', methods=['GET'])
+def jobs_overview():
+    """Queue depth, busy worker slots and concurrency tuning"""
+    return jsonify(dict(executor.stats(), concurrency=concurrency_tuner.metrics()))
+
+@app.route('/jobs/<submission_id>', methods=['GET'])
+def job_status(submission_id):
+    """Status of a queued, running or recently finished job"""
+    job = executor.get(submission_id)
+    if job is None:
+        return jsonify({'error': 'job not found'}), 404
+    return jsonify(dict(job.to_dict(), position=executor.position(job)))
+
+@app.route('/jobs/<submission_id>', methods=['DELETE'])
+def cancel_job(submission_id):
+    """Cancel a queued or running job (e.g. its submission or assignment was deleted)"""
+    reason = request.args.get('reason', 'cancelled by request')
+    job = executor.cancel(submission_id, reason)
+    if job is None:
+        finished = executor.get(submission_id)
+        if finished is not None:
+            return jsonify(dict(finished.to_dict(), error='job already finished')), 409
+        return jsonify({'error': 'job not found'}), 404
+    # Give a running job a moment to kill its test process and clean up
+    job.done.wait(CANCEL_WAIT_SECONDS)
+    return jsonify(job.to_dict())
+
 print("DEBUG: About to register /run route")  # Debug before route
 @app.route('/run', methods=['POST'])
 def run():
+    """Queue a submission for grading; the result arrives through the backend callback"""
     print("DEBUG: /run endpoint called")  # Debug line
     payload = request.get_json(force=True)
     submission_id = payload.get('submissionId')
-    assignment_id = payload.get('assignmentId')
     filename = payload.get('filename')
     
     if not submission_id or not filename:
@@ -279,20 +408,59 @@ def run():
     if not os.path.isfile(submission_zip):
         return jsonify({'error': 'file not found', 'path': submission_zip}), 404
 
-    workdir = tempfile.mkdtemp(prefix=f"run_{submission_id}_")
-    print(f"DEBUG: Created workdir: {workdir}")  # Debug
-    try:
-        # Extract submission files
-        print("DEBUG: Extracting ZIP file...")  # Debug
-        with zipfile.ZipFile(submission_zip, 'r') as zf:
-            zf.extractall(workdir)
-        print("DEBUG: ZIP extracted successfully")  # Debug
+    job = Job(submission_id, payload.get('assignmentId'), payload.get('userId'), payload,
+              request.headers.get('traceparent') or payload.get('traceparent'))
+    superseded = executor.submit(job)
+    if superseded:
+        print(f"DEBUG: Submission {submission_id} superseded queued submissions {[old.submission_id for old in superseded]}")
+
+    if payload.get('wait'):
+        # Synchronous mode (scripts, load tests): block until the job is done
+        job.done.wait()
+        return jsonify(job.response), job.response_code
+
+    return jsonify({
+        'ok': True,
+        'status': job.status,
+        'submissionId': submission_id,
+        'position': executor.position(job),
+        'superseded': [old.submission_id for old in superseded]
+    }), 202
 
+def process_submission(job, batch=None):
+    """
+    Grade one queued submission; returns (response dict, status code)
+    batch is the SubmissionBatch the job was handed over in, if any
+    """
+    payload = job.payload
+    submission_id = job.submission_id
+    assignment_id = job.assignment_id
+    user_id = job.user_id
+    submission_zip = os.path.join(SUBMISSIONS_DIR, payload.get('filename'))
+
+    workdir = None
+    detected_language = 'python'
+    # Continue the backend's trace if it sent one, otherwise start a new one
+    job_span = tracer.start_span(
+        'runner.run',
+        tracing.SpanContext.from_traceparent(job.traceparent),
+        submission_id=str(submission_id), assignment_id=str(assignment_id))
+    print(f"DEBUG: Trace {job_span.context.trace_id}, span {job_span.context.span_id}")
+    job_profile = None
+    timer = PhaseTimer()
+    run_extra = {'traceId': job_span.context.trace_id}
+    if profiling.should_profile(payload.get('profile')):
+        profile_id = f"{secure_filename(str(submission_id))}/{int(time.time() * 1000)}"
+        job_profile = profiling.JobProfile(os.path.join(PROFILES_DIR, profile_id)).start()
+        run_extra['profile'] = profile_id
+        print(f"DEBUG: Profiling job, profiles go to {job_profile.directory}")
+    try:
         # Get assignment information
         try:
-            assignment_response = requests.get(f"{BACKEND_URL}/runner/assignments")
-            assignment_response.raise_for_status()
-            assignments = assignment_response.json()
+            with tracer.start_span('runner.fetch_assignments', job_span), timer.phase('fetch'):
+                assignment_response = requests.get(f"{BACKEND_URL}/runner/assignments")
+                assignment_response.raise_for_status()
+                assignments = assignment_response.json()
             print(f"DEBUG: Got assignments: {assignments}")  # Debug
             print(f"DEBUG: Assignments type: {type(assignments)}")  # Debug
         except Exception as e:
@@ -312,55 +480,265 @@ def run():
             raise RuntimeError('Assignment not found')
 
         # Set up test directory
-        task_dir = os.path.join(TASKS_DIR, assignment['slug'])
-        if not os.path.exists(task_dir):
-            task_dir = os.path.join(CUSTOM_TASKS_DIR, assignment['slug'])
+        task_dir = task_dir_for(assignment['slug'])
 
         tests_dir = os.path.join(task_dir, 'tests')
         
         if not os.path.exists(tests_dir):
             raise RuntimeError(f'Test directory not found: {tests_dir}')
 
-        # Copy test files to workdir
-        workdir_tests = os.path.join(workdir, 'tests')
-        os.makedirs(workdir_tests, exist_ok=True)
-        
-        for name in os.listdir(tests_dir):
-            src = os.path.join(tests_dir, name)
-            dst = os.path.join(workdir_tests, name)
-            if os.path.isdir(src):
-                shutil.copytree(src, dst, dirs_exist_ok=True)
+        task_metadata = load_task_metadata(task_dir)
+        job_classes[str(assignment_id)] = timing_class(task_metadata)
+        job.raise_if_cancelled()
+
+        with zipfile.ZipFile(submission_zip, 'r') as zf:
+            # Determine language (from assignment or auto-detect from the zip listing)
+            detected_language = assignment.get('language', 'python')
+            if not detected_language:
+                submitted_names = [os.path.basename(n) for n in zf.namelist() if not n.endswith('/')]
+                detected_language = plugin_manager.detect_language(
+                    [n for n in submitted_names if not n.startswith('test_')])
+            
+            if not detected_language:
+                detected_language = 'python'  # Default to python
+                print(f"DEBUG: Could not detect language, defaulting to python")
             else:
-                shutil.copy2(src, dst)
-        
-        print(f"DEBUG: Copied tests from {tests_dir} to {workdir_tests}")
-
-        # Get extracted files list
-        extracted_files = []
-        for root, dirs, files in os.walk(workdir):
-            for file in files:
-                # Skip test files and files in test directories
-                if not file.startswith('test_') and file.endswith('.py') and 'tests' not in root:
-                    extracted_files.append(file)
-        
-        print(f"DEBUG: Found extracted files: {extracted_files}")
+                print(f"DEBUG: Detected language: {detected_language}")
 
-        # Determine language (from assignment or auto-detect)
-        detected_language = assignment.get('language', 'python')
-        if not detected_language:
-            detected_language = plugin_manager.detect_language(extracted_files)
-        
-        if not detected_language:
-            detected_language = 'python'  # Default to python
-            print(f"DEBUG: Could not detect language, defaulting to python")
-        else:
-            print(f"DEBUG: Detected language: {detected_language}")
+            # Static pre-check straight from the zip: no extraction, no test process
+            with tracer.start_span('runner.precheck', job_span, language=detected_language) as span, \
+                    timer.phase('precheck'):
+                precheck = run_precheck(detected_language, zf, task_metadata.get('precheck', {}))
+                span.set(ok=precheck['ok'])
+        print(f"DEBUG: Pre-check: ok={precheck['ok']}, {precheck['duration'] * 1000:.1f} ms, errors={precheck['errors']}, warnings={precheck['warnings']}")
 
-        # Execute tests using language plugin (simplified for Python)
-        print(f"DEBUG: About to run pytest in workdir: {workdir}, tests_dir: {workdir_tests}")  # Debug
-        test_result = run_pytest(workdir, workdir_tests)
+        if not precheck['ok']:
+            try:
+                similarity.index_zip(assignment_id, submission_id, submission_zip, user_id=user_id)
+            except Exception as e:
+                print(f"ERROR: Similarity indexing failed: {e}")
+
+            test_result = {
+                'success': False,
+                'total_tests': count_test_functions(tests_dir),
+                'passed_tests': 0,
+                'failed_tests': 0,
+                'score': 0.0,
+                'feedback': 'Pre-check failed:\n' + '\n'.join(f"  • {error}" for error in precheck['errors']),
+                'precheck': precheck,
+                'pytest_executed': False
+            }
+            test_result['resources'] = job_resources(None, timer, queued_seconds(job), job.placement)
+            record_resources(job, test_result['resources'])
+            with tracer.start_span('runner.store', job_span):
+                store_run(submission_id, assignment_id, user_id, detected_language, 'completed', test_result, run_extra)
+            send_callback({
+                'submissionId': submission_id,
+                # The submission was graded, it just could not pass any test
+                'status': 'completed',
+                'score': 0.0,
+                'totalTests': test_result['total_tests'],
+                'passedTests': 0,
+                'feedback': test_result['feedback'],
+                'language': detected_language,
+                'precheck': precheck,
+                'resources': test_result['resources']
+            }, job_span)
+            return {
+                'ok': True,
+                'status': 'completed',
+                'language': detected_language,
+                'result': test_result,
+                **run_extra
+            }, 200
+
+        # Timeout from the assignment's observed runtimes (reference run seeds new assignments)
+        tests_fingerprint = time_budget.tests_fingerprint(tests_dir)
+        with tracer.start_span('runner.calibrate', job_span), timer.phase('calibrate'):
+            calibrate_time_budget(assignment_id, detected_language, task_dir, tests_dir,
+                                  tests_fingerprint, task_metadata)
+        budget = time_budgets.budget(assignment_id, tests_fingerprint, task_metadata)
+        print(f"DEBUG: Time budget: {budget['timeout']}s ({budget['basis']}, {budget['samples']} samples)")
+        job.raise_if_cancelled()
+
+        workdir = tempfile.mkdtemp(prefix=f"run_{submission_id}_")
+        print(f"DEBUG: Created workdir: {workdir}")  # Debug
+
+        memory = allocations.memory_config(task_metadata, payload.get('memory')) \
+            if detected_language == 'python' else None
+        with tracer.start_span('runner.extract', job_span) as span, timer.phase('extract'):
+            # Small pure-Python submissions are imported straight from their zip
+            blocker = zip_import_blocker(detected_language, submission_zip, tests_dir, task_metadata, memory)
+            archive = None if blocker else os.path.abspath(submission_zip)
+            print(f"DEBUG: Extracting submission: {blocker}" if blocker else "DEBUG: Importing submission from its zip")
+            span.set(zip_import=archive is not None)
+            workdir_tests, extracted_files = extract_submission(submission_zip, tests_dir, workdir, extract=not archive)
+            # Large task data is linked, not copied
+            data_dir = dataset_store.publish(task_dir, task_metadata)
+            if data_dir:
+                datasets.expose(data_dir, workdir)
+
+        # Lint, style and complexity of the sources, on the analysis pool while the tests run
+        settings = analysis_settings(task_metadata)
+        analysis_future = analysis_pool.submit(plugin_manager.analyze, detected_language, workdir, settings, archive) \
+            if settings is not None else None
+
+        # Add to the assignment's near-duplicate index; never let this fail grading
+        try:
+            with tracer.start_span('runner.similarity', job_span), timer.phase('similarity'):
+                if archive:
+                    indexed = similarity.index_zip(assignment_id, submission_id, archive, user_id=user_id)
+                else:
+                    indexed = similarity.index_submission(assignment_id, submission_id, workdir,
+                                                          exclude_dir=workdir_tests, user_id=user_id)
+            print(f"DEBUG: Indexed {indexed} source files for similarity")
+        except Exception as e:
+            print(f"ERROR: Similarity indexing failed: {e}")
+
+        # Smoke tier first (tagged tests plus the user's previous failures): a quick provisional result
+        job.raise_if_cancelled()
+        smoke_config = task_metadata.get('smoke') or {}
+        smoke_tests = smoke_selection(task_metadata, tests_dir, user_id, assignment_id) if detected_language == 'python' else []
+        smoke_result = None
+        if smoke_tests:
+            with tracer.start_span('runner.smoke_tests', job_span, selected=len(smoke_tests)) as smoke_span, \
+                    timer.phase('smoke'):
+                smoke_result = run_pytest(workdir, workdir_tests, trace_span=smoke_span, timeout=budget['timeout'],
+                                          cancel_event=job.cancel_event, select=smoke_tests, data_dir=data_dir,
+                                          memory=memory, archive=archive)
+                smoke_span.set(total_tests=smoke_result.get('total_tests', 0),
+                               passed_tests=smoke_result.get('passed_tests', 0))
+            print(f"DEBUG: Smoke tier: {smoke_result.get('passed_tests', 0)}/{smoke_result.get('total_tests', 0)} passed")
+            if smoke_result.get('total_tests'):
+                send_callback({
+                    'submissionId': submission_id,
+                    'status': 'provisional',
+                    'tier': 'smoke',
+                    'score': float(smoke_result['score']),
+                    'totalTests': int(smoke_result['total_tests']),
+                    'passedTests': int(smoke_result['passed_tests']),
+                    'feedback': smoke_result.get('feedback', ''),
+                    'language': detected_language
+                }, job_span)
+            job.raise_if_cancelled()
+        smoke_failed = bool(smoke_result and smoke_result.get('total_tests') and smoke_result['passed_tests'] == 0)
+        rest_skipped = False
+
+        # Execute tests: pytest directly for Python, language plugins otherwise
+        with tracer.start_span('runner.run_tests', job_span, language=detected_language) as tests_span, \
+                timer.phase('tests'):
+            if smoke_result and (smoke_result.get('timed_out') or not smoke_result.get('pytest_executed')):
+                # The remaining tests would not get any further
+                test_result = dict(smoke_result, duration=None)
+                if smoke_result.get('tests'):
+                    # Partial credit counts against the whole suite, not just the smoke tier
+                    total_tests = max(count_test_functions(tests_dir), smoke_result['total_tests'])
+                    test_result.update(total_tests=total_tests,
+                                       score=float(smoke_result['passed_tests']) / float(total_tests))
+                rest_skipped = True
+            elif smoke_failed and smoke_config.get('failFast'):
+                test_result = dict(
+                    smoke_result,
+                    total_tests=max(count_test_functions(tests_dir), smoke_result['total_tests']),
+                    score=0.0,
+                    feedback=smoke_result['feedback'] + "\nRemaining tests skipped: no smoke test passed",
+                    duration=None
+                )
+                rest_skipped = True
+            elif detected_language == 'python':
+                print(f"DEBUG: About to run pytest in workdir: {workdir}, tests_dir: {workdir_tests}")  # Debug
+                timeout = budget['timeout']
+                if smoke_result:
+                    # The smoke tier already used part of the budget
+                    timeout = max(1.0, timeout - (smoke_result.get('duration') or 0.0))
+                test_result = None
+                if batch:
+                    unsafe = 'profiling' if job_profile else 'memory instrumentation' if memory \
+                        else batch_safe(tests_dir, task_metadata)
+                    if unsafe:
+                        print(f"DEBUG: Not batching submission {submission_id}: {unsafe}")
+                        batch.leave(job)
+                    else:
+                        test_result = batch.tests(job, {'workdir': workdir, 'timeout': timeout, 'archive': archive,
+                                                        'tests_dir': tests_dir, 'data_dir': data_dir})
+                        test_result = test_result and dict(test_result, batch={'size': batch.size})
+                if test_result is None:
+                    test_result = run_pytest(workdir, workdir_tests,
+                                             job_profile.pytest_path if job_profile else None, tests_span,
+                                             timeout=timeout, cancel_event=job.cancel_event,
+                                             deselect=[test['nodeid'] for test in smoke_result.get('tests', [])] if smoke_result else None,
+                                             data_dir=data_dir, memory=memory, archive=archive)
+                if smoke_result:
+                    test_result = merge_tier_results(smoke_result, test_result)
+            else:
+                print(f"DEBUG: About to run {detected_language} plugin in workdir: {workdir}")  # Debug
+                test_result = run_plugin_tests(detected_language, workdir, extracted_files, workdir_tests,
+                                               budget['timeout'], job.cancel_event)
+            tests_span.set(total_tests=test_result.get('total_tests', 0),
+                           passed_tests=test_result.get('passed_tests', 0))
         print(f"DEBUG: Test result: {test_result}")  # Debug
 
+        # Differential grading: submission vs. reference over generated inputs
+        differential_config = differential.differential_config(task_metadata, task_dir) \
+            if detected_language == 'python' else None
+        reference = time_budget.reference_dir(task_dir)
+        if differential_config and reference and not rest_skipped and not test_result.get('timed_out'):
+            job.raise_if_cancelled()
+            with tracer.start_span('runner.differential', job_span,
+                                   checks=len(differential_config['checks'])) as span, timer.phase('differential'):
+                outcome = differential.run_differential(workdir, reference, differential_config,
+                                                        budget['timeout'], job.cancel_event)
+                test_result = differential.merge_differential(test_result, outcome, differential_config)
+                span.set(cases=test_result['differential']['cases'])
+            print(f"DEBUG: Differential: {test_result['differential']}")
+
+        # Complexity analysis: how the submission's functions scale (a report, the score stays)
+        complexity_config = complexity.complexity_config(task_metadata, task_dir) \
+            if detected_language == 'python' else None
+        if complexity_config and not rest_skipped and not test_result.get('timed_out'):
+            job.raise_if_cancelled()
+            with tracer.start_span('runner.complexity', job_span,
+                                   checks=len(complexity_config['checks'])) as span, timer.phase('complexity'):
+                outcome = complexity.run_complexity(workdir, complexity_config, job.cancel_event)
+                test_result = complexity.merge_complexity(test_result, outcome)
+                span.set(best=','.join(str(check.get('best')) for check in test_result['complexity']['checks']))
+            print(f"DEBUG: Complexity: {test_result['complexity']}")
+
+        analysis = collect_analysis(analysis_future)
+        if analysis:
+            test_result['analysis'] = analysis
+            print(f"DEBUG: Static analysis: {analysis.get('counts', analysis.get('error'))} "
+                  f"({analysis.get('analyzed', 0)} analyzed, {analysis.get('cached', 0)} cached)")
+
+        if memory:
+            test_result['memory'] = allocations.memory_summary(test_result.get('tests', []), memory)
+            memory_line = allocations.memory_feedback(test_result['memory'])
+            if memory_line:
+                test_result['feedback'] = '\n'.join(part for part in (test_result.get('feedback'), memory_line) if part)
+
+        # Problems that failed some tests but did not stop the run
+        if precheck['warnings']:
+            test_result['precheck'] = precheck
+            test_result['feedback'] = '\n'.join(
+                part for part in (test_result.get('feedback'), precheck_feedback(precheck)) if part)
+
+        test_result['time_budget'] = budget
+        if smoke_result:
+            test_result['tiers'] = {
+                'smoke': {
+                    'selected': len(smoke_tests),
+                    'total_tests': smoke_result.get('total_tests', 0),
+                    'passed_tests': smoke_result.get('passed_tests', 0),
+                    'duration': smoke_result.get('duration')
+                },
+                'rest_skipped': rest_skipped
+            }
+        if test_result.get('duration') is not None and not test_result.get('timed_out'):
+            time_budgets.observe(assignment_id, tests_fingerprint, test_result['duration'])
+        test_result['resources'] = job_resources(test_result.get('resources'), timer, queued_seconds(job),
+                                                 job.placement)
+        record_resources(job, test_result['resources'])
+
         # Prepare callback data
         # Always send 'completed' if pytest was executed (even if no tests found or parsing failed)
         # 'failed' status is only for execution errors before pytest runs
@@ -396,8 +774,26 @@ def run():
             'totalTests': int(total_tests_value),
             'passedTests': int(passed_tests_value),
             'feedback': test_result.get('feedback', ''),
-            'language': 'python'
+            'language': detected_language
         }
+        if 'build' in test_result:
+            callback_data['build'] = test_result['build']
+        callback_data['timeBudget'] = budget['timeout']
+        if 'tiers' in test_result:
+            callback_data['tiers'] = test_result['tiers']
+        callback_data['resources'] = test_result['resources']
+        if 'complexity' in test_result:
+            callback_data['complexity'] = test_result['complexity']
+        if test_result.get('memory'):
+            callback_data['memory'] = test_result['memory']
+        if test_result.get('analysis'):
+            callback_data['analysis'] = test_result['analysis']
+        if test_result.get('timed_out'):
+            callback_data['timedOut'] = True
+        if test_result.get('partial'):
+            callback_data['partial'] = test_result['partial']
+        if 'precheck' in test_result:
+            callback_data['precheck'] = test_result['precheck']
         
         print(f"DEBUG: ===== CALLBACK DATA =====")
         print(f"DEBUG: Callback score: {callback_data['score']} (type: {type(callback_data['score'])})")
@@ -407,41 +803,33 @@ def run():
         
         print(f"DEBUG: Callback status: {callback_status} (tests executed: {pytest_was_executed}, total: {test_result.get('total_tests', 0)})")
 
+        with tracer.start_span('runner.store', job_span):
+            store_run(submission_id, assignment_id, user_id, detected_language, callback_status, test_result, run_extra)
+
         # Send results back to backend
-        print(f"DEBUG: Sending callback to backend: {BACKEND_URL}/runner/callback")
-        print(f"DEBUG: Callback data: {callback_data}")
-        try:
-            callback_response = requests.post(
-                f"{BACKEND_URL}/runner/callback", 
-                json=callback_data, 
-                timeout=30,
-                headers={'Content-Type': 'application/json'}
-            )
-            print(f"DEBUG: Callback response status: {callback_response.status_code}")
-            print(f"DEBUG: Callback response body: {callback_response.text}")
-            if callback_response.status_code != 200:
-                print(f"ERROR: Callback failed with status {callback_response.status_code}")
-                print(f"ERROR: Response: {callback_response.text}")
-        except requests.exceptions.Timeout as e:
-            print(f"ERROR: Callback timeout after 30 seconds: {e}")
-        except requests.exceptions.ConnectionError as e:
-            print(f"ERROR: Could not connect to backend at {BACKEND_URL}: {e}")
-        except Exception as e:
-            print(f"ERROR: Failed to send callback: {type(e).__name__}: {e}")
-            import traceback
-            print(f"ERROR: Traceback: {traceback.format_exc()}")
+        send_callback(callback_data, job_span)
+
+        return {
+            'ok': True,
+            'status': callback_status,
+            'language': detected_language,
+            'result': test_result,
+            **run_extra
+        }, 200
 
-        return jsonify({
-            'ok': True, 
-            'language': 'python',
-            'result': test_result
-        })
+    except ProcessCancelled as e:
+        # Superseded or withdrawn while running: the test process is already killed
+        print(f"DEBUG: Submission {submission_id} cancelled: {e}")
+        job_span.set(cancelled=True, cancel_reason=str(e))
+        send_callback(cancelled_callback(job, detected_language), job_span)
+        return {'ok': False, 'status': 'cancelled', 'reason': job.cancel_reason or str(e)}, 200
         
     except Exception as e:
         import traceback
         error_trace = traceback.format_exc()
         print(f"DEBUG: Error occurred: {str(e)}")  # Debug
         print(f"DEBUG: Traceback:\n{error_trace}")  # Debug
+        job_span.error = f"{type(e).__name__}: {e}"
         # Send error callback
         print(f"ERROR: Sending error callback for submission {submission_id}")
         try:
@@ -454,10 +842,11 @@ def run():
                     'totalTests': 0,
                     'passedTests': 0,
                     'feedback': str(e),
-                    'language': 'python'
+                    'language': detected_language,
+                    'traceId': job_span.context.trace_id
                 }, 
                 timeout=30,
-                headers={'Content-Type': 'application/json'}
+                headers={'Content-Type': 'application/json', 'traceparent': job_span.traceparent}
             )
             print(f"ERROR: Error callback response: {callback_response.status_code}")
         except Exception as callback_err:
@@ -465,9 +854,147 @@ def run():
             import traceback
             print(f"ERROR: Callback error traceback: {traceback.format_exc()}")
         
-        return jsonify({'error': 'runner error', 'message': str(e)}), 500
+        return {'error': 'runner error', 'status': 'failed', 'message': str(e)}, 500
+    finally:
+        job_span.end()
+        if job_profile:
+            print(f"DEBUG: Handler profile: {job_profile.stop()}")
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+def process_mutation(job):
+    """Mutation-test an assignment's tests against its reference solution; returns (response dict, status code)"""
+    payload = job.payload
+    slug = payload['slug']
+    task_dir = task_dir_for(slug)
+    task_metadata = load_task_metadata(task_dir)
+    module = payload.get('module') or task_metadata.get('precheck', {}).get('module') or 'solution.py'
+    scratch = None
+    try:
+        if payload.get('solution'):
+            # Solution sent with the request (custom assignments have no reference/ directory)
+            scratch = tempfile.mkdtemp(prefix='mutation_solution_')
+            with open(os.path.join(scratch, module), 'w', encoding='utf-8') as f:
+                f.write(payload['solution'])
+            reference = scratch
+        else:
+            reference = time_budget.reference_dir(task_dir)
+        if not reference or not os.path.isfile(os.path.join(reference, module)):
+            return {'error': f'no reference solution {module} for {slug}', 'status': 'failed'}, 400
+
+        with tracer.start_span('runner.mutation', tracing.SpanContext.from_traceparent(job.traceparent),
+                               slug=slug) as span:
+            report = mutation.run_mutation_testing(
+                reference, os.path.join(task_dir, 'tests'), module,
+                workers=int(payload.get('workers') or mutation.MUTATION_WORKERS),
+                cancel_event=job.cancel_event,
+                data_dir=dataset_store.publish(task_dir, task_metadata))
+            span.set(mutants=report['mutants'], mutation_score=report['mutationScore'] or 0.0)
+        report.update(slug=slug, module=module, jobId=job.submission_id, finishedAt=time.time())
+        print(f"DEBUG: Mutation score for {slug}: {report['mutationScore']} ({report['mutants']} mutants, {report['duration']}s)")
+
+        os.makedirs(MUTATION_DIR, exist_ok=True)
+        report_path = os.path.join(MUTATION_DIR, f"{secure_filename(slug)}.json")
+        with open(report_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(report, f)
+        os.replace(report_path + '.tmp', report_path)
+        return dict(report, ok=True, status='completed'), 200
+    except ProcessCancelled as e:
+        return {'ok': False, 'status': 'cancelled', 'reason': job.cancel_reason or str(e)}, 200
+    except (RuntimeError, OSError, SyntaxError, UnicodeDecodeError) as e:
+        print(f"ERROR: Mutation testing of {slug} failed: {e}")
+        return {'error': 'mutation testing failed', 'status': 'failed', 'message': str(e)}, 500
     finally:
-        shutil.rmtree(workdir, ignore_errors=True)
+        if scratch:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+def handle_job(job):
+    """Executor entry point: dispatch on the job type"""
+    if job.payload.get('type') == 'mutation':
+        return process_mutation(job)
+    return process_submission(job)
+
+def run_batch_entries(entries):
+    """SubmissionBatch callback: all entries share one assignment, hence tests and dataset"""
+    first = next(iter(entries.values()))
+    return run_pytest_batch(entries, first['tests_dir'], first['data_dir'])
+
+def handle_batch(jobs):
+    """Executor entry point for several submissions of one assignment (see batching.py)"""
+    batch = SubmissionBatch(jobs, run_batch_entries)
+    outcomes = {}
+
+    def work(job):
+        with batch.serial:
+            try:
+                outcomes[job.key] = process_submission(job, batch)
+            except Exception as e:
+                outcomes[job.key] = ({'error': 'runner error', 'status': 'failed', 'message': str(e)}, 500)
+            finally:
+                batch.leave(job)
+
+    threads = [threading.Thread(target=work, args=(job,), name=f'batch-{job.key}') for job in jobs]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return [outcomes[job.key] for job in jobs]
+
+def timing_class(task_metadata):
+    """TIMING for assignments whose grading measures time (complexity analysis or "timingSensitive")"""
+    if task_metadata.get('timingSensitive') or (task_metadata.get('complexity') or {}).get('checks'):
+        return cpu_topology.TIMING
+    return None
+
+def job_class(job):
+    """
+    Executor job class: TIMING jobs get the isolated slots. Known once a job of the
+    assignment has run (or asked for with "timing": true in the /run payload)
+    """
+    if job.payload.get('type') == 'mutation':
+        return None
+    if job.payload.get('timing'):
+        return cpu_topology.TIMING
+    return job_classes.get(str(job.assignment_id))
+
+def group_key(job):
+    """Affinity and batching group: submissions of the same assignment"""
+    if job.payload.get('type') == 'mutation' or job.assignment_id is None:
+        return None
+    return str(job.assignment_id)
+
+@app.route('/mutation', methods=['POST'])
+def start_mutation():
+    """Queue a mutation-testing run of an assignment's tests ({slug, solution?, module?, workers?, wait?})"""
+    payload = request.get_json(force=True)
+    slug = payload.get('slug')
+    if not slug or secure_filename(slug) != slug:
+        return jsonify({'error': 'missing or invalid slug'}), 400
+    if not os.path.isdir(os.path.join(task_dir_for(slug), 'tests')):
+        return jsonify({'error': 'task not found', 'slug': slug}), 404
+
+    job_id = f"mutation-{slug}-{int(time.time() * 1000)}"
+    job = Job(job_id, payload.get('assignmentId'), None, dict(payload, type='mutation'),
+              request.headers.get('traceparent'))
+    executor.submit(job)
+    if payload.get('wait'):
+        job.done.wait()
+        return jsonify(job.response), job.response_code
+    return jsonify({'ok': True, 'status': job.status, 'jobId': job_id, 'position': executor.position(job)}), 202
+
+@app.route('/mutation/<slug>', methods=['GET'])
+def mutation_report(slug):
+    """Latest mutation-testing report of an assignment"""
+    report_path = os.path.join(MUTATION_DIR, f"{secure_filename(slug)}.json")
+    if not os.path.exists(report_path):
+        return jsonify({'error': 'no mutation report'}), 404
+    with open(report_path, 'r', encoding='utf-8') as f:
+        return jsonify(json.load(f))
+
+executor = JobExecutor(handle_job, report_cancelled, group_key=group_key, batch_handler=handle_batch,
+                       topology=topology, job_class=job_class)
+concurrency_tuner = ConcurrencyTuner(executor)
+concurrency_tuner.start()
 
 if __name__ == '__main__':
     print(f"=== RUNNER STARTED ===")
@@ -0,0 +1,422 @@
+"""
+Submission Similarity Index
+Incremental MinHash/LSH index per assignment for spotting near-duplicate
+submissions without comparing every pair
+
+Usage (backfill existing submissions):
+    python similarity.py backfill [--db PATH] [--workers N]
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import keyword
+import os
+import random
+import re
+import threading
+import tokenize
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Any, Optional, Iterable, Tuple
+
+try:
+    import numpy
+except ImportError:  # optional, only speeds up signature computation
+    numpy = None
+
+RUNNER_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(RUNNER_DIR)
+RESULTS_DIR = os.getenv('RESULTS_DIR', os.path.join(PROJECT_ROOT, 'backend', 'src', 'data', 'results'))
+SUBMISSIONS_DIR = os.getenv('SUBMISSIONS_DIR', os.path.join(PROJECT_ROOT, 'backend', 'src', 'data', 'submissions'))
+DATABASE_FILE = os.path.join(PROJECT_ROOT, 'backend', 'src', 'data', 'database.json')
+SIMILARITY_DIR = os.path.join(RESULTS_DIR, 'similarity')
+
+SHINGLE_SIZE = int(os.getenv('SIMILARITY_SHINGLE_SIZE', 5))
+# A pair of similarity s shares a band with probability 1 - (1 - s**rows)**bands. 32 bands of
+# 4 rows put the curve's midpoint, (1/bands)**(1/rows) ~ 0.42, well below the threshold: a pair
+# at 0.7 becomes a candidate 99.99% of the time (16 x 8: 61%). The signature estimate then
+# drops the candidates below the threshold.
+NUM_BANDS = int(os.getenv('SIMILARITY_BANDS', 32))
+ROWS_PER_BAND = int(os.getenv('SIMILARITY_ROWS', 4))
+NUM_PERM = NUM_BANDS * ROWS_PER_BAND
+# Estimated Jaccard similarity above which a pair is reported
+SIMILARITY_THRESHOLD = float(os.getenv('SIMILARITY_THRESHOLD', 0.7))
+
+SOURCE_EXTENSIONS = ('.py', '.c', '.h', '.cpp', '.cc', '.cxx', '.hpp', '.java', '.js')
+
+# a * h + b stays below 2**63 for 32-bit shingle hashes, so numpy's uint64
+# and Python ints give identical signatures
+_PRIME = (1 << 31) - 1
+_MAX_HASH = _PRIME
+# Fixed seed: signatures must stay comparable across restarts
+_rng = random.Random(1729)
+_PERM_A = [_rng.randrange(1, _PRIME) for _ in range(NUM_PERM)]
+_PERM_B = [_rng.randrange(0, _PRIME) for _ in range(NUM_PERM)]
+
+_GENERIC_TOKEN = re.compile(r'[A-Za-z_]\w*|\d+(?:\.\d+)?|"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|\S')
+_C_COMMENT = re.compile(r'//[^\n]*|/\*.*?\*/', re.DOTALL)
+_C_KEYWORDS = {
+    'auto', 'break', 'case', 'char', 'class', 'const', 'continue', 'default', 'do', 'double', 'else',
+    'enum', 'extern', 'float', 'for', 'goto', 'if', 'int', 'long', 'new', 'delete', 'return', 'short',
+    'signed', 'sizeof', 'static', 'struct', 'switch', 'template', 'typedef', 'union', 'unsigned',
+    'void', 'volatile', 'while', 'bool', 'true', 'false', 'this', 'public', 'private', 'function',
+    'var', 'let', 'const', 'import', 'include', 'define'
+}
+
+
+def tokenize_source(source: str, filename: str = 'solution.py') -> List[str]:
+    """
+    Turn source code into a normalized token stream
+    Identifiers become ID, literals NUM/STR, and comments and layout are dropped,
+    so renaming variables or reformatting does not hide a copy
+    Args:
+        source: Source text
+        filename: Used to pick the tokenizer
+    Returns:
+        List of normalized tokens
+    """
+    if filename.endswith('.py'):
+        try:
+            return _tokenize_python(source)
+        except (tokenize.TokenError, IndentationError, SyntaxError):
+            pass  # fall through to the generic tokenizer
+
+    return _tokenize_generic(_C_COMMENT.sub(' ', source))
+
+
+def _tokenize_python(source: str) -> List[str]:
+    tokens = []
+    for tok in tokenize.generate_tokens(io.StringIO(source).readline):
+        if tok.type == tokenize.NAME:
+            tokens.append(tok.string if keyword.iskeyword(tok.string) else 'ID')
+        elif tok.type == tokenize.NUMBER:
+            tokens.append('NUM')
+        elif tok.type == tokenize.STRING:
+            tokens.append('STR')
+        elif tok.type == tokenize.OP:
+            tokens.append(tok.string)
+        elif tok.type == tokenize.NEWLINE:
+            tokens.append(';')
+        # COMMENT, NL, INDENT, DEDENT and ENCODING carry no structure we compare on
+    return tokens
+
+
+def _tokenize_generic(source: str) -> List[str]:
+    tokens = []
+    for match in _GENERIC_TOKEN.finditer(source):
+        text = match.group(0)
+        if text[0].isalpha() or text[0] == '_':
+            tokens.append(text if text in _C_KEYWORDS else 'ID')
+        elif text[0].isdigit():
+            tokens.append('NUM')
+        elif text[0] in '"\'':
+            tokens.append('STR')
+        else:
+            tokens.append(text)
+    return tokens
+
+
+def shingle_hashes(tokens: List[str], size: int = SHINGLE_SIZE) -> List[int]:
+    """32-bit hashes of all token n-grams"""
+    if len(tokens) < size:
+        size = max(1, len(tokens))
+    shingles = set()
+    for i in range(len(tokens) - size + 1):
+        data = '\x1f'.join(tokens[i:i + size]).encode('utf-8')
+        shingles.add(int.from_bytes(hashlib.blake2b(data, digest_size=4).digest(), 'little'))
+    return sorted(shingles)
+
+
+def minhash_signature(hashes: List[int]) -> List[int]:
+    """MinHash signature with NUM_PERM universal hash permutations"""
+    if not hashes:
+        return [_MAX_HASH] * NUM_PERM
+
+    if numpy is not None:
+        values = numpy.array(hashes, dtype=numpy.uint64)[:, None]
+        a = numpy.array(_PERM_A, dtype=numpy.uint64)[None, :]
+        b = numpy.array(_PERM_B, dtype=numpy.uint64)[None, :]
+        permuted = (values * a + b) % numpy.uint64(_PRIME)
+        return [int(v) for v in permuted.min(axis=0)]
+
+    signature = []
+    for a, b in zip(_PERM_A, _PERM_B):
+        signature.append(min((a * h + b) % _PRIME for h in hashes))
+    return signature
+
+
+def signature_for_sources(sources: Iterable[Tuple[str, str]]) -> List[int]:
+    """
+    Compute the MinHash signature of a submission
+    Args:
+        sources: (filename, source text) pairs
+    Returns:
+        List of NUM_PERM ints
+    """
+    tokens = []
+    for filename, source in sorted(sources):
+        tokens.extend(tokenize_source(source, filename))
+    return minhash_signature(shingle_hashes(tokens))
+
+
+def _is_source(name: str) -> bool:
+    # '._*' files are macOS resource forks that some zip tools add
+    return name.endswith(SOURCE_EXTENSIONS) and not name.startswith(('test_', '._'))
+
+
+def read_sources_from_dir(workdir: str, exclude_dir: Optional[str] = None) -> List[Tuple[str, str]]:
+    """Source files of an extracted submission, skipping the copied tests"""
+    sources = []
+    for root, dirs, files in os.walk(workdir):
+        if exclude_dir and os.path.abspath(root).startswith(os.path.abspath(exclude_dir)):
+            continue
+        if '__MACOSX' in root:
+            continue
+        for name in files:
+            if _is_source(name):
+                with open(os.path.join(root, name), 'r', encoding='utf-8', errors='replace') as f:
+                    sources.append((name, f.read()))
+    return sources
+
+
+def read_sources_from_zip(zip_path: str) -> List[Tuple[str, str]]:
+    """Source files straight from a submission zip, without extracting it"""
+    sources = []
+    with zipfile.ZipFile(zip_path, 'r') as zf:
+        for info in zf.infolist():
+            name = os.path.basename(info.filename)
+            if info.is_dir() or '__MACOSX' in info.filename or not _is_source(name):
+                continue
+            sources.append((name, zf.read(info).decode('utf-8', errors='replace')))
+    return sources
+
+
+class SimilarityIndex:
+    """MinHash/LSH index for one assignment, persisted as an append-only JSONL log"""
+
+    def __init__(self, assignment_id: Any, directory: str = SIMILARITY_DIR):
+        self.assignment_id = assignment_id
+        self.path = os.path.join(directory, f"{assignment_id}.jsonl")
+        self.signatures: Dict[str, List[int]] = {}
+        self.users: Dict[str, Any] = {}
+        self.buckets: List[Dict[int, set]] = [dict() for _ in range(NUM_BANDS)]
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn write from a crash
+                if len(record.get('signature', [])) == NUM_PERM:
+                    self._insert(str(record['submissionId']), record['signature'], record.get('userId'))
+
+    def _band_keys(self, signature: List[int]) -> List[int]:
+        keys = []
+        for band in range(NUM_BANDS):
+            rows = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+            keys.append(hash(tuple(rows)))
+        return keys
+
+    def _insert(self, submission_id: str, signature: List[int], user_id: Any):
+        if submission_id in self.signatures:
+            self._remove(submission_id)
+        self.signatures[submission_id] = signature
+        self.users[submission_id] = user_id
+        for band, key in enumerate(self._band_keys(signature)):
+            self.buckets[band].setdefault(key, set()).add(submission_id)
+
+    def _remove(self, submission_id: str):
+        signature = self.signatures.pop(submission_id)
+        self.users.pop(submission_id, None)
+        for band, key in enumerate(self._band_keys(signature)):
+            bucket = self.buckets[band].get(key)
+            if bucket:
+                bucket.discard(submission_id)
+                if not bucket:
+                    del self.buckets[band][key]
+
+    def add(self, submission_id: Any, signature: List[int], user_id: Any = None):
+        """Add or replace a submission's signature"""
+        submission_id = str(submission_id)
+        with self._lock:
+            self._insert(submission_id, signature, user_id)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'submissionId': submission_id, 'userId': user_id,
+                                    'signature': signature}) + '\n')
+
+    def __contains__(self, submission_id: Any) -> bool:
+        return str(submission_id) in self.signatures
+
+    @staticmethod
+    def estimate(sig_a: List[int], sig_b: List[int]) -> float:
+        """Estimated Jaccard similarity of two signatures"""
+        return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / float(NUM_PERM)
+
+    def candidates(self, submission_id: Any, threshold: float = SIMILARITY_THRESHOLD) -> List[Dict[str, Any]]:
+        """
+        Near-duplicates of one submission
+        Cost depends on the bucket sizes, not on the number of submissions
+        """
+        submission_id = str(submission_id)
+        with self._lock:
+            signature = self.signatures.get(submission_id)
+            if signature is None:
+                return []
+            user_id = self.users.get(submission_id)
+            others = set()
+            for band, key in enumerate(self._band_keys(signature)):
+                others |= self.buckets[band].get(key, set())
+            others.discard(submission_id)
+
+            matches = []
+            for other in others:
+                # Resubmissions by the same student are not plagiarism
+                if user_id is not None and self.users.get(other) == user_id:
+                    continue
+                similarity = self.estimate(signature, self.signatures[other])
+                if similarity >= threshold:
+                    matches.append({'submissionId': other, 'userId': self.users.get(other),
+                                    'similarity': round(similarity, 3)})
+        return sorted(matches, key=lambda m: -m['similarity'])
+
+    def clusters(self, threshold: float = SIMILARITY_THRESHOLD) -> List[Dict[str, Any]]:
+        """Groups of submissions connected by candidate pairs above the threshold"""
+        with self._lock:
+            parent = {}
+
+            def find(x):
+                while parent.get(x, x) != x:
+                    parent[x] = parent.get(parent[x], parent[x])
+                    x = parent[x]
+                return x
+
+            checked = set()
+            best = {}
+            for band in self.buckets:
+                for members in band.values():
+                    if len(members) < 2:
+                        continue
+                    members = sorted(members)
+                    for i, a in enumerate(members):
+                        for b in members[i + 1:]:
+                            if (a, b) in checked:
+                                continue
+                            checked.add((a, b))
+                            if self.users.get(a) is not None and self.users.get(a) == self.users.get(b):
+                                continue
+                            similarity = self.estimate(self.signatures[a], self.signatures[b])
+                            if similarity >= threshold:
+                                parent[find(a)] = find(b)
+                                best[a] = max(best.get(a, 0.0), similarity)
+                                best[b] = max(best.get(b, 0.0), similarity)
+
+            groups: Dict[str, List[str]] = {}
+            for member in best:
+                groups.setdefault(find(member), []).append(member)
+
+        clusters = []
+        for members in groups.values():
+            clusters.append({
+                'submissions': sorted(members, key=lambda m: int(m) if m.isdigit() else m),
+                'users': sorted({str(self.users.get(m)) for m in members}),
+                'maxSimilarity': round(max(best[m] for m in members), 3)
+            })
+        return sorted(clusters, key=lambda c: (-c['maxSimilarity'], -len(c['submissions'])))
+
+
+_indexes: Dict[str, SimilarityIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(assignment_id: Any) -> SimilarityIndex:
+    """Shared, lazily loaded index for an assignment"""
+    key = str(assignment_id)
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes[key] = SimilarityIndex(key, SIMILARITY_DIR)
+        return _indexes[key]
+
+
+def index_submission(assignment_id: Any, submission_id: Any, workdir: str,
+                     exclude_dir: Optional[str] = None, user_id: Any = None) -> int:
+    """
+    Tokenize an extracted submission and add it to its assignment's index
+    Returns:
+        int: Number of source files indexed
+    """
+    sources = read_sources_from_dir(workdir, exclude_dir)
+    if sources:
+        get_index(assignment_id).add(submission_id, signature_for_sources(sources), user_id)
+    return len(sources)
+
+
+def index_zip(assignment_id: Any, submission_id: Any, zip_path: str, user_id: Any = None) -> int:
+    """Like index_submission, but reads sources straight from the submission zip"""
+    sources = read_sources_from_zip(zip_path)
+    if sources:
+        get_index(assignment_id).add(submission_id, signature_for_sources(sources), user_id)
+    return len(sources)
+
+
+def _signature_for_zip(zip_path: str) -> Optional[List[int]]:
+    """Process pool worker: signature of a submission zip"""
+    try:
+        sources = read_sources_from_zip(zip_path)
+    except (zipfile.BadZipFile, OSError):
+        return None
+    return signature_for_sources(sources) if sources else None
+
+
+def backfill(database_file: str = DATABASE_FILE, workers: Optional[int] = None) -> Dict[str, int]:
+    """
+    Index all existing submissions listed in the backend database
+    Signatures are computed in a process pool; submissions already indexed are skipped
+    """
+    with open(database_file, 'r', encoding='utf-8') as f:
+        database = json.load(f)
+
+    jobs = []
+    for submission in database.get('submissions', []):
+        assignment_id = submission.get('assignmentId')
+        zip_path = os.path.join(SUBMISSIONS_DIR, submission.get('filename', ''))
+        if assignment_id is None or not os.path.isfile(zip_path):
+            continue
+        if submission['id'] in get_index(assignment_id):
+            continue
+        jobs.append((assignment_id, submission['id'], submission.get('userId'), zip_path))
+
+    stats = {'indexed': 0, 'skipped': 0}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        signatures = pool.map(_signature_for_zip, [job[3] for job in jobs], chunksize=8)
+        for (assignment_id, submission_id, user_id, _), signature in zip(jobs, signatures):
+            if signature is None:
+                stats['skipped'] += 1
+                continue
+            get_index(assignment_id).add(submission_id, signature, user_id)
+            stats['indexed'] += 1
+    return stats
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Submission similarity index')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    backfill_parser = subparsers.add_parser('backfill', help='Index existing submission zips')
+    backfill_parser.add_argument('--db', default=DATABASE_FILE, help='Backend database.json')
+    backfill_parser.add_argument('--workers', type=int, default=None, help='Process pool size')
+    args = parser.parse_args(argv)
+
+    if args.command == 'backfill':
+        stats = backfill(args.db, args.workers)
+        print(f"Indexed {stats['indexed']} submissions, skipped {stats['skipped']}")
+
+
+if __name__ == '__main__':
+    main()
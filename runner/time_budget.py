@@ -0,0 +1,160 @@
+"""
+Adaptive Time Budgets
+Keeps a rolling distribution of test-run durations per assignment, seeded by
+calibration runs of the task's reference solution, and derives each job's
+timeout from it: clamp(p99 * safetyFactor, min, max)
+
+Bounds come from the optional "timeBudget" section of task.json:
+    {"timeBudget": {"min": 2, "max": 30, "safetyFactor": 3, "percentile": 0.99}}
+"""
+
+import hashlib
+import json
+import math
+import os
+import threading
+from typing import Dict, List, Any, Optional
+
+TIME_BUDGET_MIN = float(os.getenv('TIME_BUDGET_MIN', 5))
+TIME_BUDGET_MAX = float(os.getenv('TIME_BUDGET_MAX', 60))
+TIME_BUDGET_SAFETY = float(os.getenv('TIME_BUDGET_SAFETY', 3))
+TIME_BUDGET_WINDOW = int(os.getenv('TIME_BUDGET_WINDOW', 200))
+CALIBRATION_RUNS = int(os.getenv('TIME_BUDGET_CALIBRATION_RUNS', 3))
+# Observed runs needed before the budget is trusted without a calibration seed
+MIN_OBSERVED = 5
+
+
+def tests_fingerprint(tests_dir: str) -> str:
+    """Hash of the test files; a change resets the assignment's distribution"""
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(tests_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if name.endswith('.pyc'):
+                continue
+            path = os.path.join(root, name)
+            digest.update(os.path.relpath(path, tests_dir).encode('utf-8') + b'\0')
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of a small list"""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))
+    return ordered[index]
+
+
+def budget_config(task_metadata: Dict[str, Any]) -> Dict[str, float]:
+    """Teacher bounds from task.json, falling back to the runner defaults"""
+    config = task_metadata.get('timeBudget', {}) if task_metadata else {}
+    lower = float(config.get('min', TIME_BUDGET_MIN))
+    upper = float(config.get('max', TIME_BUDGET_MAX))
+    return {
+        'min': min(lower, upper),
+        'max': upper,
+        'safetyFactor': float(config.get('safetyFactor', TIME_BUDGET_SAFETY)),
+        'percentile': float(config.get('percentile', 0.99))
+    }
+
+
+class TimeBudgets:
+    """Per-assignment duration windows, persisted as one JSON file"""
+
+    def __init__(self, path: str, window: int = TIME_BUDGET_WINDOW):
+        self.path = path
+        self.window = window
+        self._lock = threading.Lock()
+        self._calibration_locks: Dict[str, threading.Lock] = {}
+        self._assignments: Dict[str, Dict[str, Any]] = {}
+        self._load()
+
+    def _entry(self, key: str, fingerprint: str) -> Dict[str, Any]:
+        entry = self._assignments.get(key)
+        if entry is None or entry.get('fingerprint') != fingerprint:
+            entry = {'fingerprint': fingerprint, 'durations': [], 'calibration': [], 'observed': 0}
+            self._assignments[key] = entry
+        return entry
+
+    def needs_calibration(self, assignment_id: Any, fingerprint: str) -> bool:
+        with self._lock:
+            entry = self._assignments.get(str(assignment_id))
+            return entry is None or entry.get('fingerprint') != fingerprint or not entry['calibration']
+
+    def calibration_lock(self, assignment_id: Any) -> threading.Lock:
+        """Serializes calibration of one assignment across concurrent jobs"""
+        with self._lock:
+            return self._calibration_locks.setdefault(str(assignment_id), threading.Lock())
+
+    def calibrate(self, assignment_id: Any, fingerprint: str, durations: List[float]):
+        """Seed the distribution with reference-solution run times"""
+        with self._lock:
+            entry = self._entry(str(assignment_id), fingerprint)
+            entry['calibration'] = list(durations)
+            entry['durations'] = (list(durations) + entry['durations'])[-self.window:]
+            self._save()
+
+    def observe(self, assignment_id: Any, fingerprint: str, seconds: float):
+        """Add the duration of a run that finished within its budget"""
+        with self._lock:
+            entry = self._entry(str(assignment_id), fingerprint)
+            entry['durations'] = (entry['durations'] + [round(seconds, 4)])[-self.window:]
+            entry['observed'] += 1
+            self._save()
+
+    def budget(self, assignment_id: Any, fingerprint: str, task_metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Effective timeout for the next run of an assignment
+        Returns:
+            Dict with timeout (seconds), basis ('observed', 'calibration' or 'default'),
+            the percentile estimate, sample count and the bounds used
+        """
+        config = budget_config(task_metadata)
+        with self._lock:
+            entry = self._assignments.get(str(assignment_id))
+            if entry and entry.get('fingerprint') != fingerprint:
+                entry = None
+            durations = list(entry['durations']) if entry else []
+            calibrated = bool(entry and entry['calibration'])
+            observed = entry['observed'] if entry else 0
+
+        budget = dict(config, samples=len(durations))
+        if durations and (calibrated or observed >= MIN_OBSERVED):
+            estimate = percentile(durations, config['percentile'])
+            budget['estimate'] = estimate
+            budget['basis'] = 'observed' if observed >= MIN_OBSERVED else 'calibration'
+            budget['timeout'] = round(max(config['min'], min(config['max'], estimate * config['safetyFactor'])), 2)
+        else:
+            budget['estimate'] = None
+            budget['basis'] = 'default'
+            budget['timeout'] = config['max']
+        return budget
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {key: {'fingerprint': entry['fingerprint'], 'samples': len(entry['durations']),
+                          'observed': entry['observed'], 'calibration': entry['calibration']}
+                    for key, entry in self._assignments.items()}
+
+    def _save(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._assignments, f, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._assignments = json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            print(f"ERROR: Could not load time budgets {self.path}: {e}")
+            self._assignments = {}
+
+
+def reference_dir(task_dir: str) -> Optional[str]:
+    """The task's reference solution directory, if it has one"""
+    path = os.path.join(task_dir, 'reference')
+    return path if os.path.isdir(path) and os.listdir(path) else None
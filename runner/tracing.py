@@ -0,0 +1,265 @@
+"""
+Trace Propagation
+W3C trace context (`traceparent`) for jobs that cross the backend, the
+runner, the pytest child and the result callback. Spans are exported in
+batches to a JSONL file or an OTLP/HTTP (JSON) collector.
+
+Environment:
+    TRACE_EXPORTER                 none (default), file or otlp
+    TRACE_FILE                     JSONL file for the file exporter
+    OTEL_EXPORTER_OTLP_ENDPOINT    collector base URL for otlp (default http://localhost:4318)
+    OTEL_SERVICE_NAME              service name on exported spans (default aca-runner)
+"""
+
+import contextvars
+import json
+import os
+import queue
+import re
+import threading
+import time
+from typing import Dict, Any, List, Optional
+import requests
+from aca_pytest import plugin_options
+
+TRACE_EXPORTER = os.getenv('TRACE_EXPORTER', 'none')
+TRACE_FILE = os.getenv('TRACE_FILE')
+OTLP_ENDPOINT = os.getenv('OTEL_EXPORTER_OTLP_ENDPOINT', 'http://localhost:4318')
+SERVICE_NAME = os.getenv('OTEL_SERVICE_NAME', 'aca-runner')
+EXPORT_BATCH_SIZE = 64
+EXPORT_INTERVAL = 1.0
+
+_TRACEPARENT = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar('aca_current_span', default=None)
+
+
+def new_id(num_bytes: int) -> str:
+    return os.urandom(num_bytes).hex()
+
+
+class SpanContext:
+    """Identifiers that travel between processes"""
+
+    def __init__(self, trace_id: str, span_id: str, sampled: bool = True):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    @classmethod
+    def from_traceparent(cls, header: Optional[str]) -> Optional['SpanContext']:
+        """Parse a traceparent header; None if missing or malformed"""
+        match = _TRACEPARENT.match((header or '').strip().lower())
+        if not match or match.group(1) == '0' * 32 or match.group(2) == '0' * 16:
+            return None
+        return cls(match.group(1), match.group(2), bool(int(match.group(3), 16) & 1))
+
+
+class Span:
+    """One timed operation; use as a context manager or call end()"""
+
+    def __init__(self, tracer: 'Tracer', name: str, parent: Optional[SpanContext], attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.parent_id = parent.span_id if parent else None
+        self.context = SpanContext(parent.trace_id if parent else new_id(16), new_id(8),
+                                   parent.sampled if parent else True)
+        self.attributes = dict(attributes)
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.error: Optional[str] = None
+        self._token = None
+
+    @property
+    def traceparent(self) -> str:
+        return self.context.traceparent
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def end(self, error: Optional[str] = None):
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        self.error = error or self.error
+        self.tracer.export(self)
+
+    def __enter__(self) -> 'Span':
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current_span.reset(self._token)
+        self.end(f"{exc_type.__name__}: {exc}" if exc_type else None)
+        return False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'traceId': self.context.trace_id,
+            'spanId': self.context.span_id,
+            'parentSpanId': self.parent_id,
+            'name': self.name,
+            'service': self.tracer.service_name,
+            'startTimeUnixNano': self.start_ns,
+            'endTimeUnixNano': self.end_ns,
+            'attributes': self.attributes,
+            'error': self.error
+        }
+
+
+class FileExporter:
+    """Appends span dicts as JSON lines"""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    def export(self, spans: List[Dict[str, Any]]):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for span in spans:
+                f.write(json.dumps(span, separators=(',', ':')) + '\n')
+
+
+class OtlpHttpExporter:
+    """Posts spans to an OTLP/HTTP collector using the JSON encoding"""
+
+    def __init__(self, endpoint: str, service_name: str):
+        self.url = endpoint.rstrip('/') + '/v1/traces'
+        self.service_name = service_name
+
+    def export(self, spans: List[Dict[str, Any]]):
+        by_service: Dict[str, List[Dict[str, Any]]] = {}
+        for span in spans:
+            by_service.setdefault(span.get('service') or self.service_name, []).append(self._otlp_span(span))
+        body = {'resourceSpans': [
+            {
+                'resource': {'attributes': [_otlp_attribute('service.name', service)]},
+                'scopeSpans': [{'scope': {'name': 'aca-runner'}, 'spans': otlp_spans}]
+            }
+            for service, otlp_spans in by_service.items()
+        ]}
+        requests.post(self.url, json=body, timeout=5).raise_for_status()
+
+    def _otlp_span(self, span: Dict[str, Any]) -> Dict[str, Any]:
+        otlp = {
+            'traceId': span['traceId'],
+            'spanId': span['spanId'],
+            'name': span['name'],
+            'kind': 1,  # SPAN_KIND_INTERNAL
+            'startTimeUnixNano': str(span['startTimeUnixNano']),
+            'endTimeUnixNano': str(span['endTimeUnixNano']),
+            'attributes': [_otlp_attribute(k, v) for k, v in span.get('attributes', {}).items()],
+            'status': {'code': 2, 'message': span['error']} if span.get('error') else {'code': 1}
+        }
+        if span.get('parentSpanId'):
+            otlp['parentSpanId'] = span['parentSpanId']
+        return otlp
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        typed = {'boolValue': value}
+    elif isinstance(value, int):
+        typed = {'intValue': str(value)}
+    elif isinstance(value, float):
+        typed = {'doubleValue': value}
+    else:
+        typed = {'stringValue': str(value)}
+    return {'key': key, 'value': typed}
+
+
+class Tracer:
+    """Creates spans and hands finished ones to a background exporter thread"""
+
+    def __init__(self, exporter=None, service_name: str = SERVICE_NAME):
+        self.exporter = exporter
+        self.service_name = service_name
+        self._queue: 'queue.Queue[Dict[str, Any]]' = queue.Queue(maxsize=10000)
+        self.dropped = 0
+        if exporter is not None:
+            threading.Thread(target=self._export_loop, name='aca-span-exporter', daemon=True).start()
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    def start_span(self, name: str, parent=None, **attributes) -> Span:
+        """Start a span under `parent` (a Span or SpanContext), or under the current span if none is given"""
+        if parent is None:
+            parent = _current_span.get()
+        if isinstance(parent, Span):
+            parent = parent.context
+        return Span(self, name, parent, attributes)
+
+    def export(self, span: Span):
+        if self.exporter is not None and span.context.sampled:
+            self.ingest([span.to_dict()])
+
+    def ingest(self, span_dicts: List[Dict[str, Any]]):
+        """Queue already-finished span dicts (e.g. written by the pytest child)"""
+        for span in span_dicts:
+            try:
+                self._queue.put_nowait(span)
+            except queue.Full:
+                self.dropped += 1
+
+    def ingest_file(self, path: str):
+        """Queue the spans of a JSONL file written by the aca_pytest.trace plugin"""
+        if not self.enabled or not os.path.exists(path):
+            return
+        spans = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    spans.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        self.ingest(spans)
+
+    def _export_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + EXPORT_INTERVAL
+            while len(batch) < EXPORT_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self.exporter.export(batch)
+            except Exception as e:
+                print(f"ERROR: Span export failed ({len(batch)} spans): {e}")
+
+
+def tracer_from_env(default_file: str) -> Tracer:
+    """Build the tracer selected by TRACE_EXPORTER"""
+    if TRACE_EXPORTER == 'file':
+        return Tracer(FileExporter(TRACE_FILE or default_file))
+    if TRACE_EXPORTER == 'otlp':
+        return Tracer(OtlpHttpExporter(OTLP_ENDPOINT, SERVICE_NAME))
+    return Tracer(None)
+
+
+def pytest_trace_options(span: Span, spans_path: Optional[str], env: Dict[str, str]) -> List[str]:
+    """
+    Propagate a span into the pytest child
+    Args:
+        span: Parent span for everything the child does
+        spans_path: Where the child writes per-test spans (None to only propagate the context)
+        env: Child environment, updated in place
+    Returns:
+        Extra pytest arguments
+    """
+    env['TRACEPARENT'] = span.traceparent
+    if not spans_path or not span.context.sampled:
+        return []
+    env['ACA_TRACE_OUTPUT'] = spans_path
+    env['ACA_TRACE_SERVICE'] = span.tracer.service_name
+    return plugin_options('trace', env)
@@ -0,0 +1,6 @@
+"""Input generator for complexity analysis (see task.json)"""
+
+
+def sized_numeric_list(rng, n):
+    """Arguments for complexity analysis: one list of n floats"""
+    return ([rng.uniform(-1e3, 1e3) for _ in range(n)],)
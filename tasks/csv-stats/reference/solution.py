@@ -0,0 +1,23 @@
+import math
+
+def calculate_mean(data):
+    if not data:
+        return 0
+    return sum(data) / len(data)
+
+def calculate_median(data):
+    if not data:
+        return 0
+    sorted_data = sorted(data)
+    n = len(sorted_data)
+    if n % 2 == 0:
+        return (sorted_data[n//2 - 1] + sorted_data[n//2]) / 2
+    else:
+        return sorted_data[n//2]
+
+def calculate_std(data):
+    if not data:
+        return 0
+    mean = calculate_mean(data)
+    variance = sum((x - mean) ** 2 for x in data) / len(data)
+    return math.sqrt(variance)
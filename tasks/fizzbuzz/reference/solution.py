@@ -0,0 +1,11 @@
+def fizzbuzz(n):
+    if n == 0:
+        return "0"
+    if n % 15 == 0:
+        return "FizzBuzz"
+    elif n % 3 == 0:
+        return "Fizz"
+    elif n % 5 == 0:
+        return "Buzz"
+    else:
+        return str(n)
@@ -0,0 +1,12 @@
+"""Input generator for differential grading (see task.json)"""
+
+
+def sensor_rows(rng, count):
+    """Argument tuples with one list of (sensor, value) rows: empty, one sensor, many, repeated readings"""
+    cases = []
+    for _ in range(count):
+        sensors = [f"s{i}" for i in range(rng.randint(1, 12))]
+        size = rng.choice([0, 1, 2, rng.randint(3, 80)])
+        rows = [(rng.choice(sensors), round(rng.uniform(-50, 50), rng.randint(0, 3))) for _ in range(size)]
+        cases.append((rows,))
+    return cases
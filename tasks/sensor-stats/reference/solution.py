@@ -0,0 +1,7 @@
+def sensor_means(rows):
+    totals = {}
+    counts = {}
+    for sensor, value in rows:
+        totals[sensor] = totals.get(sensor, 0) + value
+        counts[sensor] = counts.get(sensor, 0) + 1
+    return {sensor: totals[sensor] / counts[sensor] for sensor in totals}
@@ -0,0 +1,49 @@
+import importlib.util
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+def load_solution():
+    sol_path = Path('solution.py')
+    assert sol_path.exists(), "solution.py not found in submission"
+    spec = importlib.util.spec_from_file_location('solution', str(sol_path))
+    mod = importlib.util.module_from_spec(spec)
+    sys.modules['solution'] = mod
+    spec.loader.exec_module(mod)
+    return mod
+
+@pytest.fixture(scope='module')
+def measurements(request):
+    # data/measurements.csv is shared read-only by all jobs (see runner/datasets.py)
+    try:
+        lines = list(request.getfixturevalue('aca_data').lines('measurements.csv'))
+    except pytest.FixtureLookupError:
+        # Run by hand, without the aca_pytest.data plugin
+        with open(os.path.join('data', 'measurements.csv'), encoding='utf-8') as f:
+            lines = f.read().splitlines()
+    rows = []
+    for line in lines[1:]:  # header
+        if line:
+            sensor, value = line.split(',')
+            rows.append((sensor, float(value)))
+    return rows
+
+def test_sensor_means():
+    s = load_solution()
+    rows = [('a', 1.0), ('b', 4.0), ('a', 3.0)]
+    assert s.sensor_means(rows) == {'a': 2.0, 'b': 4.0}
+
+def test_no_rows():
+    s = load_solution()
+    assert s.sensor_means([]) == {}
+
+def test_measurements_dataset(measurements):
+    s = load_solution()
+    means = s.sensor_means(measurements)
+    sensors = {sensor for sensor, _ in measurements}
+    assert set(means) == sensors
+    for sensor in sensors:
+        values = [value for name, value in measurements if name == sensor]
+        assert abs(means[sensor] - sum(values) / len(values)) < 1e-9
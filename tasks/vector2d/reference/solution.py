@@ -0,0 +1,18 @@
+import math
+
+class Vector2D:
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+    
+    def __add__(self, other):
+        return Vector2D(self.x + other.x, self.y + other.y)
+    
+    def __mul__(self, scalar):
+        return Vector2D(self.x * scalar, self.y * scalar)
+    
+    def magnitude(self):
+        return math.sqrt(self.x**2 + self.y**2)
+    
+    def dot(self, other):
+        return self.x * other.x + self.y * other.y